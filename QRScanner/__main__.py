@@ -1,32 +1,66 @@
 
-import asyncio
 import time
+_IMPORT_START = time.perf_counter()
+
+import asyncio
 import os
+from concurrent.futures import ThreadPoolExecutor
 
-from java import dynamic_proxy, cast, jclass
-from java.util import Arrays
+from java import dynamic_proxy, cast, jclass, jint, jlong
+# Proxy base interfaces and the activity are needed to start; every other
+# Java class is resolved on first use (see lazy.LazyClass).
 from java.lang import Runnable
-from java.io import FileInputStream, File
-from android.app import AlertDialog
-from android.net import Uri
-from android.view import KeyEvent
-from android.content import Intent, Context, ClipData, ClipboardManager, DialogInterface
-from android.widget import Toast, EditText
-from android.text import InputType
-from android.graphics import Color
-from android.graphics.drawable import ColorDrawable
-from android.content.res import Configuration
-from androidx.core.content import FileProvider
-from androidx.documentfile.provider import DocumentFile
+from android.content import DialogInterface
 from androidx.activity.result import ActivityResultCallback
-from com.journeyapps.barcodescanner import ScanOptions, ScanContract
-from org.beeware.android import MainActivity, IPythonApp, PortraitCaptureActivity
+from org.beeware.android import MainActivity, IPythonApp, IContinuousScanListener
 
-from toga import App, MainWindow, Box, Label, Button, Switch, ImageView
+from toga import App, MainWindow, Box, Label, Button, Switch, ImageView, Image, Command, ScrollContainer, Selection, TextInput
 from toga.style.pack import Pack
 from toga.constants import COLUMN, CENTER, BOLD, ROW
 from toga.colors import rgb, WHITE
 
+from .broker import ResultBroker
+from .cache import QRCache, QRStore, export_filename
+from .dispatch import UIDispatcher
+from .export import export_zip, history_entries
+from .folders import FolderIndex, SavedFolder
+from .generator import QRGenerator, render_png, target_pixels
+from .history import History
+from .lazy import Deferred, lazy_classes, resolve
+from .preview import LivePreview, PreviewEncoder
+from .profiles import DEFAULT_PROFILE, PROFILES, ScanOptionsCache
+from .session import ScanSession
+from .startup import StartupTimer
+from .streams import copy_async
+from .structured import Reassembler, SequencePlayer
+from .trace import tracer
+
+
+Arrays, = lazy_classes("java.util", "Arrays")
+File, = lazy_classes("java.io", "File")
+ByteBuffer, = lazy_classes("java.nio", "ByteBuffer")
+AlertDialog, = lazy_classes("android.app", "AlertDialog")
+Uri, = lazy_classes("android.net", "Uri")
+DocumentsContract, = lazy_classes("android.provider", "DocumentsContract")
+KeyEvent, = lazy_classes("android.view", "KeyEvent")
+Handler, Looper = lazy_classes("android.os", "Handler", "Looper")
+Intent, Context, ClipData, ClipboardManager = lazy_classes(
+    "android.content", "Intent", "Context", "ClipData", "ClipboardManager"
+)
+Toast, EditText = lazy_classes("android.widget", "Toast", "EditText")
+InputType, = lazy_classes("android.text", "InputType")
+Color, Bitmap, BitmapFactory = lazy_classes("android.graphics", "Color", "Bitmap", "BitmapFactory")
+ColorDrawable, = lazy_classes("android.graphics.drawable", "ColorDrawable")
+Configuration, = lazy_classes("android.content.res", "Configuration")
+FileProvider, = lazy_classes("androidx.core.content", "FileProvider")
+ScanOptions, ScanContract = lazy_classes("com.journeyapps.barcodescanner", "ScanOptions", "ScanContract")
+PortraitCaptureActivity, ContinuousCaptureActivity = lazy_classes(
+    "org.beeware.android", "PortraitCaptureActivity", "ContinuousCaptureActivity"
+)
+
+startup_timer = StartupTimer(origin=_IMPORT_START)
+startup_timer.mark("import")
+
 
 class RunnableProxy(dynamic_proxy(Runnable)):
     def __init__(self, func):
@@ -37,59 +71,160 @@ class RunnableProxy(dynamic_proxy(Runnable)):
         self.func()
 
 
-class QRCallbackProxy(dynamic_proxy(ActivityResultCallback)):
-    def __init__(self, scanner):
+class ActivityDispatcher(UIDispatcher):
+    # One Runnable for the lifetime of the activity; every UI call is
+    # queued and drained by it. The asyncio loop runs on the main looper,
+    # where runOnUiThread would run the Runnable inline and drain each call
+    # on its own; Handler.post always queues it, so calls made in the same
+    # loop turn share one hop.
+    def __init__(self, activity):
+        super().__init__()
+        self.activity = activity
+        self._runnable = RunnableProxy(self.drain)
+        self._handler = None
+
+    def post(self):
+        if self._handler is None:
+            self._handler = Handler(Looper.getMainLooper())
+        self._handler.post(self._runnable)
+
+
+class ResultCallback(dynamic_proxy(ActivityResultCallback)):
+    def __init__(self, broker, name, convert):
         super().__init__()
-        self.scanner = scanner
+        self.broker = broker
+        self.name = name
+        self.convert = convert
 
     def onActivityResult(self, result):
-        if result and result.getContents():
-            contents = result.getContents()
-            self.scanner._set_result(contents)
-        else:
-            self.scanner._set_result(None)
+        try:
+            value = self.convert(result)
+        except Exception as e:
+            print(f"{self.name} result error:", e)
+            tracer.error(f"result.{self.name}", e)
+            value = None
+        self.broker.deliver(self.name, value)
+
+
+def register_launcher(activity, dispatcher, broker, name, contract, convert):
+    # Launchers must be registered before the activity is started; results
+    # are routed through the broker to whichever request launched them.
+    launcher = activity.registerForActivityResult(contract, ResultCallback(broker, name, convert))
+    broker.register(name, lambda value: dispatcher.call_on_ui(launcher.launch, value))
+    return launcher
+
+
+def scan_contents(result):
+    # (contents, barcode image path); the path is only set when the scan
+    # was started with capture_image.
+    if result is None:
+        return None, None
+    if result.getContents():
+        return result.getContents(), result.getBarcodeImagePath()
+    # CaptureManager marks a scan that ran out of time with a TIMEOUT extra.
+    intent = result.getOriginalIntent()
+    if intent is not None and intent.getBooleanExtra("TIMEOUT", False):
+        return "__TIMEOUT__", None
+    return None, None
+
+
+def read_scan_image(path):
+    # zxing writes one JPEG per scan into the cache directory; take it over
+    # and delete it so they don't pile up.
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError as e:
+        print("Scan image unavailable:", e)
+        return None
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+    return data
+
+
+def uri_string(uri):
+    return uri.toString() if uri else None
 
 
 class QRScanner:
-    def __init__(self, activity):
+    def __init__(self, activity, dispatcher, broker):
         self.activity = activity
-        self._launcher = None
-        self._future = None
-        self._expected_timeout_time = None
-
-        scan_contract = ScanContract()
-        callback_proxy = QRCallbackProxy(self)
-        self._launcher = self.activity.registerForActivityResult(scan_contract, callback_proxy)
-
-    async def start_scan(self, beep=False, torch=False, timeout:int=None):
-        if self._launcher is None:
-            raise RuntimeError("QRScanner callback must be set before scanning")
-
-        self._future = asyncio.get_event_loop().create_future()
-
-        options = ScanOptions()
-        options.setPrompt("Scan a QR Code")
-        options.setBeepEnabled(beep)
-        options.setCaptureActivity(PortraitCaptureActivity)
-        options.setDesiredBarcodeFormats(Arrays.asList("QR_CODE"))
-        options.setTorchEnabled(torch)
-        if timeout:
-            options.setTimeout(timeout * 1000)
-            self._expected_timeout_time = time.time() + timeout
-        else:
-            self._expected_timeout_time = None
+        self.broker = broker
+        self._options = None
+        register_launcher(activity, dispatcher, broker, "scan", ScanContract(), scan_contents)
+
+    @property
+    def options(self):
+        # Built on the first scan, or by the post-startup pre-warm.
+        if self._options is None:
+            self._options = ScanOptionsCache(
+                ScanOptions,
+                capture_activity=resolve(PortraitCaptureActivity),
+                to_list=lambda formats: Arrays.asList(*formats),
+                to_int=jint
+            )
+        return self._options
 
-        self.activity.runOnUiThread(RunnableProxy(lambda: self._launcher.launch(options)))
-        return await self._future
+    async def start_scan(self, beep=False, torch=False, capture_image=False, profile=DEFAULT_PROFILE):
+        options = self.options.get(profile, beep=beep, torch=torch, capture_image=capture_image)
+        timeout = PROFILES[profile].timeout
+        try:
+            # The scanner enforces its own timeout; this one only guards
+            # against a result that never comes back.
+            with tracer.span("scan", profile=profile):
+                return await self.broker.request("scan", options, timeout=timeout + 30 if timeout else None)
+        except asyncio.TimeoutError:
+            tracer.count("scan.timeouts")
+            return "__TIMEOUT__", None
 
-    def _set_result(self, contents):
-        if contents is None and self._expected_timeout_time:
-            if abs(time.time() - self._expected_timeout_time) < 2:
-                contents = "__TIMEOUT__"
 
-        if self._future and not self._future.done():
-            self._future.set_result(contents)
 
+class ContinuousScanListener(dynamic_proxy(IContinuousScanListener)):
+    def __init__(self, session):
+        super().__init__()
+        self.session = session
+
+    def onScan(self, contents, timestamp_millis, sequence, parity):
+        structured_append = None
+        if sequence >= 0:
+            structured_append = (sequence >> 4, (sequence & 0xF) + 1, parity)
+        self.session.feed(contents, timestamp_millis / 1000, structured_append)
+
+    def onClosed(self, reason):
+        self.session.close(reason)
+
+
+class ContinuousScanner:
+    def __init__(self, activity, dispatcher):
+        self.activity = activity
+        self.dispatcher = dispatcher
+        self.session = None
+
+    def start_session(self, beep=False, torch=False, timeout:int=None, idle_timeout:int=None,
+                      dedup_window=2.0, max_pending=32):
+        if self.session is not None and not self.session.closed:
+            self.session.stop("replaced")
+
+        self.session = ScanSession(
+            dedup_window=dedup_window,
+            max_pending=max_pending,
+            idle_timeout=idle_timeout,
+            pause=ContinuousCaptureActivity.pauseDecoding,
+            resume=ContinuousCaptureActivity.resumeDecoding,
+            stop=ContinuousCaptureActivity.finishSession
+        )
+        ContinuousCaptureActivity.setListener(ContinuousScanListener(self.session))
+
+        intent = Intent(self.activity, resolve(ContinuousCaptureActivity))
+        intent.putExtra(ContinuousCaptureActivity.EXTRA_PROMPT, "Scan QR codes, press back when done")
+        intent.putExtra(ContinuousCaptureActivity.EXTRA_BEEP, beep)
+        intent.putExtra(ContinuousCaptureActivity.EXTRA_TORCH, torch)
+        if timeout:
+            intent.putExtra(ContinuousCaptureActivity.EXTRA_TIMEOUT, jlong(timeout * 1000))
+        self.dispatcher.call_soon(self.activity.startActivity, intent)
+        return self.session
 
 
 class PythonAppProxy(dynamic_proxy(IPythonApp)):
@@ -97,6 +232,14 @@ class PythonAppProxy(dynamic_proxy(IPythonApp)):
         super().__init__()
 
         self._back_callback = None
+        self._pause_callback = None
+
+    def onPause(self):
+        if self._pause_callback:
+            try:
+                self._pause_callback()
+            except Exception as e:
+                print("Pause callback error:", e)
 
     def onBackPressed(self):
         if self._back_callback:
@@ -109,19 +252,6 @@ class PythonAppProxy(dynamic_proxy(IPythonApp)):
         return False
     
 
-class FolderPickerCallback(dynamic_proxy(ActivityResultCallback)):
-    def __init__(self, picker):
-        super().__init__()
-        self.picker = picker
-
-    def onActivityResult(self, uri):
-        if uri:
-            self.picker._set_result(uri.toString())
-        else:
-            self.picker._set_result(None)
-
-
-
 class FileShare:
     def __init__(self, activity):
         self.context = activity.getApplicationContext()
@@ -134,49 +264,157 @@ class FileShare:
             return False
 
         try:
-            file = File(file_path)
-            uri = FileProvider.getUriForFile(self.context, self.fileprovider_authority, file)
-
-            intent = Intent()
-            intent.setAction(Intent.ACTION_SEND)
-            intent.setType(mime_type)
-            intent.putExtra(Intent.EXTRA_STREAM, uri)
-            intent.addFlags(Intent.FLAG_GRANT_READ_URI_PERMISSION)
-
-            chooser = Intent.createChooser(intent, chooser_title)
-            chooser.setFlags(Intent.FLAG_ACTIVITY_NEW_TASK)
-            self.context.startActivity(chooser)
+            with tracer.span("share", mime_type=mime_type):
+                self._start_chooser(file_path, mime_type, chooser_title)
             return True
 
         except Exception as e:
             Toast.makeText(self.context, f"Error sharing file: {e}", Toast.LENGTH_LONG).show()
             print("Error sharing file:", e)
+            tracer.error("share", e)
             return False
 
+    def _start_chooser(self, file_path, mime_type, chooser_title):
+        file = File(file_path)
+        uri = FileProvider.getUriForFile(self.context, self.fileprovider_authority, file)
+
+        intent = Intent()
+        intent.setAction(Intent.ACTION_SEND)
+        intent.setType(mime_type)
+        intent.putExtra(Intent.EXTRA_STREAM, uri)
+        intent.addFlags(Intent.FLAG_GRANT_READ_URI_PERMISSION)
+
+        chooser = Intent.createChooser(intent, chooser_title)
+        chooser.setFlags(Intent.FLAG_ACTIVITY_NEW_TASK)
+        self.context.startActivity(chooser)
+
 
 class FolderPicker:
-    def __init__(self, activity):
+    def __init__(self, activity, dispatcher, broker):
         self.activity = activity
-        self._future = None
-
-        callback_proxy = FolderPickerCallback(self)
-        self._launcher = self.activity.registerForActivityResult(
+        self.broker = broker
+        register_launcher(
+            activity, dispatcher, broker, "folder",
             jclass("androidx.activity.result.contract.ActivityResultContracts$OpenDocumentTree")(),
-            callback_proxy
+            uri_string
         )
 
     async def pick_folder(self):
-        self._future = asyncio.get_event_loop().create_future()
+        return await self.broker.request("folder")
+
+    def persist(self, folder_uri, previous=None):
+        flags = Intent.FLAG_GRANT_READ_URI_PERMISSION | Intent.FLAG_GRANT_WRITE_URI_PERMISSION
+        resolver = self.activity.getContentResolver()
+        resolver.takePersistableUriPermission(Uri.parse(folder_uri), flags)
+        if previous and previous != folder_uri:
+            try:
+                resolver.releasePersistableUriPermission(Uri.parse(previous), flags)
+            except Exception as e:
+                print("Release folder permission failed:", e)
 
-        def launch_intent():
-            self._launcher.launch(None)
+    def has_permission(self, folder_uri):
+        for permission in self.activity.getContentResolver().getPersistedUriPermissions():
+            if permission.getUri().toString() == folder_uri and permission.isWritePermission():
+                return True
+        return False
 
-        self.activity.runOnUiThread(RunnableProxy(launch_intent))
-        return await self._future
 
-    def _set_result(self, folder_uri):
-        if self._future and not self._future.done():
-            self._future.set_result(folder_uri)
+class FileCreator:
+    def __init__(self, activity, dispatcher, broker, mime_type):
+        self.activity = activity
+        self.broker = broker
+        self.name = f"create:{mime_type}"
+        register_launcher(
+            activity, dispatcher, broker, self.name,
+            jclass("androidx.activity.result.contract.ActivityResultContracts$CreateDocument")(mime_type),
+            uri_string
+        )
+
+    async def create_file(self, filename):
+        return await self.broker.request(self.name, filename)
+
+
+class ImagePicker:
+    def __init__(self, activity, dispatcher, broker):
+        self.activity = activity
+        self.broker = broker
+        register_launcher(
+            activity, dispatcher, broker, "image",
+            jclass("androidx.activity.result.contract.ActivityResultContracts$GetContent")(),
+            uri_string
+        )
+
+    async def pick_image(self):
+        return await self.broker.request("image", "image/*")
+
+
+def read_image_pixels(context, uri_str, max_side=1600):
+    # Gallery images are usually JPEG. Android decodes them, subsampled to
+    # at most max_side pixels, and the bitmap's RGBA pixels are copied out
+    # as they are: one crossing of the bridge and no PNG to re-encode and
+    # unfilter in Python.
+    from .decoder import DecodeError
+
+    resolver = context.getContentResolver()
+    uri = Uri.parse(uri_str)
+    bounds = BitmapFactory.Options()
+    bounds.inJustDecodeBounds = True
+    stream = resolver.openInputStream(uri)
+    try:
+        BitmapFactory.decodeStream(stream, None, bounds)
+    finally:
+        stream.close()
+
+    options = BitmapFactory.Options()
+    options.inSampleSize = 1
+    options.inPreferredConfig = Bitmap.Config.ARGB_8888
+    while max(bounds.outWidth, bounds.outHeight) // options.inSampleSize > max_side:
+        options.inSampleSize *= 2
+    stream = resolver.openInputStream(uri)
+    try:
+        bitmap = BitmapFactory.decodeStream(stream, None, options)
+    finally:
+        stream.close()
+    if bitmap is None:
+        raise DecodeError("Unsupported image")
+
+    width, height = bitmap.getWidth(), bitmap.getHeight()
+    buffer = ByteBuffer.allocate(bitmap.getByteCount())
+    bitmap.copyPixelsToBuffer(buffer)
+    bitmap.recycle()
+    return width, height, bytes(buffer.array())
+
+
+def decode_image_uri(context, uri_str):
+    # The decoder is only imported once an image is picked.
+    from .decoder import decode, load_rgba
+
+    width, height, grey = load_rgba(*read_image_pixels(context, uri_str))
+    return decode(grey)
+
+
+def list_documents(context, folder_uri):
+    # One query over the children of a tree folder, returning
+    # display name -> document id. DocumentFile.listFiles would issue an
+    # extra provider query per file to read each name.
+    tree_uri = Uri.parse(folder_uri)
+    children_uri = DocumentsContract.buildChildDocumentsUriUsingTree(
+        tree_uri, DocumentsContract.getTreeDocumentId(tree_uri)
+    )
+    projection = [
+        DocumentsContract.Document.COLUMN_DOCUMENT_ID,
+        DocumentsContract.Document.COLUMN_DISPLAY_NAME
+    ]
+    entries = {}
+    cursor = context.getContentResolver().query(children_uri, projection, None, None, None)
+    if cursor is None:
+        return entries
+    try:
+        while cursor.moveToNext():
+            entries[cursor.getString(1)] = cursor.getString(0)
+    finally:
+        cursor.close()
+    return entries
 
 
 
@@ -209,16 +447,25 @@ class DialogCancelListener(dynamic_proxy(DialogInterface.OnCancelListener)):
 
 
 class InputDialog:
-    def __init__(self, activity):
+    def __init__(self, activity, dispatcher, broker):
         self.activity = activity
-        self._future = None
+        self.broker = broker
+        broker.register(
+            "input",
+            lambda options, request_id: dispatcher.call_on_ui(self._show_dialog, request_id, *options),
+            keyed=True
+        )
 
     async def get_input(self, title:str=None, hint:str=None, input_type:str=None):
-        self._future = asyncio.get_event_loop().create_future()
-        self.activity.runOnUiThread(RunnableProxy(lambda: self._show_dialog(title, hint, input_type)))
-        return await self._future
+        return await self.broker.request("input", (title, hint, input_type))
+
+    def _show_dialog(self, request_id, title, hint, input_type):
+        # One InputDialog serves every request. Each shown dialog answers
+        # the request that opened it, so overlapping dialogs can't swap
+        # answers.
+        def set_result(result):
+            self._set_result(request_id, result)
 
-    def _show_dialog(self, title, hint, input_type):
         edit_text = EditText(self.activity)
 
         if input_type == "number":
@@ -254,8 +501,8 @@ class InputDialog:
         dialog_builder.setTitle(title)
         dialog_builder.setView(edit_text)
 
-        positive_listener = DialogClickListener(lambda dialog, which: self._set_result(edit_text.getText().toString()))
-        negative_listener = DialogClickListener(lambda dialog, which: self._set_result(None))
+        positive_listener = DialogClickListener(lambda dialog, which: set_result(edit_text.getText().toString()))
+        negative_listener = DialogClickListener(lambda dialog, which: set_result(None))
 
         dialog_builder.setPositiveButton("Confirm", positive_listener)
         dialog_builder.setNegativeButton("Cancel", negative_listener)
@@ -266,25 +513,29 @@ class InputDialog:
         dialog.getWindow().setBackgroundDrawable(ColorDrawable(bg_color))
 
         key_listener = DialogKeyListener(
-            lambda dialog, keyCode, event: self._handle_back(dialog, keyCode, event)
+            lambda dialog, keyCode, event: self._handle_back(dialog, keyCode, event, set_result)
         )
         dialog.setOnKeyListener(key_listener)
-        dialog.setOnCancelListener(DialogCancelListener(lambda dialog: self._set_result(None)))
+        dialog.setOnCancelListener(DialogCancelListener(lambda dialog: set_result(None)))
         dialog.show()
 
         dialog.getButton(AlertDialog.BUTTON_POSITIVE).setTextColor(button_text_color)
         dialog.getButton(AlertDialog.BUTTON_NEGATIVE).setTextColor(button_text_color)
 
-    def _handle_back(self, dialog, keyCode, event):
+    def _handle_back(self, dialog, keyCode, event, set_result):
         if keyCode == KeyEvent.KEYCODE_BACK:
-            self._set_result(None)
+            set_result(None)
             dialog.dismiss()
             return True
         return False
 
-    def _set_result(self, result):
-        if self._future and not self._future.done():
-            self._future.set_result(result or "")
+    def _set_result(self, request_id, result):
+        # Back, cancel and the buttons can all fire for one dialog; the
+        # broker takes only the first answer for a request.
+        if self.broker.deliver_to(request_id, result or "") is not None:
+            tracer.instant("dialog.result", cancelled=result is None)
+        else:
+            tracer.count("dialog.repeated_results")
 
 
 
@@ -295,11 +546,30 @@ class QRScannerGUI(MainWindow):
         self.activity = MainActivity.singletonThis
         self.context = self.activity.getApplicationContext()
         version = self.app.version
-        self._qr_scanner = QRScanner(self.activity)
-        self.folder_picker = FolderPicker(self.activity)
+        self.ui = ActivityDispatcher(self.activity)
+        self.results = ResultBroker()
+        self._qr_scanner = QRScanner(self.activity, self.ui, self.results)
+        self.continuous_scanner = ContinuousScanner(self.activity, self.ui)
+        self.folder_picker = FolderPicker(self.activity, self.ui, self.results)
         self.share_file = FileShare(self.activity)
+        self.zip_creator = FileCreator(self.activity, self.ui, self.results, "application/zip")
+        self.image_picker = ImagePicker(self.activity, self.ui, self.results)
+        self.input_dialog = InputDialog(self.activity, self.ui, self.results)
+        startup_timer.mark("launcher_registration")
+
+        self.folder_index = FolderIndex()
 
         self._qr_image = None
+        self._qr_key = None
+        # Loading the cache index and the saved folder reads files; both are
+        # built on a worker after the first frame, or by their first use.
+        self.deferred = Deferred()
+        self.deferred.add("qr_store", lambda: QRStore(QRCache(os.path.join(self.app.paths.cache, "qr"))))
+        self.deferred.add("saved_folder", lambda: SavedFolder(os.path.join(self.app.paths.data, "save_folder.json")))
+        self.deferred.add("qr_generator", lambda: QRGenerator(self.qr_store))
+        self._history = None
+        self.history_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history")
+        self.history_view = None
 
         theme = self.is_dark_theme()
         text_color = WHITE
@@ -312,8 +582,19 @@ class QRScannerGUI(MainWindow):
             button_color = rgb(0,87,75)
             switch_color = rgb(0,87,75)
 
-        x = self.screen_size()
-        qr_width = x - 150
+        self._colors = (background_color, button_color, text_color)
+        # The QR view and its buttons only appear after a result; they are
+        # built on first use or while idle after the first frame.
+        self.qr_box = None
+        self.deferred.add("qr_size", self.build_qr_size)
+        self.deferred.add("qr_box", self.build_qr_box)
+        self.deferred.add("preview", self.build_preview)
+        self.deferred.add("sequence", self.build_sequence_bar)
+        self._previewing = False
+        self._sequence = None
+        self._sequence_keys = None
+        # Parts of sequences decoded from images, kept across picks.
+        self.image_parts = Reassembler()
 
         self.main_box = Box(
             style=Pack(
@@ -363,7 +644,18 @@ class QRScannerGUI(MainWindow):
                 color = text_color,
                 background_color = switch_color,
                 font_size = 14,
-                padding= (10,20,15,20)
+                padding= (10,20,5,20)
+            )
+        )
+        
+        self.image_switch = Switch(
+            text="Show scanned image :",
+            value=True,
+            style=Pack(
+                color = text_color,
+                background_color = switch_color,
+                font_size = 14,
+                padding= (0,20,5,20)
             )
         )
         
@@ -373,11 +665,86 @@ class QRScannerGUI(MainWindow):
                 background_color= switch_color
             )
         )
+        self.profile_selection = Selection(
+            items=[profile.label for profile in PROFILES.values()],
+            value=PROFILES[DEFAULT_PROFILE].label,
+            style=Pack(
+                color = text_color,
+                background_color = switch_color,
+                font_size = 14,
+                padding= (0,20,15,20)
+            )
+        )
+
         self.stwitchs_box.add(
             self.torch_switch,
-            self.beep_switch
+            self.beep_switch,
+            self.image_switch,
+            self.profile_selection
+        )
+
+        self.scan_button = Button(
+            text="Scan QR",
+            style=Pack(
+                color = text_color,
+                background_color = button_color,
+                font_size = 14,
+                alignment = CENTER,
+                padding= (15,10,5,10)
+            ),
+            on_press=self.scan_qr
+        )
+
+        self.generate_button = Button(
+            text="Generate QR",
+            style=Pack(
+                color = text_color,
+                background_color = button_color,
+                font_size = 14,
+                alignment = CENTER,
+                padding= (15,10,5,10)
+            ),
+            on_press=self.text_to_qr
         )
 
+        self.content = self.main_box
+        self.main_box.add(
+            self.widgets_box,
+            self.app_version
+        )
+        self.widgets_box.add(
+            self.stwitchs_box,
+            self.scan_button,
+            self.generate_button
+        )
+        startup_timer.mark("widget_tree")
+
+
+    @property
+    def qr_store(self):
+        return self.deferred.get("qr_store")
+
+
+    @property
+    def saved_folder(self):
+        return self.deferred.get("saved_folder")
+
+
+    @property
+    def qr_generator(self):
+        return self.deferred.get("qr_generator")
+
+
+    def build_qr_size(self):
+        # (view width, rendered pixels); both lookups cross the bridge.
+        qr_width = self.screen_size() - 150
+        return qr_width, target_pixels(qr_width, self.density_dpi())
+
+
+    def build_qr_box(self):
+        background_color, button_color, _text_color = self._colors
+        qr_width, _pixels = self.deferred.get("qr_size")
+
         self.qr_view = ImageView(
             style=Pack(
                 background_color=background_color,
@@ -442,167 +809,672 @@ class QRScannerGUI(MainWindow):
             self.save_button,
             self.share_button
         )
+        return self.qr_box
 
-        self.scan_button = Button(
-            text="Scan QR",
+
+    def build_preview(self):
+        _background_color, button_color, text_color = self._colors
+        self.preview_input = TextInput(
+            placeholder="Type to preview a QR",
             style=Pack(
                 color = text_color,
                 background_color = button_color,
                 font_size = 14,
-                alignment = CENTER,
-                padding= (15,10,5,10)
+                padding = (15,10,5,10)
             ),
-            on_press=self.scan_qr
+            on_change=self.preview_changed
+        )
+        self.preview_encoder = PreviewEncoder(self.qr_generator.params)
+        _width, pixels = self.deferred.get("qr_size")
+        # Long payloads fall back to coarser previews rather than lag.
+        return LivePreview(
+            self.render_preview, self.show_preview, sizes=(pixels, pixels // 2, pixels // 4)
         )
 
-        self.generate_button = Button(
-            text="Generate QR",
+
+    def build_sequence_bar(self):
+        background_color, button_color, text_color = self._colors
+        self.sequence_label = Label(
+            text="",
             style=Pack(
                 color = text_color,
-                background_color = button_color,
+                background_color = background_color,
                 font_size = 14,
-                alignment = CENTER,
-                padding= (15,10,5,10)
+                padding = (0,15,0,0)
+            )
+        )
+        self.sequence_play = Button(
+            text="Pause",
+            style=Pack(
+                color = text_color,
+                background_color = button_color,
+                font_size = 12,
+                padding = (0,10,0,0)
             ),
-            on_press=self.text_to_qr
+            on_press=self.toggle_sequence_play
         )
-
-        self.content = self.main_box
-        self.main_box.add(
-            self.widgets_box,
-            self.app_version
+        previous_button = Button(
+            text="<",
+            style=Pack(
+                color = text_color,
+                background_color = button_color,
+                font_size = 12,
+                padding = (0,10,0,0)
+            ),
+            on_press=lambda button: self._sequence.previous()
         )
-        self.widgets_box.add(
-            self.stwitchs_box,
-            self.scan_button,
-            self.generate_button
+        next_button = Button(
+            text=">",
+            style=Pack(
+                color = text_color,
+                background_color = button_color,
+                font_size = 12
+            ),
+            on_press=lambda button: self._sequence.next()
+        )
+        sequence_bar = Box(
+            style=Pack(
+                direction = ROW,
+                background_color = background_color,
+                alignment = CENTER,
+                padding = (10,0,0,0)
+            )
         )
+        sequence_bar.add(self.sequence_label, previous_button, self.sequence_play, next_button)
+        return sequence_bar
 
 
     def scan_qr(self, button):
-        if self.qr_view.image:
-            self.qr_view.image = None
-            self.widgets_box.remove(self.qr_box)
+        self.close_preview()
+        self.qr_generator.cancel()
+        self.hide_qr()
 
         beep = self.beep_switch.value
         torch = self.torch_switch.value
-        asyncio.ensure_future(self.handle_scan(beep, torch))
+        capture_image = self.image_switch.value
+        profile = self.selected_profile()
+        asyncio.ensure_future(self.handle_scan(beep, torch, capture_image, profile))
+
+
+    def selected_profile(self):
+        for name, profile in PROFILES.items():
+            if profile.label == self.profile_selection.value:
+                return name
+        return DEFAULT_PROFILE
 
 
-    async def handle_scan(self, beep, torch):
+    async def handle_scan(self, beep, torch, capture_image=False, profile=DEFAULT_PROFILE):
         self._result = None
-        result = await self._qr_scanner.start_scan(beep, torch, 15)
+        result, image_path = await self._qr_scanner.start_scan(beep, torch, capture_image, profile)
 
         if result == "__TIMEOUT__":
             Toast.makeText(self.context, "The scanner was timeout", Toast.LENGTH_SHORT).show()
 
         elif result:
             self._result = result
-            self._qr_image = self.qr_generate()
-            if self._qr_image:
-                self.qr_view.image = self._qr_image
-                self.widgets_box.insert(2, self.qr_box)
+            if await self.history_call("seen", result):
+                Toast.makeText(self.context, "Already scanned before", Toast.LENGTH_SHORT).show()
+
+            # The frame zxing decoded is shown as is; the PNG is only
+            # encoded later if it is saved, shared or exported.
+            scan_image = None
+            if image_path:
+                loop = asyncio.get_event_loop()
+                scan_image = await loop.run_in_executor(None, read_scan_image, image_path)
+            if scan_image:
+                self._qr_image = None
+                self._qr_key = None
+                self.show_qr(scan_image)
+            else:
+                self._qr_image = await self.qr_generate()
+                if self._qr_image:
+                    self.show_qr(self._qr_image)
+            await self.history_call("add", result, "scan", self._qr_key)
         else:
             Toast.makeText(self.context, "No result", Toast.LENGTH_SHORT).show()
 
 
     async def text_to_qr(self, button):
-        if self.qr_view.image:
-            self.qr_view.image = None
-            self.widgets_box.remove(self.qr_box)
+        self.close_preview()
+        self.qr_generator.cancel()
+        self.hide_qr()
 
-        dialog = InputDialog(self.activity)
-        result = await dialog.get_input(title="Generate QR", hint="Enter a text for this QR", input_type="text")
+        result = await self.input_dialog.get_input(title="Generate QR", hint="Enter a text for this QR", input_type="text")
         if result:
             self._result = result
-            self._qr_image = self.qr_generate()
+            self._qr_image = await self.qr_generate()
             if self._qr_image:
-                self.qr_view.image = self._qr_image
-                self.widgets_box.insert(2, self.qr_box)
+                self.show_qr(self._qr_image)
+                await self.history_call("add", result, "generated", self._qr_key)
         else:
             Toast.makeText(self.context, "Input cancelled", Toast.LENGTH_SHORT).show()
 
 
-    def qr_generate(self):
-        import qrcode  
-        qr_filename = f"qr_{self._result}.png"
-        qr_path = os.path.join(self.app.paths.cache, qr_filename)
-        if os.path.exists(qr_path):
-            return qr_path
-        
-        qr = qrcode.QRCode(
-            version=2,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=7,
-            border=1,
-        )
-        qr.add_data(self._result)
-        qr.make(fit=True)
-        qr_img = qr.make_image(fill_color="black", back_color="white")
-        with open(qr_path, 'wb') as f:
-            qr_img.save(f)
-        
-        return qr_path
+    async def continuous_scan(self, command, **kwargs):
+        session = self.continuous_scanner.start_session(
+            beep=self.beep_switch.value,
+            torch=self.torch_switch.value,
+            idle_timeout=120
+        )
+        new_codes = 0
+        # A cycling sequence is seen many times; only the first full pass
+        # counts.
+        parts = Reassembler(ignore_completed=True)
+        async with session:
+            async for result in session:
+                contents = self.assemble(parts, result.contents, result.structured_append)
+                if contents is None:
+                    continue
+                if not await self.history_call("seen", contents):
+                    new_codes += 1
+                await self.history_call("add", contents, "scan")
+                self._result = contents
+
+        stats = session.stats()
+        tracer.instant("continuous_scan.stats", **stats)
+        Toast.makeText(
+            self.context,
+            f"Scanned {stats['delivered']} codes ({new_codes} new)",
+            Toast.LENGTH_LONG
+        ).show()
+
+
+    async def decode_image(self, command, **kwargs):
+        uri_str = await self.image_picker.pick_image()
+        if not uri_str:
+            Toast.makeText(self.context, "No image selected", Toast.LENGTH_SHORT).show()
+            return
+        loop = asyncio.get_event_loop()
+        try:
+            symbols = await loop.run_in_executor(None, decode_image_uri, self.context, uri_str)
+        except Exception as e:
+            Toast.makeText(self.context, f"Error reading image: {e}", Toast.LENGTH_LONG).show()
+            print("Decode error:", e)
+            tracer.error("decode_image", e)
+            return
+        if not symbols:
+            Toast.makeText(self.context, "No QR code found", Toast.LENGTH_SHORT).show()
+            return
+
+        texts = []
+        for symbol in symbols:
+            text = self.assemble(self.image_parts, symbol.text, symbol.structured_append, symbol.data)
+            if text is not None:
+                texts.append(text)
+                await self.history_call("add", text, "image")
+        if not texts:
+            return
+        if len(texts) > 1:
+            Toast.makeText(self.context, f"Found {len(texts)} QR codes", Toast.LENGTH_SHORT).show()
+        self.show_history_entry(texts[0])
+
+
+    def assemble(self, parts, text, structured_append, data=None):
+        # The text a scanned or decoded code stands for: itself, the whole
+        # message once the last part of a sequence is in, or None while
+        # parts are still missing.
+        if structured_append is None:
+            return text
+        try:
+            combined = parts.add(text, structured_append, data)
+        except ValueError as e:
+            Toast.makeText(self.context, str(e), Toast.LENGTH_LONG).show()
+            print("Sequence error:", e)
+            tracer.error("sequence", e)
+            return None
+        progress = parts.progress(structured_append)
+        if combined is None and progress is not None:
+            Toast.makeText(self.context, f"Part {progress[0]} of {progress[1]} read", Toast.LENGTH_SHORT).show()
+        return combined
+
+
+    async def text_to_sequence(self, command, **kwargs):
+        self.close_preview()
+        self.qr_generator.cancel()
+        self.hide_qr()
+
+        result = await self.input_dialog.get_input(title="Generate QR sequence", hint="Enter a long text to split", input_type="text")
+        if not result:
+            Toast.makeText(self.context, "Input cancelled", Toast.LENGTH_SHORT).show()
+            return
+        _width, pixels = self.deferred.get("qr_size")
+        try:
+            with tracer.span("qr_sequence", chars=len(result)):
+                parts = await self.qr_generator.generate_sequence(result, size=pixels)
+        except Exception as e:
+            Toast.makeText(self.context, f"Error generating QR: {e}", Toast.LENGTH_LONG).show()
+            print("Error generating QR sequence:", e)
+            tracer.error("qr_sequence", e)
+            return
+        if parts is None:
+            return
+        self._result = result
+        self.show_sequence(parts)
+        await self.history_call("add", result, "generated")
+
+
+    def show_sequence(self, parts):
+        sequence_bar = self.deferred.get("sequence")
+        self._sequence_keys = [key for _text, key, _data in parts]
+        self._sequence = SequencePlayer([data for _text, _key, data in parts], self.show_sequence_page)
+        self.show_qr(parts[0][2])
+        self.qr_box.add(sequence_bar)
+        self._sequence.go(0)
+        if len(parts) > 1:
+            self._sequence.play()
+        self.sequence_play.text = "Pause" if self._sequence.playing else "Play"
+
+
+    def show_sequence_page(self, index, data):
+        with tracer.span("widget.update"):
+            self.qr_view.image = Image(src=data)
+        # Save and share act on the part on screen.
+        self._qr_image = data
+        self._qr_key = self._sequence_keys[index]
+        self.sequence_label.text = f"{index + 1} / {len(self._sequence.pages)}"
+
+
+    def toggle_sequence_play(self, button):
+        if self._sequence.playing:
+            self._sequence.stop()
+            button.text = "Play"
+        else:
+            self._sequence.play()
+            button.text = "Pause"
+
+
+    def stop_sequence(self):
+        if self._sequence is None:
+            return
+        self._sequence.stop()
+        self._sequence = None
+        self._sequence_keys = None
+        self.qr_box.remove(self.deferred.get("sequence"))
+
+
+    async def live_preview(self, command, **kwargs):
+        if not self._previewing:
+            self.deferred.get("preview")
+            self.qr_generator.cancel()
+            self.hide_qr()
+            self._previewing = True
+            self.widgets_box.add(self.preview_input)
+            return
+
+        # Closing the preview keeps the text as a generated code, rendered
+        # in full now.
+        text = self.close_preview()
+        if text:
+            self._result = text
+            await self.display_result()
+            if self._qr_image:
+                await self.history_call("add", text, "generated", self._qr_key)
+
+
+    def close_preview(self):
+        if not self._previewing:
+            return None
+        self._previewing = False
+        preview = self.deferred.get("preview")
+        preview.stop()
+        tracer.instant("live_preview.stats", **preview.stats(), **self.preview_encoder.stats())
+        text = self.preview_input.value
+        self.widgets_box.remove(self.preview_input)
+        self.preview_input.value = ""
+        self.hide_qr()
+        return text
+
+
+    def preview_changed(self, widget, **kwargs):
+        if self._previewing:
+            self.deferred.get("preview").update(widget.value)
+
+
+    async def render_preview(self, text, size):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self.qr_generator.executor, self.preview_encoder.render, text, size)
+
+
+    def show_preview(self, text, image):
+        if not self._previewing:
+            return
+        if image is None:
+            self.hide_qr()
+            return
+        # Save and share render the text in full, not the preview.
+        self._result = text
+        self._qr_image = None
+        self._qr_key = None
+        if self.qr_box is not None and self.qr_box in self.widgets_box.children:
+            with tracer.span("widget.update"):
+                self.qr_view.image = Image(src=image)
+        else:
+            self.show_qr(image)
+
+
+    def show_qr(self, src):
+        self.deferred.get("qr_box")
+        with tracer.span("widget.insert"):
+            self.qr_view.image = Image(src=src)
+            self.widgets_box.insert(2, self.qr_box)
+
+
+    def hide_qr(self):
+        self.stop_sequence()
+        if self.qr_box is not None and self.qr_view.image:
+            with tracer.span("widget.remove"):
+                self.qr_view.image = None
+                self.widgets_box.remove(self.qr_box)
+
+
+    async def qr_generate(self):
+        _width, pixels = self.deferred.get("qr_size")
+        try:
+            with tracer.span("qr_generate", size=pixels):
+                generated = await self.qr_generator.generate(self._result, size=pixels)
+        except Exception as e:
+            Toast.makeText(self.context, f"Error generating QR: {e}", Toast.LENGTH_LONG).show()
+            print("Error generating QR:", e)
+            tracer.error("qr_generate", e)
+            return None
+
+        if generated is None:
+            return None
+        self._qr_key, qr_data = generated
+        return qr_data
+
+
+    async def qr_png(self):
+        if self._qr_image is None and self._result:
+            self._qr_image = await self.qr_generate()
+        return self._qr_image
     
 
+    def open_history(self):
+        # Runs on the history thread, so opening the database never costs
+        # the UI thread anything at startup.
+        if self._history is None:
+            os.makedirs(self.app.paths.data, exist_ok=True)
+            self._history = History(os.path.join(self.app.paths.data, "history.db"))
+        return self._history
+
+
+    async def history_call(self, method, *args):
+        loop = asyncio.get_event_loop()
+        try:
+            with tracer.span(f"history.{method}"):
+                return await loop.run_in_executor(
+                    self.history_executor, lambda: getattr(self.open_history(), method)(*args)
+                )
+        except Exception as e:
+            print("History error:", e)
+            tracer.error("history", e)
+            return None
+
+
+    async def show_history(self, command, **kwargs):
+        background_color, button_color, text_color = self._colors
+        self.history_list = Box(
+            style=Pack(
+                direction = COLUMN,
+                background_color = background_color
+            )
+        )
+        self.history_more = Button(
+            text="Load more",
+            style=Pack(
+                color = text_color,
+                background_color = button_color,
+                font_size = 12,
+                padding = (10,10,10,10)
+            ),
+            on_press=self.load_history_page
+        )
+        back_button = Button(
+            text="Back",
+            style=Pack(
+                color = text_color,
+                background_color = button_color,
+                font_size = 14,
+                padding = (15,10,5,10)
+            ),
+            on_press=self.close_history
+        )
+        self.history_search = TextInput(
+            placeholder="Search history",
+            style=Pack(
+                color = text_color,
+                background_color = button_color,
+                font_size = 14,
+                padding = (5,10,5,10)
+            ),
+            on_confirm=self.search_history
+        )
+        history_box = Box(
+            style=Pack(
+                direction = COLUMN,
+                background_color = background_color,
+                flex = 1
+            )
+        )
+        history_box.add(back_button, self.history_search, self.history_list, self.history_more)
+        self.history_view = ScrollContainer(
+            content=history_box,
+            horizontal=False,
+            style=Pack(background_color=background_color, flex=1)
+        )
+        self._history_before = None
+        self._history_query = ""
+        self.content = self.history_view
+        await self.load_history_page(None)
+
+
+    async def search_history(self, widget):
+        # An empty query goes back to the full list.
+        self._history_query = widget.value.strip()
+        self._history_before = None
+        self.history_list.clear()
+        await self.load_history_page(None)
+
+
+    async def load_history_page(self, button):
+        query = self._history_query
+        if query:
+            entries = await self.history_call("search", query, self._history_before, 30)
+        else:
+            entries = await self.history_call("page", self._history_before, 30)
+        if query != self._history_query:
+            # A newer search has replaced the list.
+            return
+        if not entries:
+            self.history_more.enabled = False
+            if self._history_before is None:
+                empty = "No matches" if query else "No history yet"
+                self.history_list.add(Label(text=empty, style=Pack(color=self._colors[2], padding=10)))
+            return
+
+        _background_color, button_color, text_color = self._colors
+        for entry in entries:
+            when = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry.timestamp))
+            text = entry.payload if len(entry.payload) <= 40 else entry.payload[:39] + "…"
+            self.history_list.add(
+                Button(
+                    text=f"{when}  {entry.source}\n{text}",
+                    style=Pack(
+                        color = text_color,
+                        background_color = button_color,
+                        font_size = 12,
+                        padding = (5,10,0,10)
+                    ),
+                    on_press=lambda button, payload=entry.payload: self.show_history_entry(payload)
+                )
+            )
+        self._history_before = entries[-1].id
+        self.history_more.enabled = len(entries) == 30
+
+
+    def show_history_entry(self, payload):
+        self.close_history(None)
+        self.close_preview()
+        self.qr_generator.cancel()
+        self.hide_qr()
+        self._result = payload
+        asyncio.ensure_future(self.display_result())
+
+
+    async def display_result(self):
+        self._qr_image = await self.qr_generate()
+        if self._qr_image:
+            self.show_qr(self._qr_image)
+
+
+    def close_history(self, button):
+        if self.history_view is None:
+            return False
+        self.content = self.main_box
+        self.history_view = None
+        return True
+
+
     def copy_qr_clipboard(self, button):
         clipboard = self.context.getSystemService(Context.CLIPBOARD_SERVICE)
-        clipboard_manager = cast(ClipboardManager, clipboard)
+        clipboard_manager = cast(resolve(ClipboardManager), clipboard)
         clip = ClipData.newPlainText("QR Code", self._result)
         clipboard_manager.setPrimaryClip(clip)
         Toast.makeText(self.context, "Copied to clipboard", Toast.LENGTH_SHORT).show()
 
 
     async def save_qr(self, button):
-        folder_uri_str = await self.folder_picker.pick_folder()
+        if not await self.qr_png():
+            Toast.makeText(self.context, "No QR image to save", Toast.LENGTH_SHORT).show()
+            return
 
+        folder_uri_str = await self.save_destination()
         if not folder_uri_str:
             Toast.makeText(self.context, "No folder selected", Toast.LENGTH_SHORT).show()
             return
-        if not self._qr_image or not os.path.exists(self._qr_image):
-            Toast.makeText(self.context, "No QR image to save", Toast.LENGTH_SHORT).show()
-            return
         try:
-            folder_uri = Uri.parse(folder_uri_str)
-            folder_doc = DocumentFile.fromTreeUri(self.context, folder_uri)
-
-            if folder_doc is None or not folder_doc.canWrite():
-                Toast.makeText(self.context, "Cannot write to selected folder", Toast.LENGTH_SHORT).show()
-                return
-
-            filename = os.path.basename(self._qr_image)
-            existing = folder_doc.findFile(filename)
-            if existing:
-                existing.delete()
-
-            mime_type = "image/png"
-            new_file = folder_doc.createFile(mime_type, filename)
-            if new_file is None:
-                Toast.makeText(self.context, "Failed to create file", Toast.LENGTH_SHORT).show()
-                return
+            filename = export_filename(self._result, self._qr_key)
             resolver = self.context.getContentResolver()
-            output_stream = resolver.openOutputStream(new_file.getUri())
-            input_stream = FileInputStream(self._qr_image)
-            buffer = bytearray(4096)
-            length = input_stream.read(buffer)
-            while length > 0:
-                output_stream.write(buffer, 0, length)
-                length = input_stream.read(buffer)
-
-            input_stream.close()
-            output_stream.close()
+            output_stream = self.open_existing_document(folder_uri_str, filename)
+            if output_stream is None:
+                tree_uri = Uri.parse(folder_uri_str)
+                folder_uri = DocumentsContract.buildDocumentUriUsingTree(
+                    tree_uri, DocumentsContract.getTreeDocumentId(tree_uri)
+                )
+                new_uri = DocumentsContract.createDocument(resolver, folder_uri, "image/png", filename)
+                if new_uri is None:
+                    Toast.makeText(self.context, "Failed to create file", Toast.LENGTH_SHORT).show()
+                    return
+                self.folder_index.add(filename, DocumentsContract.getDocumentId(new_uri))
+                output_stream = resolver.openOutputStream(new_uri)
+            try:
+                with tracer.span("save_qr.copy", bytes=len(self._qr_image)) as span:
+                    stats = await copy_async(self._qr_image, output_stream)
+                    span.set(file=filename, chunks=stats.chunks, throughput=round(stats.throughput, 1))
+            finally:
+                output_stream.close()
             Toast.makeText(self.context, f"Saved to {filename}", Toast.LENGTH_SHORT).show()
         except Exception as e:
+            self.folder_index.reset()
             Toast.makeText(self.context, f"Error saving file: {e}", Toast.LENGTH_LONG).show()
             print("Error:", e)
+            tracer.error("save_qr", e)
+
+
+    async def save_destination(self, pick=False):
+        folder_uri_str = self.saved_folder.uri
+        if pick or not folder_uri_str or not self.folder_picker.has_permission(folder_uri_str):
+            picked = await self.folder_picker.pick_folder()
+            if not picked:
+                return None
+            self.folder_picker.persist(picked, previous=folder_uri_str)
+            self.saved_folder.uri = folder_uri_str = picked
+
+        if self.folder_index.folder_uri != folder_uri_str:
+            self.folder_index.reset(folder_uri_str)
+        if not self.folder_index.loaded:
+            loop = asyncio.get_event_loop()
+            entries = await loop.run_in_executor(None, list_documents, self.context, folder_uri_str)
+            self.folder_index.load(entries)
+        return folder_uri_str
+
+
+    def open_existing_document(self, folder_uri_str, filename):
+        # Same name means same payload and render, so the document is
+        # truncated and rewritten in place instead of deleted and recreated.
+        document_id = self.folder_index.get(filename)
+        if document_id is None:
+            return None
+        document_uri = DocumentsContract.buildDocumentUriUsingTree(Uri.parse(folder_uri_str), document_id)
+        try:
+            return self.context.getContentResolver().openOutputStream(document_uri, "wt")
+        except Exception as e:
+            print("Indexed document is gone:", e)
+            self.folder_index.remove(filename)
+            return None
+
+
+    async def export_all(self, command, **kwargs):
+        # Every code in the history, not just the few still cached: the
+        # rest are rendered as the archive is written.
+        if not await self.history_call("__len__"):
+            Toast.makeText(self.context, "No QR codes to export", Toast.LENGTH_SHORT).show()
+            return
+
+        file_uri_str = await self.zip_creator.create_file(time.strftime("qr_export_%Y%m%d_%H%M%S.zip"))
+        if not file_uri_str:
+            Toast.makeText(self.context, "Export cancelled", Toast.LENGTH_SHORT).show()
+            return
+        try:
+            output_stream = self.context.getContentResolver().openOutputStream(Uri.parse(file_uri_str))
+            loop = asyncio.get_event_loop()
+            try:
+                entries = history_entries(
+                    self._history.entries(),
+                    self.qr_generator.key_for,
+                    lambda payload: render_png(payload, self.qr_generator.params),
+                    self.qr_store.peek
+                )
+                with tracer.span("export_all") as span:
+                    stats = await loop.run_in_executor(None, export_zip, entries, output_stream)
+                    span.set(**stats)
+            finally:
+                output_stream.close()
+            Toast.makeText(self.context, f"Exported {stats['entries']} QR codes", Toast.LENGTH_SHORT).show()
+        except Exception as e:
+            Toast.makeText(self.context, f"Error exporting: {e}", Toast.LENGTH_LONG).show()
+            print("Export error:", e)
+            tracer.error("export_all", e)
+
+
+    async def toggle_trace(self, command, **kwargs):
+        if not tracer.enabled:
+            tracer.clear()
+            tracer.enable()
+            Toast.makeText(self.context, "Performance trace started", Toast.LENGTH_SHORT).show()
+            return
+        tracer.disable()
+        loop = asyncio.get_event_loop()
+        trace_path, summary_path = await loop.run_in_executor(None, tracer.save, self.app.paths.cache)
+        print("Trace summary:", summary_path)
+        Toast.makeText(self.context, f"Trace saved to {trace_path}", Toast.LENGTH_LONG).show()
+
+
+    async def change_save_folder(self, command, **kwargs):
+        if await self.save_destination(pick=True):
+            Toast.makeText(self.context, "Save folder updated", Toast.LENGTH_SHORT).show()
 
 
-    def share_qr(self, button):
-        if not self._qr_image:
+    async def share_qr(self, button):
+        if not await self.qr_png():
             Toast.makeText(self.context, "No QR image to share", Toast.LENGTH_SHORT).show()
             return
 
-        self.share_file.share(self._qr_image, mime_type="image/png", chooser_title="Share QR Code")
+        if self.qr_store.memory.get(self._qr_key) is None:
+            self.qr_store.put(self._qr_key, self._qr_image, label=self._result)
+        qr_path = await self.qr_store.ensure_file(self._qr_key)
+        self.share_file.share(qr_path, mime_type="image/png", chooser_title="Share QR Code")
 
 
     def is_dark_theme(self):
@@ -623,6 +1495,14 @@ class QRScannerGUI(MainWindow):
         return width
 
 
+    def density_dpi(self):
+        try:
+            return self.context.getResources().getDisplayMetrics().densityDpi
+        except Exception as e:
+            print("Density detection failed:", e)
+            return 160
+
+
 
 class QRScannerExample(App):
     def __init__(self, **kwargs):
@@ -630,15 +1510,65 @@ class QRScannerExample(App):
 
         self.proxy = PythonAppProxy()
         self.proxy._back_callback = self.on_back_pressed
+        self.proxy._pause_callback = self.on_pause
 
 
     def startup(self):
         MainActivity.setPythonApp(self.proxy)
         self.main_window = QRScannerGUI()
+        self.commands.add(
+            Command(self.main_window.continuous_scan, text="Continuous scan"),
+            Command(self.main_window.decode_image, text="Decode image"),
+            Command(self.main_window.live_preview, text="Live preview"),
+            Command(self.main_window.text_to_sequence, text="Generate QR sequence"),
+            Command(self.main_window.show_history, text="History"),
+            Command(self.main_window.export_all, text="Export all QR codes"),
+            Command(self.main_window.change_save_folder, text="Change save folder"),
+            Command(self.main_window.toggle_trace, text="Start/stop performance trace")
+        )
         self.main_window.show()
 
+        decor_view = MainActivity.singletonThis.getWindow().getDecorView()
+        decor_view.post(RunnableProxy(self.on_first_frame))
+
+
+    def on_first_frame(self):
+        startup_timer.mark("first_render")
+        startup_timer.trace(tracer)
+        asyncio.ensure_future(self.after_first_frame())
+
+
+    async def after_first_frame(self):
+        loop = asyncio.get_event_loop()
+        report_path = os.path.join(self.paths.data, "startup_timing.jsonl")
+        try:
+            await loop.run_in_executor(None, lambda: startup_timer.save(report_path, version=self.version))
+            for name in ("qr_store", "saved_folder"):
+                await loop.run_in_executor(None, self.main_window.deferred.get, name)
+            await self.main_window.qr_generator.prewarm()
+            self.main_window._qr_scanner.options.prebuild(capture_image=True)
+            # One deferred piece per loop turn, so input is never held up
+            # for long.
+            while self.main_window.deferred.build_next():
+                await asyncio.sleep(0)
+        except Exception as e:
+            print("Startup pre-warm error:", e)
+
+
+    def on_pause(self):
+        if self.main_window.deferred.built("qr_store"):
+            self.main_window.qr_store.disk.save_index()
+        if self.main_window._history is not None:
+            self.main_window.history_executor.submit(self.main_window._history.flush)
+        if tracer.enabled:
+            # The app may not come back; keep what was traced so far.
+            asyncio.get_event_loop().run_in_executor(None, tracer.save, self.paths.cache)
+
 
     def on_back_pressed(self):
+        if self.main_window.close_history(None):
+            return True
+
         def on_result(widget, result):
             if result is True:
                 MainActivity.singletonThis.finish()
@@ -0,0 +1,207 @@
+# Batch generation from the command line, with the same encoder settings
+# and cache keys as the app:
+#
+#     python -m QRScanner.batch payloads.csv labels.zip --column url
+#
+# Payloads come from CSV, JSONL or plain text (one per line). Chunks of
+# them are rendered across a process pool and streamed, in input order,
+# into a directory or a ZIP archive with a manifest.
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from .encoder import DataOverflowError
+from .export import export_directory, export_zip
+from .generator import DEFAULT_PARAMS, image_key, render_png
+
+
+def read_payloads(path, column=None):
+    # CSV: the named column, else the first one. JSONL: each line is a
+    # string or an object holding `column` (default "payload").
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        if extension == ".csv":
+            if column is not None:
+                for row in csv.DictReader(f):
+                    yield row[column]
+            else:
+                for row in csv.reader(f):
+                    if row:
+                        yield row[0]
+        elif extension in (".jsonl", ".ndjson"):
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                value = json.loads(line)
+                yield value if isinstance(value, str) else str(value[column or "payload"])
+        else:
+            for line in f:
+                line = line.rstrip("\r\n")
+                if line:
+                    yield line
+
+
+def render_chunk(chunk, params):
+    # Runs in a worker process: [(key, payload)] -> [(key, payload, png)].
+    # A payload too long for one symbol gets None instead of failing the
+    # whole run.
+    rendered = []
+    for key, payload in chunk:
+        try:
+            data = render_png(payload, params)
+        except DataOverflowError:
+            data = None
+        rendered.append((key, payload, data))
+    return rendered
+
+
+def _rendered(results, stats):
+    for key, payload, data in results:
+        if data is None:
+            stats["too_long"] += 1
+            continue
+        yield key, payload, data
+
+
+def _chunks(payloads, params, chunk_size, stats):
+    # Keys are computed here, so repeated payloads are dropped before they
+    # cost a render or a trip to a worker.
+    seen = set()
+    chunk = []
+    for payload in payloads:
+        stats["read"] += 1
+        key = image_key(payload, params)
+        if key in seen:
+            stats["duplicates"] += 1
+            continue
+        seen.add(key)
+        chunk.append((key, payload))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def generate(payloads, params=None, workers=None, chunk_size=64, executor=None, stats=None):
+    # Yields (key, payload, png_bytes) in input order, leaving out (and
+    # counting) payloads too long for one symbol. At most two chunks
+    # per worker are in flight, so memory stays flat however long the
+    # input is.
+    params = dict(DEFAULT_PARAMS, **(params or {}))
+    stats = stats if stats is not None else {}
+    stats.setdefault("read", 0)
+    stats.setdefault("duplicates", 0)
+    stats.setdefault("too_long", 0)
+    workers = workers or os.cpu_count() or 1
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=workers)
+
+    pending = deque()
+    try:
+        for chunk in _chunks(payloads, params, chunk_size, stats):
+            pending.append(executor.submit(render_chunk, chunk, params))
+            if len(pending) >= workers * 2:
+                yield from _rendered(pending.popleft().result(), stats)
+        while pending:
+            yield from _rendered(pending.popleft().result(), stats)
+    finally:
+        for future in pending:
+            future.cancel()
+        if own_executor:
+            executor.shutdown(wait=True)
+
+
+class Progress:
+    # Prints the running count and throughput at most every `interval`
+    # seconds, on one line that is rewritten in place.
+    def __init__(self, stream=None, interval=0.5, clock=time.perf_counter):
+        self.stream = stream or sys.stderr
+        self.interval = interval
+        self.clock = clock
+        self.start = self.last = clock()
+
+    def __call__(self, done, name):
+        now = self.clock()
+        if now - self.last >= self.interval:
+            self.last = now
+            self.report(done, now)
+
+    def report(self, done, now=None):
+        elapsed = (now if now is not None else self.clock()) - self.start
+        rate = done / elapsed if elapsed > 0 else 0.0
+        self.stream.write(f"\r{done} codes  {rate:.0f}/s")
+        self.stream.flush()
+
+
+def run_batch(source, target, params=None, workers=None, chunk_size=64, column=None,
+              progress=None, clock=time.perf_counter):
+    # Writes every payload in source to target (a directory, or a ZIP when
+    # it ends in .zip) and returns the export stats with throughput added.
+    start = clock()
+    workers = workers or os.cpu_count() or 1
+    stats = {"read": 0, "duplicates": 0, "too_long": 0}
+    entries = generate(
+        read_payloads(source, column), params=params, workers=workers, chunk_size=chunk_size, stats=stats
+    )
+    if target.lower().endswith(".zip"):
+        result = export_zip(entries, target, progress=progress, clock=clock)
+    else:
+        result = export_directory(entries, target, progress=progress, clock=clock)
+
+    seconds = clock() - start
+    result.update(stats)
+    result["workers"] = workers
+    result["seconds"] = round(seconds, 4)
+    result["codes_per_second"] = round(result["entries"] / seconds, 1) if seconds > 0 else 0.0
+    result["bytes_per_second"] = round(result["bytes"] / seconds, 1) if seconds > 0 else 0.0
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m QRScanner.batch", description="Generate QR code PNGs in bulk."
+    )
+    parser.add_argument("source", help="CSV, JSONL or text file of payloads")
+    parser.add_argument("target", help="output directory, or a .zip file")
+    parser.add_argument("--column", help="CSV column or JSONL key holding the payload")
+    parser.add_argument("--size", type=int, help="exact image size in pixels")
+    parser.add_argument("--box-size", type=int, default=DEFAULT_PARAMS["box_size"])
+    parser.add_argument("--border", type=int, default=DEFAULT_PARAMS["border"])
+    parser.add_argument("--error-correction", choices="LMQH", default=DEFAULT_PARAMS["error_correction"])
+    parser.add_argument("--fill-color", default=DEFAULT_PARAMS["fill_color"])
+    parser.add_argument("--back-color", default=DEFAULT_PARAMS["back_color"])
+    parser.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=64, help="payloads per worker task")
+    parser.add_argument("--quiet", action="store_true", help="no progress output")
+    args = parser.parse_args(argv)
+
+    params = {
+        "size": args.size,
+        "box_size": args.box_size,
+        "border": args.border,
+        "error_correction": args.error_correction,
+        "fill_color": args.fill_color,
+        "back_color": args.back_color,
+    }
+    progress = None if args.quiet else Progress()
+    result = run_batch(
+        args.source, args.target, params=params, workers=args.workers,
+        chunk_size=args.chunk_size, column=args.column, progress=progress,
+    )
+    if progress is not None:
+        progress.report(result["entries"])
+        sys.stderr.write("\n")
+    print(json.dumps(result))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+import asyncio
+import inspect
+import threading
+import time
+from collections import deque
+
+
+class _Request:
+    def __init__(self, name, loop, future, started):
+        self.name = name
+        self.loop = loop
+        self.future = future
+        self.started = started
+
+
+class ResultBroker:
+    # Pairs activity results with the coroutines waiting for them. Every
+    # request gets its own id and future; results for a launcher arrive in
+    # launch order, so each one goes to the oldest request of that launcher.
+    # A request that times out or is cancelled is forgotten at once, and
+    # the result its activity eventually returns is dropped rather than
+    # handed to a newer request. Launchers whose results can come back in
+    # any order (dialogs) are registered keyed and answer one request by id.
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.completed = 0
+        self.timed_out = 0
+        self.dropped = 0
+        self.last_elapsed = None
+
+        self._next_id = 1
+        self._launchers = {}
+        self._keyed = set()
+        self._queues = {}
+        self._requests = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, launch, keyed=False):
+        # launch(value) starts the activity; it may return an awaitable.
+        # Keyed launchers are called as launch(value, request_id) and answer
+        # through deliver_to().
+        self._launchers[name] = launch
+        self._queues.setdefault(name, deque())
+        if keyed:
+            self._keyed.add(name)
+
+    def outstanding(self, name=None):
+        with self._lock:
+            if name is None:
+                return len(self._requests)
+            return sum(1 for request in self._requests.values() if request.name == name)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "outstanding": len(self._requests),
+                "awaiting_results": sum(len(queue) for queue in self._queues.values()),
+                "completed": self.completed,
+                "timed_out": self.timed_out,
+                "dropped": self.dropped,
+            }
+
+    async def request(self, name, value=None, timeout=None):
+        # Returns the delivered result; raises asyncio.TimeoutError when
+        # timeout seconds pass first.
+        launch = self._launchers[name]
+        keyed = name in self._keyed
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        with self._lock:
+            request_id = self._next_id
+            self._next_id += 1
+            self._requests[request_id] = _Request(name, loop, future, self.clock())
+            if not keyed:
+                self._queues[name].append(request_id)
+        try:
+            try:
+                launched = launch(value, request_id) if keyed else launch(value)
+                if inspect.isawaitable(launched):
+                    await launched
+            except BaseException:
+                # The activity never started, so no result will come for it.
+                if not keyed:
+                    with self._lock:
+                        self._queues[name].remove(request_id)
+                raise
+            try:
+                return await asyncio.wait_for(future, timeout)
+            except asyncio.TimeoutError:
+                with self._lock:
+                    self.timed_out += 1
+                raise
+        finally:
+            with self._lock:
+                self._requests.pop(request_id, None)
+
+    def deliver(self, name, result):
+        # May be called from any thread. Returns the id of the request that
+        # received the result, or None if it was dropped.
+        with self._lock:
+            queue = self._queues.get(name)
+            if not queue:
+                self.dropped += 1
+                return None
+            request_id = queue.popleft()
+            request = self._requests.get(request_id)
+            if request is None:
+                self.dropped += 1
+                return None
+
+            self.completed += 1
+            self.last_elapsed = self.clock() - request.started
+        request.loop.call_soon_threadsafe(_resolve, request.future, result)
+        return request_id
+
+    def deliver_to(self, request_id, result):
+        # Answers one request of a keyed launcher. May be called from any
+        # thread; only the first result for a request counts. Returns
+        # request_id, or None if the result was dropped.
+        with self._lock:
+            request = self._requests.pop(request_id, None)
+            if request is None:
+                self.dropped += 1
+                return None
+
+            self.completed += 1
+            self.last_elapsed = self.clock() - request.started
+        request.loop.call_soon_threadsafe(_resolve, request.future, result)
+        return request_id
+
+
+def _resolve(future, result):
+    if not future.done():
+        future.set_result(result)
@@ -0,0 +1,475 @@
+import asyncio
+import hashlib
+import os
+import struct
+import threading
+from collections import OrderedDict
+
+
+INDEX_NAME = "index.bin"
+JOURNAL_NAME = "index.log"
+INDEX_MAGIC = b"QRCI"
+INDEX_VERSION = 2
+# Labels only name entries; the full payload is kept in the history, so
+# long ones are cut to keep the index and journal small.
+MAX_LABEL_BYTES = 256
+
+# Header: magic, format version, entry count.
+# Records are stored oldest-first, so the file order is the LRU order. Each
+# record is followed by its label (the payload, UTF-8) of the given length.
+_HEADER = struct.Struct("<4sB3xI")
+_RECORD = struct.Struct("<16sIH")
+# Changes since the index was last written are appended to the journal, one
+# record per put or drop (a put carries its label), and replayed on load.
+_JOURNAL = struct.Struct("<B16sIH")
+_PUT = 1
+_DROP = 2
+
+
+def cache_key(payload, **params):
+    digest = hashlib.blake2b(digest_size=16)
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+    digest.update(payload)
+    for name in sorted(params):
+        digest.update(f"\0{name}={params[name]!r}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def export_filename(payload, key, suffix=".png", max_length=48):
+    safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in payload)
+    safe = safe.strip("._")[:max_length]
+    if safe:
+        return f"qr_{safe}_{key[:8]}{suffix}"
+    return f"qr_{key[:8]}{suffix}"
+
+
+class QRCache:
+    def __init__(self, directory, max_bytes=32 * 1024 * 1024, max_entries=2000, suffix=".png",
+                 journal_limit=256):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.suffix = suffix
+        # Journal records after which the index is rewritten and the
+        # journal started over.
+        self.journal_limit = journal_limit
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._entries = OrderedDict()
+        self._labels = {}
+        self._total_bytes = 0
+        self._dirty = False
+        self._journal_records = 0
+        self._lock = threading.RLock()
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._load_index()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    @property
+    def total_bytes(self):
+        return self._total_bytes
+
+    def path_for(self, key):
+        return os.path.join(self.directory, key + self.suffix)
+
+    def label(self, key):
+        return self._labels.get(key)
+
+    def keys(self):
+        # Snapshot, least recently used first.
+        with self._lock:
+            return list(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+
+            path = self.path_for(key)
+            if not os.path.exists(path):
+                self._drop(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._dirty = True
+            self.hits += 1
+            return path
+
+    def put(self, key, data, label=None):
+        path = self.path_for(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= self._entries[key]
+            self._entries[key] = len(data)
+            self._entries.move_to_end(key)
+            self._total_bytes += len(data)
+            if label is not None:
+                self._labels[key] = label
+            self._dirty = True
+            self._log(_PUT, key, len(data), self._labels.get(key))
+
+            self._evict(keep=key)
+            if self._journal_records >= self.journal_limit:
+                self.save_index()
+        return path
+
+    def discard(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+                self._remove_file(key)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._total_bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def save_index(self):
+        # Rewrites the whole index and empties the journal. Puts only append
+        # to the journal, so this runs every journal_limit changes and when
+        # the app is paused.
+        with self._lock:
+            if not self._dirty:
+                return
+            parts = [_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, len(self._entries))]
+            for key, size in self._entries.items():
+                label = _encode_label(self._labels.get(key))
+                parts.append(_RECORD.pack(bytes.fromhex(key), size, len(label)))
+                parts.append(label)
+
+            index_path = os.path.join(self.directory, INDEX_NAME)
+            tmp_path = index_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(b"".join(parts))
+            os.replace(tmp_path, index_path)
+            # Replaying records the index already holds is harmless, so a
+            # crash between the two steps loses nothing.
+            try:
+                os.remove(os.path.join(self.directory, JOURNAL_NAME))
+            except FileNotFoundError:
+                pass
+            self._journal_records = 0
+            self._dirty = False
+
+    def _log(self, op, key, size=0, label=None):
+        label = _encode_label(label)
+        with open(os.path.join(self.directory, JOURNAL_NAME), "ab") as f:
+            f.write(_JOURNAL.pack(op, bytes.fromhex(key), size, len(label)) + label)
+        self._journal_records += 1
+
+    def _drop(self, key):
+        self._total_bytes -= self._entries.pop(key)
+        self._labels.pop(key, None)
+        self._dirty = True
+        self._log(_DROP, key)
+
+    def _remove_file(self, key):
+        try:
+            os.remove(self.path_for(key))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self, keep=None):
+        while self._entries and (
+            len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes
+        ):
+            key = next(iter(self._entries))
+            if key == keep:
+                break
+            self._drop(key)
+            self._remove_file(key)
+            self.evictions += 1
+
+    def _load_index(self):
+        if not self._read_index():
+            self._rebuild_index()
+        self._replay_journal()
+
+        # Files removed behind our back (e.g. the OS clearing the cache
+        # directory) are detected lazily in get().
+        self._evict()
+        self.save_index()
+
+    def _read_index(self):
+        # False when the index is missing or unreadable.
+        index_path = os.path.join(self.directory, INDEX_NAME)
+        try:
+            with open(index_path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return False
+
+        try:
+            magic, version, count = _HEADER.unpack_from(data)
+        except struct.error:
+            return False
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            return False
+
+        entries = []
+        offset = _HEADER.size
+        try:
+            for _ in range(count):
+                digest, size, label_length = _RECORD.unpack_from(data, offset)
+                offset += _RECORD.size
+                label = data[offset:offset + label_length].decode("utf-8", "replace")
+                offset += label_length
+                entries.append((digest.hex(), size, label))
+        except struct.error:
+            return False
+        if offset != len(data):
+            return False
+
+        for key, size, label in entries:
+            self._entries[key] = size
+            self._total_bytes += size
+            if label:
+                self._labels[key] = label
+        return True
+
+    def _replay_journal(self):
+        try:
+            with open(os.path.join(self.directory, JOURNAL_NAME), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            data = b""
+
+        offset = 0
+        # A record cut short by a crash ends the replay.
+        while offset + _JOURNAL.size <= len(data):
+            op, digest, size, label_length = _JOURNAL.unpack_from(data, offset)
+            end = offset + _JOURNAL.size + label_length
+            if end > len(data):
+                break
+            key = digest.hex()
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)
+                self._labels.pop(key, None)
+            if op == _PUT:
+                self._entries[key] = size
+                self._total_bytes += size
+                if label_length:
+                    self._labels[key] = data[offset + _JOURNAL.size:end].decode("utf-8", "replace")
+            offset = end
+        if data:
+            self._dirty = True
+
+    def _rebuild_index(self):
+        found = []
+        for entry in os.scandir(self.directory):
+            name = entry.name
+            if not name.endswith(self.suffix):
+                continue
+            key = name[:-len(self.suffix)]
+            if len(key) != 32:
+                continue
+            try:
+                bytes.fromhex(key)
+            except ValueError:
+                continue
+            stat = entry.stat()
+            found.append((stat.st_mtime, key, stat.st_size))
+
+        found.sort()
+        for _mtime, key, size in found:
+            self._entries[key] = size
+            self._total_bytes += size
+
+        self._dirty = True
+
+
+class MemoryCache:
+    def __init__(self, max_bytes=8 * 1024 * 1024, max_entries=64):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    @property
+    def total_bytes(self):
+        return self._total_bytes
+
+    def keys(self):
+        return list(self._entries)
+
+    def peek(self, key):
+        # Lookup that leaves the LRU order and counters alone.
+        return self._entries.get(key)
+
+    def get(self, key):
+        data = self._entries.get(key)
+        if data is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return data
+
+    def put(self, key, data):
+        data = bytes(data)
+        if key in self._entries:
+            self._total_bytes -= len(self._entries[key])
+        self._entries[key] = data
+        self._entries.move_to_end(key)
+        self._total_bytes += len(data)
+
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes
+        ):
+            _key, evicted = self._entries.popitem(last=False)
+            self._total_bytes -= len(evicted)
+            self.evictions += 1
+
+    def discard(self, key):
+        data = self._entries.pop(key, None)
+        if data is not None:
+            self._total_bytes -= len(data)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._total_bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class QRStore:
+    """Rendered images live in memory; files are written only on demand."""
+
+    def __init__(self, disk, memory=None, executor=None):
+        self.disk = disk
+        self.memory = memory if memory is not None else MemoryCache()
+        self.executor = executor
+        self._labels = {}
+        self._pending_writes = {}
+
+    def put(self, key, data, label=None):
+        self.memory.put(key, data)
+        if label is not None:
+            self._labels[key] = label
+
+    def label(self, key):
+        label = self._labels.get(key)
+        return label if label is not None else self.disk.label(key)
+
+    def peek(self, key):
+        # The image as bytes if it is in memory, its path if it is only on
+        # disk, else None. Leaves the LRU order and counters alone, so it
+        # may be called from a worker thread.
+        data = self.memory.peek(key)
+        if data is not None:
+            return data
+        return self.disk.path_for(key) if key in self.disk else None
+
+    def entries(self):
+        # (key, label, source) for every stored image: bytes for images held
+        # in memory, a file path for those only on disk.
+        seen = set()
+        for key in self.memory.keys():
+            data = self.memory.peek(key)
+            if data is not None:
+                seen.add(key)
+                yield key, self.label(key), data
+        for key in self.disk.keys():
+            if key not in seen:
+                yield key, self.label(key), self.disk.path_for(key)
+        # Forget labels of images that have left both caches.
+        for key in [key for key in self._labels if key not in seen and key not in self.disk]:
+            del self._labels[key]
+
+    async def get(self, key):
+        data = self.memory.get(key)
+        if data is not None:
+            return data
+
+        path = self.disk.get(key)
+        if path is None:
+            return None
+
+        loop = asyncio.get_event_loop()
+        try:
+            data = await loop.run_in_executor(self.executor, _read_file, path)
+        except FileNotFoundError:
+            return None
+        self.memory.put(key, data)
+        return data
+
+    async def ensure_file(self, key):
+        pending = self._pending_writes.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        path = self.disk.get(key)
+        if path is not None:
+            return path
+
+        data = self.memory.get(key)
+        if data is None:
+            return None
+
+        loop = asyncio.get_event_loop()
+        future = loop.run_in_executor(self.executor, self.disk.put, key, data, self._labels.get(key))
+        self._pending_writes[key] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            if self._pending_writes.get(key) is future:
+                del self._pending_writes[key]
+
+    def stats(self):
+        return {"memory": self.memory.stats(), "disk": self.disk.stats()}
+
+
+def _encode_label(label):
+    # Cut on a character boundary, so a shortened label still decodes.
+    data = (label or "").encode("utf-8")
+    if len(data) <= MAX_LABEL_BYTES:
+        return data
+    return data[:MAX_LABEL_BYTES].decode("utf-8", "ignore").encode("utf-8")
+
+
+def _read_file(path):
+    with open(path, "rb") as f:
+        return f.read()
@@ -0,0 +1,910 @@
+import io
+import re
+from collections import namedtuple
+from itertools import combinations
+
+from .encoder import (
+    ALPHA_NUM,
+    ECC_CODEWORDS_PER_BLOCK,
+    ERROR_CORRECTION_LEVELS,
+    MODE_ALPHA_NUM,
+    MODE_BYTE,
+    MODE_NUMBER,
+    NUM_ERROR_CORRECTION_BLOCKS,
+    _EXP,
+    _LOG,
+    format_bits,
+    gf_mul,
+    format_positions,
+    length_bits,
+    raw_data_modules,
+    template,
+    version_bits,
+    version_positions,
+)
+from .png import PNG_SIGNATURE, read_png
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+MODE_KANJI = 8
+MODE_ECI = 7
+MODE_STRUCTURED_APPEND = 3
+MODE_FNC1_FIRST = 5
+MODE_FNC1_SECOND = 9
+
+ECI_ENCODINGS = {
+    1: "iso-8859-1", 2: "cp437", 3: "iso-8859-1", 4: "iso-8859-2", 5: "iso-8859-3",
+    6: "iso-8859-4", 7: "iso-8859-5", 8: "iso-8859-6", 9: "iso-8859-7", 10: "iso-8859-8",
+    11: "iso-8859-9", 13: "iso-8859-11", 15: "iso-8859-13", 16: "iso-8859-14",
+    17: "iso-8859-15", 18: "iso-8859-16", 20: "shift_jis", 21: "cp1250", 22: "cp1251",
+    23: "cp1252", 24: "cp1256", 25: "utf-16-be", 26: "utf-8", 27: "ascii", 28: "big5",
+    29: "gb18030", 30: "euc-kr",
+}
+
+# All 32 format words and the 34 version words, for nearest-match decoding.
+_FORMAT_WORDS = [
+    (format_bits(level, mask), level, mask)
+    for level in ERROR_CORRECTION_LEVELS
+    for mask in range(8)
+]
+_VERSION_WORDS = [(version_bits(version), version) for version in range(7, 41)]
+
+_RE_RUNS = re.compile(b"\x01+|\x00+")
+_INVERT = bytes.maketrans(b"\x00\x01", b"\x01\x00")
+# Alignment candidates tried before falling back to the parallelogram
+# estimate of the bottom-right corner, and the offsets (in modules) the
+# estimate is nudged by when it fails too.
+MAX_ALIGNMENT_TRIES = 3
+_NUDGES = [(dx, dy) for dx in (-2, -1, 0, 1, 2) for dy in (-2, -1, 0, 1, 2) if dx or dy]
+
+DecodedSymbol = namedtuple(
+    "DecodedSymbol",
+    "text data version error_correction mask corners structured_append errors_corrected",
+)
+
+
+class DecodeError(ValueError):
+    pass
+
+
+# Images ------------------------------------------------------------------
+
+def load_image(source):
+    # Returns (width, height, grey) where grey is a list of byte rows, or a
+    # 2-D uint8 array when NumPy is available. Accepts a path, image bytes,
+    # a Pillow image, an array or a list of grey rows. PNG is read here;
+    # other formats need Pillow.
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            source = f.read()
+    if isinstance(source, (bytes, bytearray)):
+        if source[:8] == PNG_SIGNATURE:
+            return _as_grey(*read_png(bytes(source)))
+        try:
+            from PIL import Image
+        except ImportError:
+            raise DecodeError("Only PNG images can be read without Pillow")
+        source = Image.open(io.BytesIO(source))
+    if hasattr(source, "convert"):
+        grey = source.convert("L")
+        width, height = grey.size
+        raw = grey.tobytes()
+        return _as_grey(width, height, [raw[y * width:(y + 1) * width] for y in range(height)])
+    if isinstance(source, (list, tuple)):
+        # Rows of bytes or of ints; NumPy cannot read the former directly.
+        rows = [bytes(row) for row in source]
+        return _as_grey(len(rows[0]), len(rows), rows)
+    if numpy is not None:
+        array = numpy.asarray(source)
+        if array.ndim == 3:
+            array = array[..., :3] @ numpy.array([0.299, 0.587, 0.114])
+        array = array.astype(numpy.uint8)
+        return array.shape[1], array.shape[0], array
+    rows = [bytes(row) for row in source]
+    return len(rows[0]), len(rows), rows
+
+
+def load_rgba(width, height, data):
+    # (width, height, grey) from packed 8-bit RGBA pixels, as Android's
+    # Bitmap.copyPixelsToBuffer writes them. Alpha is ignored, as in
+    # png.read_png.
+    if numpy is not None:
+        pixels = numpy.frombuffer(data, dtype=numpy.uint8).reshape(height, width, 4)
+        grey = pixels[..., :3] @ numpy.array([299, 587, 114]) // 1000
+        return width, height, grey.astype(numpy.uint8)
+    stride = width * 4
+    rows = []
+    for y in range(height):
+        line = data[y * stride:(y + 1) * stride]
+        r, g, b = line[0::4], line[1::4], line[2::4]
+        rows.append(bytes((299 * r[i] + 587 * g[i] + 114 * b[i]) // 1000 for i in range(width)))
+    return width, height, rows
+
+
+def _as_grey(width, height, rows):
+    if numpy is not None:
+        return width, height, numpy.frombuffer(b"".join(rows), dtype=numpy.uint8).reshape(height, width)
+    return width, height, rows
+
+
+def otsu_threshold(histogram):
+    total = sum(histogram)
+    weighted = sum(i * count for i, count in enumerate(histogram))
+    background = background_weight = 0
+    best, threshold = -1.0, 128
+    for i, count in enumerate(histogram):
+        background += count
+        if background == 0:
+            continue
+        foreground = total - background
+        if foreground == 0:
+            break
+        background_weight += i * count
+        mean_back = background_weight / background
+        mean_fore = (weighted - background_weight) / foreground
+        between = background * foreground * (mean_back - mean_fore) ** 2
+        if between > best:
+            best, threshold = between, i
+    return threshold + 0.5
+
+
+def binarize(width, height, grey, window=None):
+    # Dark pixels become 1. The threshold is halfway between the global
+    # (Otsu) threshold and the mean of a window around the pixel, which
+    # follows uneven lighting without turning large uniform areas into
+    # noise. Two-level images such as rendered codes skip the local part.
+    window = window or max(8, min(width, height) // 8)
+    if numpy is not None and not isinstance(grey, list):
+        return _binarize_numpy(width, height, grey, window)
+
+    histogram = [0] * 256
+    for row in grey:
+        for value in set(row):
+            histogram[value] += row.count(value)
+    global_threshold = otsu_threshold(histogram)
+    if sum(1 for count in histogram if count) <= 2:
+        table = bytes(1 if v < global_threshold else 0 for v in range(256))
+        return [bytes(row).translate(table) for row in grey]
+
+    integral = [[0] * (width + 1)]
+    for row in grey:
+        running = 0
+        previous = integral[-1]
+        line = [0]
+        for x, value in enumerate(row):
+            running += value
+            line.append(previous[x + 1] + running)
+        integral.append(line)
+
+    half = window // 2
+    result = []
+    for y in range(height):
+        top, bottom = max(0, y - half), min(height, y + half + 1)
+        upper, lower = integral[top], integral[bottom]
+        row = grey[y]
+        out = bytearray(width)
+        for x in range(width):
+            left, right = max(0, x - half), min(width, x + half + 1)
+            area = (bottom - top) * (right - left)
+            mean = (lower[right] - lower[left] - upper[right] + upper[left]) / area
+            if row[x] < (mean + global_threshold) / 2:
+                out[x] = 1
+        result.append(bytes(out))
+    return result
+
+
+def _binarize_numpy(width, height, grey, window):
+    histogram = numpy.bincount(grey.ravel(), minlength=256)
+    global_threshold = otsu_threshold(histogram.tolist())
+    if numpy.count_nonzero(histogram) <= 2:
+        dark = grey < global_threshold
+    else:
+        integral = numpy.zeros((height + 1, width + 1), dtype=numpy.int64)
+        integral[1:, 1:] = grey.astype(numpy.int64).cumsum(0).cumsum(1)
+        half = window // 2
+        ys = numpy.arange(height)
+        xs = numpy.arange(width)
+        top, bottom = numpy.maximum(ys - half, 0), numpy.minimum(ys + half + 1, height)
+        left, right = numpy.maximum(xs - half, 0), numpy.minimum(xs + half + 1, width)
+        sums = (
+            integral[bottom][:, right] - integral[bottom][:, left]
+            - integral[top][:, right] + integral[top][:, left]
+        )
+        area = numpy.outer(bottom - top, right - left)
+        dark = grey < (sums / area + global_threshold) / 2
+    bits = dark.astype(numpy.uint8)
+    return [bits[y].tobytes() for y in range(height)]
+
+
+# Finder patterns ---------------------------------------------------------
+
+class _Finder:
+    def __init__(self, x, y, module):
+        self.x = x
+        self.y = y
+        self.module = module
+        self.count = 1
+
+    def merge(self, x, y, module):
+        n = self.count
+        self.x = (self.x * n + x) / (n + 1)
+        self.y = (self.y * n + y) / (n + 1)
+        self.module = (self.module * n + module) / (n + 1)
+        self.count += 1
+
+    def __repr__(self):
+        return f"_Finder({self.x:.1f}, {self.y:.1f}, module={self.module:.2f}, count={self.count})"
+
+
+def _ratio_ok(counts, pattern=(1, 1, 3, 1, 1)):
+    total = sum(counts)
+    if total < len(pattern) + 2 or 0 in counts:
+        return False
+    module = total / sum(pattern)
+    tolerance = module / 1.5
+    return all(abs(count - module * unit) < tolerance * unit for count, unit in zip(counts, pattern))
+
+
+def _scan_line(bitmap, width, height, x, y, dx, dy, limit):
+    # Run lengths of the 1:1:3:1:1 pattern through (x, y) along (dx, dy),
+    # and the offset of its centre from (x, y).
+    def run(step_x, step_y):
+        counts = [0, 0, 0]
+        state = 0
+        cx, cy = x, y
+        while 0 <= cx < width and 0 <= cy < height:
+            dark = bitmap[cy][cx]
+            expected = state != 1
+            if dark != expected:
+                state += 1
+                if state == 3:
+                    break
+                continue
+            counts[state] += 1
+            if counts[state] > limit:
+                return None
+            cx += step_x
+            cy += step_y
+        else:
+            return None
+        return counts
+
+    if not bitmap[y][x]:
+        return None
+    backward = run(-dx, -dy)
+    forward = run(dx, dy)
+    if backward is None or forward is None:
+        return None
+    centre = forward[0] + backward[0] - 1
+    counts = [backward[2], backward[1], centre, forward[1], forward[2]]
+    offset = (forward[0] - backward[0]) / 2
+    return counts, offset
+
+
+def _cross_check(bitmap, width, height, x, y, expected_total):
+    # Confirms a horizontal hit vertically, then horizontally again, and
+    # returns the refined centre and module size.
+    limit = expected_total
+    vertical = _scan_line(bitmap, width, height, x, y, 0, 1, limit)
+    if vertical is None or not _ratio_ok(vertical[0]):
+        return None
+    if 5 * abs(sum(vertical[0]) - expected_total) >= 2 * expected_total:
+        return None
+    cy = int(y + vertical[1])
+    horizontal = _scan_line(bitmap, width, height, x, cy, 1, 0, limit)
+    if horizontal is None or not _ratio_ok(horizontal[0]):
+        return None
+    cx = int(x + horizontal[1])
+    diagonal = _scan_line(bitmap, width, height, cx, cy, 1, 1, 2 * limit)
+    if diagonal is None or not _ratio_ok(diagonal[0]):
+        return None
+    module = (sum(vertical[0]) + sum(horizontal[0])) / 14
+    return x + horizontal[1] + 0.5, y + vertical[1] + 0.5, module
+
+
+def find_finders(bitmap, width, height, skip=None):
+    finders = []
+    skip = skip or max(1, height // 400)
+    for y in range(0, height, skip):
+        row = bitmap[y]
+        runs = [(m.start(), m.end() - m.start()) for m in _RE_RUNS.finditer(row)]
+        first = 0 if runs and row[0] else 1
+        for i in range(first, len(runs) - 4, 2):
+            counts = [length for _start, length in runs[i:i + 5]]
+            if not _ratio_ok(counts):
+                continue
+            start, length = runs[i + 2]
+            found = _cross_check(bitmap, width, height, start + length // 2, y, sum(counts))
+            if found is None:
+                continue
+            x, cy, module = found
+            for finder in finders:
+                if abs(finder.x - x) <= module and abs(finder.y - cy) <= module and (
+                    abs(finder.module - module) <= max(1.0, module / 2)
+                ):
+                    finder.merge(x, cy, module)
+                    break
+            else:
+                finders.append(_Finder(x, cy, module))
+    return finders
+
+
+def _distance(a, b):
+    return ((a.x - b.x) ** 2 + (a.y - b.y) ** 2) ** 0.5
+
+
+def _triples(finders):
+    # Candidate (top_left, top_right, bottom_left) groups, best first: the
+    # corner finder sees the other two at right angles and similar distance.
+    scored = []
+    for group in combinations(finders, 3):
+        modules = [f.module for f in group]
+        if max(modules) > 1.5 * min(modules):
+            continue
+        for corner in range(3):
+            a = group[corner]
+            b, c = (group[i] for i in range(3) if i != corner)
+            ab, ac, bc = _distance(a, b), _distance(a, c), _distance(b, c)
+            if not ab or not ac:
+                continue
+            if bc < ab or bc < ac:
+                continue
+            ratio = max(ab, ac) / min(ab, ac)
+            if ratio > 1.6:
+                continue
+            skew = abs(bc ** 2 - ab ** 2 - ac ** 2) / bc ** 2
+            if skew > 0.35:
+                continue
+            module = sum(modules) / 3
+            dimension = (ab + ac) / 2 / module + 7
+            if not 17 <= dimension <= 185:
+                continue
+            # Image y grows downwards, so clockwise TL -> TR -> BL has a
+            # positive cross product.
+            cross = (b.x - a.x) * (c.y - a.y) - (b.y - a.y) * (c.x - a.x)
+            top_right, bottom_left = (b, c) if cross > 0 else (c, b)
+            score = (ratio - 1) + skew - min(f.count for f in group) * 0.01
+            scored.append((score, (a, top_right, bottom_left)))
+    scored.sort(key=lambda item: item[0])
+    return [group for _score, group in scored]
+
+
+# Geometry ----------------------------------------------------------------
+
+def _square_to_quad(points):
+    (x0, y0), (x1, y1), (x2, y2), (x3, y3) = points
+    dx3 = x0 - x1 + x2 - x3
+    dy3 = y0 - y1 + y2 - y3
+    if abs(dx3) < 1e-9 and abs(dy3) < 1e-9:
+        return [[x1 - x0, y1 - y0, 0.0], [x2 - x1, y2 - y1, 0.0], [x0, y0, 1.0]]
+    dx1, dx2 = x1 - x2, x3 - x2
+    dy1, dy2 = y1 - y2, y3 - y2
+    denominator = dx1 * dy2 - dx2 * dy1
+    a13 = (dx3 * dy2 - dx2 * dy3) / denominator
+    a23 = (dx1 * dy3 - dx3 * dy1) / denominator
+    return [
+        [x1 - x0 + a13 * x1, y1 - y0 + a13 * y1, a13],
+        [x3 - x0 + a23 * x3, y3 - y0 + a23 * y3, a23],
+        [x0, y0, 1.0],
+    ]
+
+
+def _adjugate(m):
+    (a, b, c), (d, e, f), (g, h, i) = m
+    return [
+        [e * i - f * h, c * h - b * i, b * f - c * e],
+        [f * g - d * i, a * i - c * g, c * d - a * f],
+        [d * h - e * g, b * g - a * h, a * e - b * d],
+    ]
+
+
+def _multiply(a, b):
+    return [[sum(a[r][k] * b[k][c] for k in range(3)) for c in range(3)] for r in range(3)]
+
+
+def perspective(source, target):
+    # Row-vector transform mapping the quad `source` onto `target`; both
+    # are (x, y) corners in the order (0,0), (1,0), (1,1), (0,1).
+    return _multiply(_adjugate(_square_to_quad(source)), _square_to_quad(target))
+
+
+def _apply(m, u, v):
+    w = m[0][2] * u + m[1][2] * v + m[2][2]
+    return (m[0][0] * u + m[1][0] * v + m[2][0]) / w, (m[0][1] * u + m[1][1] * v + m[2][1]) / w
+
+
+def _alignment_at(bitmap, width, height, x, y, module):
+    # Confirms an alignment pattern through the dark pixel (x, y): the
+    # light-dark-light runs across and down its core are about a module
+    # each and closed by the dark ring, whose corners are dark as well.
+    # Returns the refined centre, or None.
+    limit = int(module * 4) + 2
+
+    def axis(x, y, dx, dy):
+        scan = _scan_line(bitmap, width, height, x, y, dx, dy, limit)
+        if scan is None:
+            return None
+        counts, offset = scan
+        if not all(abs(count - module) < module * 0.7 for count in counts[1:4]):
+            return None
+        if min(counts[0], counts[4]) < module * 0.5:
+            return None
+        return offset
+
+    across = axis(x, y, 1, 0)
+    if across is None:
+        return None
+    cx = int(x + across)
+    down = axis(cx, y, 0, 1)
+    if down is None:
+        return None
+    cy = int(y + down)
+    reach = int(round(module * 2))
+    ring = 0
+    for sx in (-1, 1):
+        for sy in (-1, 1):
+            rx, ry = cx + sx * reach, cy + sy * reach
+            if 0 <= rx < width and 0 <= ry < height:
+                ring += bitmap[ry][rx]
+    if ring < 3:
+        return None
+    return x + across + 0.5, y + down + 0.5
+
+
+def find_alignments(bitmap, width, height, x, y, module):
+    # Alignment pattern centres near the estimate (x, y), closest first.
+    # Every row through a pattern finds it again; those hits are averaged.
+    radius = int(module * 6) + 2
+    found = []
+    for cy in range(max(0, int(y) - radius), min(height, int(y) + radius + 1)):
+        row = bitmap[cy]
+        left = max(0, int(x) - radius)
+        segment = row[left:min(width, int(x) + radius + 1)]
+        runs = [(m.start() + left, m.end() - m.start()) for m in _RE_RUNS.finditer(segment)]
+        for i in range(1, len(runs) - 1):
+            start, length = runs[i]
+            if not row[start] or abs(length - module) >= module * 0.7:
+                continue
+            centre = _alignment_at(bitmap, width, height, start + length // 2, cy, module)
+            if centre is None:
+                continue
+            for hit in found:
+                if abs(hit[0] - centre[0]) <= module and abs(hit[1] - centre[1]) <= module:
+                    n = hit[2]
+                    hit[:] = [(hit[0] * n + centre[0]) / (n + 1), (hit[1] * n + centre[1]) / (n + 1), n + 1]
+                    break
+            else:
+                found.append([centre[0], centre[1], 1])
+    found.sort(key=lambda hit: (hit[0] - x) ** 2 + (hit[1] - y) ** 2)
+    return [(hit[0], hit[1]) for hit in found]
+
+
+def _sample(bitmap, width, height, transform, dimension):
+    # Reads the module centres through the transform; the row-constant
+    # parts of the projection are hoisted out of the inner loop.
+    (a, b, c), (d, e, f), (g, h, k) = transform
+    rows = []
+    for j in range(dimension):
+        v = j + 0.5
+        x0, y0, w0 = d * v + g, e * v + h, f * v + k
+        value = 0
+        for i in range(dimension):
+            u = i + 0.5
+            w = c * u + w0
+            xi, yi = int((a * u + x0) / w), int((b * u + y0) / w)
+            if not (0 <= xi < width and 0 <= yi < height):
+                if -1 <= xi <= width and -1 <= yi <= height:
+                    xi, yi = min(max(xi, 0), width - 1), min(max(yi, 0), height - 1)
+                else:
+                    return None
+            value = (value << 1) | bitmap[yi][xi]
+        rows.append(value)
+    return rows
+
+
+# Symbol decoding ---------------------------------------------------------
+
+def _bit(rows, size, r, c):
+    return (rows[r] >> (size - 1 - c)) & 1
+
+
+def _nearest(words, value, max_distance=3):
+    best = None
+    for word, *result in words:
+        distance = bin(word ^ value).count("1")
+        if distance <= max_distance and (best is None or distance < best[0]):
+            best = (distance, result)
+    return best
+
+
+def read_format(rows, size):
+    best = None
+    for positions in format_positions(size):
+        value = sum(_bit(rows, size, r, c) << i for i, (r, c) in enumerate(positions))
+        match = _nearest(_FORMAT_WORDS, value)
+        if match and (best is None or match[0] < best[0]):
+            best = match
+    if best is None:
+        raise DecodeError("Unreadable format information")
+    level, mask = best[1]
+    return level, mask
+
+
+def read_version(rows, size):
+    version = (size - 17) // 4
+    if version < 7:
+        return version
+    best = None
+    for positions in version_positions(size):
+        value = sum(_bit(rows, size, r, c) << i for i, (r, c) in enumerate(positions))
+        match = _nearest(_VERSION_WORDS, value)
+        if match and (best is None or match[0] < best[0]):
+            best = match
+    if best is None:
+        raise DecodeError("Unreadable version information")
+    return best[1][0]
+
+
+def rs_correct(block, ecc_length):
+    # Corrects a Reed-Solomon block in place (generator roots a^0 ..
+    # a^(ecc_length-1)) and returns the number of corrected bytes.
+    n = len(block)
+    syndromes = []
+    for j in range(ecc_length):
+        value = 0
+        for byte in block:
+            value = (gf_mul(value, _EXP[j]) ^ byte)
+        syndromes.append(value)
+    if not any(syndromes):
+        return 0
+
+    # Berlekamp-Massey; polynomials are lowest degree first.
+    locator, previous = [1], [1]
+    length, shift, last_discrepancy = 0, 1, 1
+    for k in range(ecc_length):
+        discrepancy = syndromes[k]
+        for i in range(1, length + 1):
+            if i < len(locator):
+                discrepancy ^= gf_mul(locator[i], syndromes[k - i])
+        if discrepancy == 0:
+            shift += 1
+            continue
+        scale = _gf_div(discrepancy, last_discrepancy)
+        updated = locator + [0] * max(0, len(previous) + shift - len(locator))
+        for i, coefficient in enumerate(previous):
+            updated[i + shift] ^= gf_mul(scale, coefficient)
+        if 2 * length <= k:
+            previous, length, last_discrepancy, shift = locator, k + 1 - length, discrepancy, 1
+        else:
+            shift += 1
+        locator = updated
+    while len(locator) > 1 and locator[-1] == 0:
+        locator.pop()
+    errors = len(locator) - 1
+    if errors * 2 > ecc_length:
+        raise DecodeError("Too many errors to correct")
+
+    evaluator = [0] * ecc_length
+    for i, s in enumerate(syndromes):
+        for j, l in enumerate(locator):
+            if i + j < ecc_length:
+                evaluator[i + j] ^= gf_mul(s, l)
+
+    found = 0
+    for position in range(n):
+        power = n - 1 - position
+        inverse = _EXP[(255 - power) % 255]
+        if _poly_eval(locator, inverse) != 0:
+            continue
+        derivative = 0
+        for i in range(1, len(locator), 2):
+            derivative ^= gf_mul(locator[i], _gf_pow(inverse, i - 1))
+        if derivative == 0:
+            raise DecodeError("Reed-Solomon correction failed")
+        magnitude = gf_mul(_EXP[power], _gf_div(_poly_eval(evaluator, inverse), derivative))
+        block[position] ^= magnitude
+        found += 1
+    if found != errors:
+        raise DecodeError("Reed-Solomon correction failed")
+    return found
+
+
+def _gf_div(a, b):
+    if a == 0:
+        return 0
+    return _EXP[(_LOG[a] - _LOG[b]) % 255]
+
+
+def _gf_pow(a, exponent):
+    if exponent == 0:
+        return 1
+    if a == 0:
+        return 0
+    return _EXP[(_LOG[a] * exponent) % 255]
+
+
+def _poly_eval(poly, x):
+    value = 0
+    for coefficient in reversed(poly):
+        value = gf_mul(value, x) ^ coefficient
+    return value
+
+
+def _codewords(rows, size, version, mask):
+    symbol = template(version)
+    masks = symbol.mask_rows[mask]
+    strings = [format(row ^ m, f"0{size}b") for row, m in zip(rows, masks)]
+    bits = "".join([strings[r][c] for r, c in symbol.order[:symbol.stream_bits]])
+    return list(int(bits, 2).to_bytes(symbol.stream_bits // 8, "big"))
+
+
+def _correct_blocks(codewords, version, level):
+    block_count = NUM_ERROR_CORRECTION_BLOCKS[level][version]
+    ecc_length = ECC_CODEWORDS_PER_BLOCK[level][version]
+    total = raw_data_modules(version) // 8
+    short_count = block_count - total % block_count
+    short_length = total // block_count - ecc_length
+
+    lengths = [short_length + (0 if i < short_count else 1) for i in range(block_count)]
+    blocks = [[] for _ in range(block_count)]
+    offset = 0
+    for i in range(short_length + 1):
+        for b in range(block_count):
+            if i < lengths[b]:
+                blocks[b].append(codewords[offset])
+                offset += 1
+    for i in range(ecc_length):
+        for b in range(block_count):
+            blocks[b].append(codewords[offset])
+            offset += 1
+
+    data = []
+    corrected = 0
+    for b, block in enumerate(blocks):
+        corrected += rs_correct(block, ecc_length)
+        data.extend(block[:lengths[b]])
+    return bytes(data), corrected
+
+
+class _BitReader:
+    def __init__(self, data):
+        self.value = int.from_bytes(data, "big")
+        self.length = len(data) * 8
+        self.position = 0
+
+    def available(self):
+        return self.length - self.position
+
+    def read(self, count):
+        if count > self.available():
+            raise DecodeError("Bit stream ended early")
+        self.position += count
+        return (self.value >> (self.length - self.position)) & ((1 << count) - 1)
+
+
+def parse_segments(data, version):
+    # Returns (text, raw bytes, structured append tuple or None).
+    reader = _BitReader(data)
+    pieces = []
+    raw = bytearray()
+    encoding = None
+    structured = None
+    while reader.available() >= 4:
+        mode = reader.read(4)
+        if mode == 0:
+            break
+        if mode == MODE_STRUCTURED_APPEND:
+            structured = (reader.read(4), reader.read(4) + 1, reader.read(8))
+            continue
+        if mode == MODE_ECI:
+            first = reader.read(8)
+            if first & 0x80 == 0:
+                designator = first
+            elif first & 0xC0 == 0x80:
+                designator = ((first & 0x3F) << 8) | reader.read(8)
+            else:
+                designator = ((first & 0x1F) << 16) | reader.read(16)
+            encoding = ECI_ENCODINGS.get(designator)
+            continue
+        if mode == MODE_FNC1_FIRST:
+            continue
+        if mode == MODE_FNC1_SECOND:
+            reader.read(8)
+            continue
+
+        if mode == MODE_KANJI:
+            count = reader.read(8 if version < 10 else 10 if version < 27 else 12)
+            chunk = bytearray()
+            for _ in range(count):
+                value = reader.read(13)
+                value = (value // 0xC0) << 8 | (value % 0xC0)
+                value += 0x8140 if value < 0x1F00 else 0xC140
+                chunk += value.to_bytes(2, "big")
+            pieces.append(bytes(chunk).decode("shift_jis", "replace"))
+            raw += chunk
+            continue
+        if mode not in (MODE_NUMBER, MODE_ALPHA_NUM, MODE_BYTE):
+            raise DecodeError(f"Unknown mode {mode}")
+
+        count = reader.read(length_bits(mode, version))
+        if mode == MODE_NUMBER:
+            digits = []
+            while count >= 3:
+                digits.append(f"{reader.read(10):03d}")
+                count -= 3
+            if count == 2:
+                digits.append(f"{reader.read(7):02d}")
+            elif count == 1:
+                digits.append(str(reader.read(4)))
+            chunk = "".join(digits).encode("ascii")
+            pieces.append(chunk.decode("ascii"))
+        elif mode == MODE_ALPHA_NUM:
+            chars = bytearray()
+            while count >= 2:
+                value = reader.read(11)
+                chars += bytes((ALPHA_NUM[value // 45], ALPHA_NUM[value % 45]))
+                count -= 2
+            if count:
+                chars.append(ALPHA_NUM[reader.read(6)])
+            chunk = bytes(chars)
+            pieces.append(chunk.decode("ascii"))
+        else:
+            chunk = bytes(reader.read(8) for _ in range(count))
+            pieces.append(chunk if encoding is None else chunk.decode(encoding, "replace"))
+        raw += chunk
+
+    text = "".join(_decode_bytes(piece) if isinstance(piece, bytes) else piece for piece in pieces)
+    return text, bytes(raw), structured
+
+
+def _decode_bytes(data):
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        return data.decode("iso-8859-1")
+
+
+def decode_grid(rows, size=None, corners=None):
+    # Decodes a sampled module grid: integer rows (MSB = column 0) such as
+    # encoder.QRMatrix.rows, or rows of truthy/falsy modules.
+    if rows and not isinstance(rows[0], int):
+        size = len(rows)
+        rows = [int("".join("1" if cell else "0" for cell in row), 2) for row in rows]
+    size = size or len(rows)
+    if size < 21 or (size - 17) % 4:
+        raise DecodeError(f"Invalid symbol size {size}")
+    version = read_version(rows, size)
+    if version * 4 + 17 != size:
+        raise DecodeError("Version information does not match the symbol size")
+    level, mask = read_format(rows, size)
+    data, corrected = _correct_blocks(_codewords(rows, size, version, mask), version, level)
+    text, raw, structured = parse_segments(data, version)
+    return DecodedSymbol(text, raw, version, level, mask, corners, structured, corrected)
+
+
+def _transpose(rows, size):
+    strings = [format(row, f"0{size}b") for row in rows]
+    return [int("".join(column), 2) for column in zip(*strings)]
+
+
+def _decode_triple(bitmap, width, height, top_left, top_right, bottom_left):
+    module = (top_left.module + top_right.module + bottom_left.module) / 3
+    estimate = ((_distance(top_left, top_right) + _distance(top_left, bottom_left)) / 2) / module + 7
+    base = int(round((estimate - 17) / 4)) * 4 + 17
+    last_error = DecodeError("No symbol")
+    for dimension in (base, base - 4, base + 4):
+        if not 21 <= dimension <= 177:
+            continue
+        try:
+            return _decode_at(bitmap, width, height, top_left, top_right, bottom_left, module, dimension)
+        except DecodeError as e:
+            last_error = e
+    raise last_error
+
+
+def _decode_at(bitmap, width, height, top_left, top_right, bottom_left, module, dimension, retry=True):
+    corner = dimension - 3.5
+    bottom_right = (top_right.x - top_left.x + bottom_left.x, top_right.y - top_left.y + bottom_left.y)
+    # (bottom-right point, its position in module units) to try, best
+    # first: the alignment pattern 3 modules in from the finder centres'
+    # corner pins down perspective; the parallelogram estimate is the
+    # fallback. Version 1 has no alignment pattern, so there the estimate
+    # is also nudged a module at a time, since perspective pulls the true
+    # corner off it.
+    anchors = []
+    if dimension > 21:
+        fraction = 1 - 3 / (dimension - 7)
+        estimate = (
+            top_left.x + fraction * (bottom_right[0] - top_left.x),
+            top_left.y + fraction * (bottom_right[1] - top_left.y),
+        )
+        alignments = find_alignments(bitmap, width, height, estimate[0], estimate[1], module)
+        anchors.extend((alignment, dimension - 6.5) for alignment in alignments[:MAX_ALIGNMENT_TRIES])
+    anchors.append((bottom_right, corner))
+    if dimension == 21:
+        for dx, dy in _NUDGES:
+            anchors.append(((bottom_right[0] + dx * module, bottom_right[1] + dy * module), corner))
+
+    last_error = DecodeError("No symbol")
+    for anchor, source_corner in anchors:
+        transform = perspective(
+            [(3.5, 3.5), (corner, 3.5), (source_corner, source_corner), (3.5, corner)],
+            [(top_left.x, top_left.y), (top_right.x, top_right.y), anchor, (bottom_left.x, bottom_left.y)],
+        )
+        rows = _sample(bitmap, width, height, transform, dimension)
+        if rows is None:
+            last_error = DecodeError("Symbol extends past the image")
+            continue
+
+        try:
+            version = read_version(rows, dimension) if dimension >= 45 else (dimension - 17) // 4
+            if version * 4 + 17 != dimension:
+                # The version information is more reliable than the estimate
+                # from finder spacing; resample once at the size it gives.
+                if not retry:
+                    raise DecodeError("Version information does not match the symbol size")
+                return _decode_at(
+                    bitmap, width, height, top_left, top_right, bottom_left, module, version * 4 + 17,
+                    retry=False
+                )
+
+            corners = [
+                _apply(transform, u, v) for u, v in ((0, 0), (dimension, 0), (dimension, dimension), (0, dimension))
+            ]
+            try:
+                return decode_grid(rows, dimension, corners)
+            except DecodeError:
+                # Mirrored symbols read correctly once transposed.
+                return decode_grid(_transpose(rows, dimension), dimension, corners)
+        except DecodeError as e:
+            last_error = e
+    raise last_error
+
+
+def _inside(corners, finder):
+    # Whether the finder's centre lies within a decoded symbol's outline.
+    sign = 0
+    for (x0, y0), (x1, y1) in zip(corners, corners[1:] + corners[:1]):
+        cross = (x1 - x0) * (finder.y - y0) - (y1 - y0) * (finder.x - x0)
+        if cross and sign and (cross > 0) != (sign > 0):
+            return False
+        sign = sign or cross
+    return True
+
+
+def decode(image):
+    # Every QR symbol found in the image, as DecodedSymbol tuples. Light on
+    # dark codes are found by a second pass over the inverted image.
+    width, height, grey = load_image(image)
+    bitmap = binarize(width, height, grey)
+    results = _decode_bitmap(bitmap, width, height)
+    if not results:
+        results = _decode_bitmap([row.translate(_INVERT) for row in bitmap], width, height)
+    return results
+
+
+def _decode_bitmap(bitmap, width, height):
+    finders = find_finders(bitmap, width, height)
+    # Like zxing, trust patterns confirmed on several rows once there are
+    # enough of them; single hits are usually finder-like data.
+    confirmed = [finder for finder in finders if finder.count > 1]
+    if len(confirmed) >= 3:
+        finders = confirmed
+    results = []
+    used = set()
+    for group in _triples(finders):
+        if any(id(finder) in used for finder in group):
+            continue
+        if any(_inside(symbol.corners, finder) for symbol in results for finder in group):
+            continue
+        try:
+            symbol = _decode_triple(bitmap, width, height, *group)
+        except DecodeError:
+            continue
+        used.update(id(finder) for finder in group)
+        results.append(symbol)
+    return results
@@ -0,0 +1,84 @@
+import asyncio
+import threading
+from collections import deque
+
+
+class UIDispatcher:
+    # Runs callables on the UI thread. Calls queued while a hop is pending
+    # ride along with it, so a burst of N updates costs one post() and one
+    # bridge crossing instead of N. Subclasses implement post(), which must
+    # arrange for drain() to run once on the UI thread.
+    def __init__(self):
+        self.hops = 0
+        self.calls = 0
+        self.largest_batch = 0
+
+        self._queue = deque()
+        self._scheduled = False
+        self._lock = threading.Lock()
+
+    def post(self):
+        raise NotImplementedError
+
+    def call_soon(self, func, *args):
+        self._enqueue(func, args, None, None)
+
+    def call_on_ui(self, func, *args):
+        # Returns an asyncio future for func's result (or exception).
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        self._enqueue(func, args, loop, future)
+        return future
+
+    def stats(self):
+        return {
+            "hops": self.hops,
+            "calls": self.calls,
+            "largest_batch": self.largest_batch,
+            "queued": len(self._queue),
+        }
+
+    def drain(self):
+        self.hops += 1
+        batch = 0
+        while True:
+            with self._lock:
+                if not self._queue:
+                    self._scheduled = False
+                    break
+                func, args, loop, future = self._queue.popleft()
+            batch += 1
+            try:
+                result = func(*args)
+            except Exception as e:
+                if future is None:
+                    print("UI call error:", e)
+                else:
+                    loop.call_soon_threadsafe(_resolve, future, None, e)
+            else:
+                if future is not None:
+                    loop.call_soon_threadsafe(_resolve, future, result, None)
+        self.calls += batch
+        self.largest_batch = max(self.largest_batch, batch)
+
+    def _enqueue(self, func, args, loop, future):
+        with self._lock:
+            self._queue.append((func, args, loop, future))
+            if self._scheduled:
+                return
+            self._scheduled = True
+        try:
+            self.post()
+        except Exception:
+            with self._lock:
+                self._scheduled = False
+            raise
+
+
+def _resolve(future, result, error):
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
@@ -0,0 +1,702 @@
+import re
+import struct
+from functools import lru_cache
+from operator import itemgetter
+
+
+# Bump when the produced matrices change, so cached renders are not reused.
+ENCODER_VERSION = 1
+
+ERROR_CORRECTION_LEVELS = ("L", "M", "Q", "H")
+
+# Two-bit level indicator used in the format information.
+FORMAT_BITS = {"L": 1, "M": 0, "Q": 3, "H": 2}
+
+# Indexed [level][version]; index 0 is unused.
+ECC_CODEWORDS_PER_BLOCK = {
+    "L": (-1, 7, 10, 15, 20, 26, 18, 20, 24, 30, 18, 20, 24, 26, 30, 22, 24, 28, 30, 28, 28,
+          28, 28, 30, 30, 26, 28, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30),
+    "M": (-1, 10, 16, 26, 18, 24, 16, 18, 22, 22, 26, 30, 22, 22, 24, 24, 28, 28, 26, 26, 26,
+          26, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28),
+    "Q": (-1, 13, 22, 18, 26, 18, 24, 18, 22, 20, 24, 28, 26, 24, 20, 30, 24, 28, 28, 26, 30,
+          28, 30, 30, 30, 30, 28, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30),
+    "H": (-1, 17, 28, 22, 16, 22, 28, 26, 26, 24, 28, 24, 28, 22, 24, 24, 30, 28, 28, 26, 28,
+          30, 24, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30),
+}
+NUM_ERROR_CORRECTION_BLOCKS = {
+    "L": (-1, 1, 1, 1, 1, 1, 2, 2, 2, 2, 4, 4, 4, 4, 4, 6, 6, 6, 6, 7, 8,
+          8, 9, 9, 10, 12, 12, 12, 13, 14, 15, 16, 17, 18, 19, 19, 20, 21, 22, 24, 25),
+    "M": (-1, 1, 1, 1, 2, 2, 4, 4, 4, 5, 5, 5, 8, 9, 9, 10, 10, 11, 13, 14, 16,
+          17, 17, 18, 20, 21, 23, 25, 26, 28, 29, 31, 33, 35, 37, 38, 40, 43, 45, 47, 49),
+    "Q": (-1, 1, 1, 2, 2, 4, 4, 6, 6, 8, 8, 8, 10, 12, 16, 12, 17, 16, 18, 21, 20,
+          23, 23, 25, 27, 29, 34, 34, 35, 38, 40, 43, 45, 48, 51, 53, 56, 59, 62, 65, 68),
+    "H": (-1, 1, 1, 2, 4, 4, 4, 5, 6, 8, 8, 11, 11, 16, 16, 18, 16, 19, 21, 25, 25,
+          25, 34, 30, 32, 35, 37, 40, 42, 45, 48, 51, 54, 57, 60, 63, 66, 70, 74, 77, 81),
+}
+
+MODE_NUMBER = 1
+MODE_ALPHA_NUM = 2
+MODE_STRUCTURED_APPEND = 3
+MODE_BYTE = 4
+# A structured append sequence has at most this many symbols.
+MAX_SEQUENCE = 16
+
+ALPHA_NUM = b"0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ $%*+-./:"
+_ALPHA_NUM_VALUES = {c: i for i, c in enumerate(ALPHA_NUM)}
+_RE_ALPHA_NUM = re.compile(b"[" + re.escape(ALPHA_NUM) + b"]*\\Z")
+
+PAD_BYTES = (0xEC, 0x11)
+
+_G15 = 0b10100110111
+_G15_MASK = 0b101010000010010
+_G18 = 0b1111100100101
+
+# Penalty rule N3 looks for 1:1:3:1:1 finder-like runs with four light
+# modules on either side.
+_RE_RUNS = re.compile("0{5,}|1{5,}")
+_RE_FINDER_LIKE = re.compile("(?=10111010000|00001011101)")
+
+_MASK_FUNCTIONS = (
+    lambda i, j: (i + j) % 2 == 0,
+    lambda i, j: i % 2 == 0,
+    lambda i, j: j % 3 == 0,
+    lambda i, j: (i + j) % 3 == 0,
+    lambda i, j: (i // 2 + j // 3) % 2 == 0,
+    lambda i, j: (i * j) % 2 + (i * j) % 3 == 0,
+    lambda i, j: ((i * j) % 2 + (i * j) % 3) % 2 == 0,
+    lambda i, j: ((i * j) % 3 + (i + j) % 2) % 2 == 0,
+)
+
+
+class DataOverflowError(ValueError):
+    pass
+
+
+# GF(256) arithmetic over x^8 + x^4 + x^3 + x^2 + 1.
+_EXP = [0] * 512
+_LOG = [0] * 256
+_value = 1
+for _i in range(255):
+    _EXP[_i] = _value
+    _LOG[_value] = _i
+    _value <<= 1
+    if _value & 0x100:
+        _value ^= 0x11D
+for _i in range(255, 512):
+    _EXP[_i] = _EXP[_i - 255]
+del _i, _value
+
+
+def gf_mul(a, b):
+    if a == 0 or b == 0:
+        return 0
+    return _EXP[_LOG[a] + _LOG[b]]
+
+
+@lru_cache(maxsize=None)
+def _generator_log(degree):
+    # Coefficients (as logarithms) of prod(x - a^i) for i < degree, highest
+    # power first and with the leading 1 dropped.
+    poly = [1]
+    for i in range(degree):
+        factor = _EXP[i]
+        poly = [a ^ gf_mul(b, factor) for a, b in zip(poly + [0], [0] + poly)]
+    return tuple(_LOG[c] for c in poly[1:])
+
+
+@lru_cache(maxsize=None)
+def _remainder_table(degree):
+    # For every possible feedback byte, the generator multiplied by it and
+    # packed into one integer, so each data byte costs a shift and an XOR.
+    generator = _generator_log(degree)
+    table = [0] * 256
+    for factor in range(1, 256):
+        log_factor = _LOG[factor]
+        table[factor] = int.from_bytes(bytes(_EXP[log_factor + c] for c in generator), "big")
+    return table
+
+
+def rs_remainder(data, degree):
+    table = _remainder_table(degree)
+    shift = 8 * (degree - 1)
+    mask = (1 << (8 * degree)) - 1
+    remainder = 0
+    for byte in data:
+        remainder = ((remainder << 8) & mask) ^ table[byte ^ (remainder >> shift)]
+    return list(remainder.to_bytes(degree, "big"))
+
+
+class Segment:
+    def __init__(self, mode, data):
+        self.mode = mode
+        self.data = data
+
+    def __len__(self):
+        return len(self.data)
+
+    def __repr__(self):
+        return f"Segment({self.mode}, {self.data!r})"
+
+    def __eq__(self, other):
+        return isinstance(other, Segment) and (self.mode, self.data) == (other.mode, other.data)
+
+    def payload_bits(self):
+        count = len(self.data)
+        if self.mode == MODE_STRUCTURED_APPEND:
+            return 16
+        if self.mode == MODE_NUMBER:
+            return count // 3 * 10 + (0, 4, 7)[count % 3]
+        if self.mode == MODE_ALPHA_NUM:
+            return count // 2 * 11 + (count % 2) * 6
+        return count * 8
+
+    def bit_length(self, version):
+        if self.mode == MODE_STRUCTURED_APPEND:
+            return 4 + 16
+        return 4 + length_bits(self.mode, version) + self.payload_bits()
+
+    def write(self, buffer, version):
+        buffer.put(self.mode, 4)
+        if self.mode == MODE_STRUCTURED_APPEND:
+            # Header only: no character count, just sequence and parity.
+            buffer.put(int.from_bytes(self.data, "big"), 16)
+            return
+        buffer.put(len(self.data), length_bits(self.mode, version))
+        data = self.data
+        if self.mode == MODE_NUMBER:
+            for i in range(0, len(data), 3):
+                chunk = data[i:i + 3]
+                buffer.put(int(chunk), (0, 4, 7, 10)[len(chunk)])
+        elif self.mode == MODE_ALPHA_NUM:
+            values = _ALPHA_NUM_VALUES
+            for i in range(0, len(data) - 1, 2):
+                buffer.put(values[data[i]] * 45 + values[data[i + 1]], 11)
+            if len(data) % 2:
+                buffer.put(values[data[-1]], 6)
+        else:
+            buffer.put(int.from_bytes(data, "big"), len(data) * 8)
+
+
+class BitBuffer:
+    def __init__(self):
+        self.value = 0
+        self.length = 0
+
+    def __len__(self):
+        return self.length
+
+    def put(self, value, length):
+        self.value = (self.value << length) | value
+        self.length += length
+
+    def to_bytes(self):
+        pad = -self.length % 8
+        return (self.value << pad).to_bytes((self.length + pad) // 8, "big")
+
+
+def structured_append_header(index, total, parity):
+    # Leads each symbol of a sequence: its position, the symbol count and
+    # the XOR of every byte of the whole message.
+    if not 1 <= total <= MAX_SEQUENCE or not 0 <= index < total:
+        raise ValueError(f"Invalid structured append position {index} of {total}")
+    return Segment(MODE_STRUCTURED_APPEND, bytes((index << 4 | (total - 1), parity & 0xFF)))
+
+
+def to_bytes(data):
+    if isinstance(data, str):
+        return data.encode("utf-8")
+    return bytes(data)
+
+
+def best_mode(data):
+    if data.isdigit():
+        return MODE_NUMBER
+    if _RE_ALPHA_NUM.match(data):
+        return MODE_ALPHA_NUM
+    return MODE_BYTE
+
+
+def make_segments(data):
+    data = to_bytes(data)
+    return [Segment(best_mode(data), data)]
+
+
+# Per-character costs in sixths of a bit: numeric packs 3 digits into 10
+# bits, alphanumeric 2 characters into 11 bits, byte mode 8 bits each.
+_SEGMENT_MODES = (MODE_BYTE, MODE_ALPHA_NUM, MODE_NUMBER)
+_CHAR_COSTS = {MODE_BYTE: 48, MODE_ALPHA_NUM: 33, MODE_NUMBER: 20}
+_DIGITS = frozenset(b"0123456789")
+_ALPHA_NUM_CHARS = frozenset(ALPHA_NUM)
+
+
+def optimal_segments(data, version):
+    # Minimum-cost split into numeric / alphanumeric / byte runs for the
+    # character count field widths of `version`, by dynamic programming
+    # over "cheapest encoding of the prefix that ends in mode m".
+    data = to_bytes(data)
+    if not data:
+        return make_segments(data)
+
+    modes = _SEGMENT_MODES
+    head_costs = [(4 + length_bits(mode, version)) * 6 for mode in modes]
+    previous = list(head_costs)
+    choices = []
+    for byte in data:
+        allowed = (True, byte in _ALPHA_NUM_CHARS, byte in _DIGITS)
+        current = [None] * 3
+        came_from = [None] * 3
+        for m, mode in enumerate(modes):
+            if allowed[m]:
+                current[m] = previous[m] + _CHAR_COSTS[mode]
+                came_from[m] = m
+
+        # Optionally end the segment after this character and start a new
+        # one in another mode.
+        ended = [None] * 3
+        ended_from = [None] * 3
+        for j in range(3):
+            for k in range(3):
+                if current[k] is None:
+                    continue
+                cost = (current[k] + 5) // 6 * 6 + head_costs[j]
+                if ended[j] is None or cost < ended[j]:
+                    ended[j] = cost
+                    ended_from[j] = k
+        for j in range(3):
+            if current[j] is None or ended[j] < current[j]:
+                current[j] = ended[j]
+                came_from[j] = ended_from[j]
+
+        choices.append(came_from)
+        previous = current
+
+    state = min(range(3), key=lambda m: ((previous[m] + 5) // 6, m))
+    char_modes = [None] * len(data)
+    for i in range(len(data) - 1, -1, -1):
+        state = choices[i][state]
+        char_modes[i] = modes[state]
+
+    segments = []
+    start = 0
+    for i in range(1, len(data) + 1):
+        if i == len(data) or char_modes[i] != char_modes[start]:
+            segments.append(Segment(char_modes[start], data[start:i]))
+            start = i
+    return segments
+
+
+def plan_encoding(data, error_correction="L", min_version=1, max_version=40,
+                  optimize=True, boost_error_correction=False, header=()):
+    # Returns (segments, version, error_correction) for the smallest
+    # symbol that holds `data`. With boost_error_correction the level is
+    # raised as far as possible without growing the symbol. header
+    # segments (structured append) go in front of the data.
+    if error_correction not in FORMAT_BITS:
+        raise ValueError(f"Invalid error correction level: {error_correction!r}")
+
+    found = None
+    for low, high in ((1, 9), (10, 26), (27, 40)):
+        low, high = max(low, min_version), min(high, max_version)
+        if low > high:
+            continue
+        segments = list(header) + (optimal_segments(data, low) if optimize else make_segments(data))
+        bits = segments_bit_length(segments, low)
+        for version in range(low, high + 1):
+            if bits <= data_capacity_bits(version, error_correction):
+                found = segments, version, bits
+                break
+        if found:
+            break
+    if found is None:
+        raise DataOverflowError(
+            f"Data too long for a version {max_version} QR code at level {error_correction}"
+        )
+
+    segments, version, bits = found
+    if boost_error_correction:
+        for level in ("H", "Q", "M"):
+            if level == error_correction:
+                break
+            if bits <= data_capacity_bits(version, level):
+                error_correction = level
+                break
+    return segments, version, error_correction
+
+
+def length_bits(mode, version):
+    if version < 10:
+        return {MODE_NUMBER: 10, MODE_ALPHA_NUM: 9, MODE_BYTE: 8}[mode]
+    if version < 27:
+        return {MODE_NUMBER: 12, MODE_ALPHA_NUM: 11, MODE_BYTE: 16}[mode]
+    return {MODE_NUMBER: 14, MODE_ALPHA_NUM: 13, MODE_BYTE: 16}[mode]
+
+
+def raw_data_modules(version):
+    result = (16 * version + 128) * version + 64
+    if version >= 2:
+        align_count = version // 7 + 2
+        result -= (25 * align_count - 10) * align_count - 55
+        if version >= 7:
+            result -= 36
+    return result
+
+
+def data_codewords(version, error_correction):
+    return (
+        raw_data_modules(version) // 8
+        - ECC_CODEWORDS_PER_BLOCK[error_correction][version]
+        * NUM_ERROR_CORRECTION_BLOCKS[error_correction][version]
+    )
+
+
+def data_capacity_bits(version, error_correction):
+    return data_codewords(version, error_correction) * 8
+
+
+def alignment_positions(version):
+    if version == 1:
+        return []
+    count = version // 7 + 2
+    size = version * 4 + 17
+    step = 26 if version == 32 else (version * 4 + count * 2 + 1) // (count * 2 - 2) * 2
+    return [6] + [size - 7 - i * step for i in range(count - 2, -1, -1)]
+
+
+def segments_bit_length(segments, version):
+    return sum(segment.bit_length(version) for segment in segments)
+
+
+def fit_version(segments, error_correction="L", min_version=1, max_version=40):
+    for version in range(min_version, max_version + 1):
+        if segments_bit_length(segments, version) <= data_capacity_bits(version, error_correction):
+            return version
+    raise DataOverflowError(
+        f"Data too long for a version {max_version} QR code at level {error_correction}"
+    )
+
+
+def build_codewords(segments, version, error_correction):
+    buffer = BitBuffer()
+    for segment in segments:
+        segment.write(buffer, version)
+
+    capacity = data_capacity_bits(version, error_correction)
+    if len(buffer) > capacity:
+        raise DataOverflowError(f"Data size ({len(buffer)}) > size available ({capacity})")
+
+    buffer.put(0, min(capacity - len(buffer), 4))
+    buffer.put(0, -len(buffer) % 8)
+    data = list(buffer.to_bytes())
+    for i in range(capacity // 8 - len(data)):
+        data.append(PAD_BYTES[i % 2])
+
+    block_count = NUM_ERROR_CORRECTION_BLOCKS[error_correction][version]
+    ecc_length = ECC_CODEWORDS_PER_BLOCK[error_correction][version]
+    total = raw_data_modules(version) // 8
+    short_count = block_count - total % block_count
+    short_length = total // block_count - ecc_length
+
+    blocks = []
+    ecc_blocks = []
+    offset = 0
+    for i in range(block_count):
+        length = short_length + (0 if i < short_count else 1)
+        block = data[offset:offset + length]
+        offset += length
+        blocks.append(block)
+        ecc_blocks.append(rs_remainder(block, ecc_length))
+
+    result = []
+    for i in range(short_length + 1):
+        for block in blocks:
+            if i < len(block):
+                result.append(block[i])
+    for i in range(ecc_length):
+        for ecc in ecc_blocks:
+            result.append(ecc[i])
+    return result
+
+
+def format_bits(error_correction, mask):
+    data = (FORMAT_BITS[error_correction] << 3) | mask
+    remainder = data << 10
+    for shift in range(4, -1, -1):
+        if remainder & (1 << (shift + 10)):
+            remainder ^= _G15 << shift
+    return ((data << 10) | remainder) ^ _G15_MASK
+
+
+def version_bits(version):
+    remainder = version << 12
+    for shift in range(5, -1, -1):
+        if remainder & (1 << (shift + 12)):
+            remainder ^= _G18 << shift
+    return (version << 12) | remainder
+
+
+def format_positions(size):
+    # (row, col) pairs for bit i of the format information, in the order of
+    # the two copies.
+    first = []
+    for i in range(15):
+        if i < 6:
+            first.append((i, 8))
+        elif i < 8:
+            first.append((i + 1, 8))
+        else:
+            first.append((size - 15 + i, 8))
+    second = []
+    for i in range(15):
+        if i < 8:
+            second.append((8, size - i - 1))
+        elif i < 9:
+            second.append((8, 15 - i))
+        else:
+            second.append((8, 14 - i))
+    return first, second
+
+
+def version_positions(size):
+    first = [(i // 3, i % 3 + size - 11) for i in range(18)]
+    second = [(i % 3 + size - 11, i // 3) for i in range(18)]
+    return first, second
+
+
+class _Template:
+    # Everything about a symbol that depends only on its version: the
+    # function patterns, the data module order and the masks restricted to
+    # data modules. Rows are integers with column 0 as the most significant
+    # of `size` bits.
+
+    def __init__(self, version):
+        self.version = version
+        size = self.size = version * 4 + 17
+        grid = [[None] * size for _ in range(size)]
+
+        def finder(row, col):
+            for r in range(-1, 8):
+                for c in range(-1, 8):
+                    if 0 <= row + r < size and 0 <= col + c < size:
+                        grid[row + r][col + c] = (
+                            (0 <= r <= 6 and c in (0, 6))
+                            or (0 <= c <= 6 and r in (0, 6))
+                            or (2 <= r <= 4 and 2 <= c <= 4)
+                        )
+
+        finder(0, 0)
+        finder(size - 7, 0)
+        finder(0, size - 7)
+
+        positions = alignment_positions(version)
+        for row in positions:
+            for col in positions:
+                if grid[row][col] is not None:
+                    continue
+                for r in range(-2, 3):
+                    for c in range(-2, 3):
+                        grid[row + r][col + c] = r in (-2, 2) or c in (-2, 2) or (r == 0 and c == 0)
+
+        for i in range(8, size - 8):
+            if grid[i][6] is None:
+                grid[i][6] = i % 2 == 0
+            if grid[6][i] is None:
+                grid[6][i] = i % 2 == 0
+
+        # Format and version areas are reserved but left light here; they
+        # are filled in once the mask is chosen.
+        self.format_positions = format_positions(size)
+        reserved = self.format_positions[0] + self.format_positions[1] + [(size - 8, 8)]
+        self.version_positions = version_positions(size) if version >= 7 else ([], [])
+        reserved += self.version_positions[0] + self.version_positions[1]
+        for r, c in reserved:
+            grid[r][c] = False
+
+        self.base_rows = [_row_int(row) for row in grid]
+
+        order = []
+        row = size - 1
+        step = -1
+        for right in range(size - 1, 0, -2):
+            if right <= 6:
+                right -= 1
+            while 0 <= row < size:
+                for col in (right, right - 1):
+                    if grid[row][col] is None:
+                        order.append((row, col))
+                row += step
+            row -= step
+            step = -step
+
+        self.stream_bits = raw_data_modules(version) // 8 * 8
+        sentinel = self.stream_bits
+        index = [[sentinel] * size for _ in range(size)]
+        for bit, (r, c) in enumerate(order):
+            if bit < self.stream_bits:
+                index[r][c] = bit
+        self.order = order
+        self.row_getters = [itemgetter(*row) for row in index]
+
+        data_rows = [_row_int([cell is None for cell in row]) for row in grid]
+        self.mask_rows = []
+        for func in _MASK_FUNCTIONS:
+            rows = []
+            for i in range(size):
+                period = "".join("1" if func(i, j) else "0" for j in range(6))
+                pattern = int((period * (size // 6 + 1))[:size], 2)
+                rows.append(pattern & data_rows[i])
+            self.mask_rows.append(rows)
+
+    def data_rows(self, codewords):
+        stream = format(int.from_bytes(bytes(codewords), "big"), f"0{self.stream_bits}b") + "0"
+        return [int("".join(getter(stream)), 2) for getter in self.row_getters]
+
+    def fixed_rows(self, error_correction, mask):
+        size = self.size
+        rows = list(self.base_rows)
+        top = size - 1
+        bits = format_bits(error_correction, mask)
+        for i in range(15):
+            if (bits >> i) & 1:
+                for positions in self.format_positions:
+                    r, c = positions[i]
+                    rows[r] |= 1 << (top - c)
+        rows[size - 8] |= 1 << (top - 8)
+        if self.version >= 7:
+            bits = version_bits(self.version)
+            for i in range(18):
+                if (bits >> i) & 1:
+                    for positions in self.version_positions:
+                        r, c = positions[i]
+                        rows[r] |= 1 << (top - c)
+        return rows
+
+
+@lru_cache(maxsize=None)
+def template(version):
+    return _Template(version)
+
+
+def _row_int(cells):
+    return int("".join("1" if cell else "0" for cell in cells), 2)
+
+
+def penalty(rows, size):
+    # The four ISO/IEC 18004 mask penalty rules, scored the same way as the
+    # reference encoder (qrcode.util.lost_point).
+    strings = [format(row, f"0{size}b") for row in rows]
+    # Rows and columns in one string; the separator breaks runs and patterns.
+    lines = "2".join(strings + ["".join(column) for column in zip(*strings)])
+
+    runs = _RE_RUNS.findall(lines)
+    score = sum(map(len, runs)) - 2 * len(runs)
+    score += 40 * len(_RE_FINDER_LIKE.findall(lines))
+
+    full = (1 << (size - 1)) - 1
+    blocks = 0
+    for upper, lower in zip(rows, rows[1:]):
+        same = ~(upper ^ lower)
+        flat = ~(upper ^ (upper >> 1))
+        blocks += bin((same & (same >> 1) & flat) & full).count("1")
+    score += 3 * blocks
+
+    dark = sum(line.count("1") for line in strings)
+    percent = float(dark) / (size ** 2)
+    score += int(abs(percent * 100 - 50) / 5) * 10
+    return score
+
+
+_PACK_HEADER = struct.Struct("<BBB")
+
+
+class QRMatrix:
+    def __init__(self, version, error_correction, mask, rows):
+        self.version = version
+        self.error_correction = error_correction
+        self.mask = mask
+        self.rows = rows
+
+    @property
+    def size(self):
+        return self.version * 4 + 17
+
+    @property
+    def modules(self):
+        size = self.size
+        return [[bit == "1" for bit in format(row, f"0{size}b")] for row in self.rows]
+
+    def pack(self):
+        # version, level, mask, then each row padded to whole bytes:
+        # 3 + size * ceil(size / 8) bytes in total.
+        size = self.size
+        width = (size + 7) // 8
+        pad = width * 8 - size
+        header = _PACK_HEADER.pack(
+            self.version, ERROR_CORRECTION_LEVELS.index(self.error_correction), self.mask
+        )
+        return header + b"".join((row << pad).to_bytes(width, "big") for row in self.rows)
+
+    @classmethod
+    def unpack(cls, data):
+        version, level, mask = _PACK_HEADER.unpack_from(data)
+        size = version * 4 + 17
+        width = (size + 7) // 8
+        pad = width * 8 - size
+        offset = _PACK_HEADER.size
+        if len(data) != offset + size * width:
+            raise ValueError("Packed matrix has the wrong length")
+        rows = [
+            int.from_bytes(data[offset + i * width:offset + (i + 1) * width], "big") >> pad
+            for i in range(size)
+        ]
+        return cls(version, ERROR_CORRECTION_LEVELS[level], mask, rows)
+
+    def __eq__(self, other):
+        return isinstance(other, QRMatrix) and (
+            self.version, self.error_correction, self.mask, self.rows
+        ) == (other.version, other.error_correction, other.mask, other.rows)
+
+    def __repr__(self):
+        return f"QRMatrix(version={self.version}, error_correction={self.error_correction!r}, mask={self.mask})"
+
+
+def encode_segments(segments, error_correction="L", version=None, min_version=1, max_version=40, mask=None):
+    if error_correction not in FORMAT_BITS:
+        raise ValueError(f"Invalid error correction level: {error_correction!r}")
+    if version is None:
+        version = fit_version(segments, error_correction, min_version, max_version)
+
+    symbol = template(version)
+    codewords = build_codewords(segments, version, error_correction)
+    data = symbol.data_rows(codewords)
+    base = symbol.base_rows
+
+    if mask is None:
+        best = None
+        for candidate, mask_rows in enumerate(symbol.mask_rows):
+            rows = [b | (d ^ m) for b, d, m in zip(base, data, mask_rows)]
+            score = penalty(rows, symbol.size)
+            if best is None or score < best:
+                best = score
+                mask = candidate
+
+    fixed = symbol.fixed_rows(error_correction, mask)
+    rows = [f | (d ^ m) for f, d, m in zip(fixed, data, symbol.mask_rows[mask])]
+    return QRMatrix(version, error_correction, mask, rows)
+
+
+def encode(data, error_correction="L", version=None, min_version=1, max_version=40, mask=None,
+           optimize=False, boost_error_correction=False, structured_append=None):
+    # structured_append: (index, total, parity) for one symbol of a sequence.
+    if version is not None:
+        min_version = max_version = version
+    header = () if structured_append is None else (structured_append_header(*structured_append),)
+    segments, version, error_correction = plan_encoding(
+        data,
+        error_correction=error_correction,
+        min_version=min_version,
+        max_version=max_version,
+        optimize=optimize,
+        boost_error_correction=boost_error_correction,
+        header=header,
+    )
+    return encode_segments(segments, error_correction=error_correction, version=version, mask=mask)
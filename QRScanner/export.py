@@ -0,0 +1,116 @@
+import json
+import os
+import time
+import zipfile
+
+from .cache import export_filename
+from .encoder import DataOverflowError
+from .streams import BufferedSink, copy_stream
+
+
+MANIFEST_NAME = "manifest.json"
+
+
+def _entry_name(label, key, used):
+    name = export_filename(label or "", key)
+    if name in used:
+        name = f"qr_{key}.png"
+    used.add(name)
+    return name
+
+
+def _manifest(entries):
+    return json.dumps({"exported": time.time(), "entries": entries}, ensure_ascii=False, indent=1)
+
+
+def history_entries(history, key_for, render, cached=None):
+    # (key, label, source) for every distinct payload in history (entries
+    # newest first). Images still cached are used as they are; the rest are
+    # rendered one at a time as the export pulls them, so only one image is
+    # held at once. Payloads too long for a single symbol are left out.
+    seen = set()
+    for entry in history:
+        if entry.payload in seen:
+            continue
+        seen.add(entry.payload)
+        source = cached(entry.cache_key) if cached is not None and entry.cache_key else None
+        if source is not None:
+            yield entry.cache_key, entry.payload, source
+            continue
+        try:
+            data = render(entry.payload)
+        except DataOverflowError:
+            continue
+        yield key_for(entry.payload), entry.payload, data
+
+
+def export_zip(entries, target, progress=None, clock=time.perf_counter):
+    # Streams (key, label, source) entries into a ZIP. target is a path or
+    # any object with write(), e.g. a Java OutputStream from a SAF document;
+    # non-seekable targets get data descriptors instead of a rewind, so the
+    # archive is produced in one sequential pass. Sources are bytes or file
+    # paths; files are copied in chunks, never read whole. PNGs are already
+    # deflated, so entries are stored.
+    start = clock()
+    if not isinstance(target, str):
+        target = BufferedSink(target)
+
+    manifest = []
+    used = set()
+    total = 0
+    with zipfile.ZipFile(target, "w", compression=zipfile.ZIP_STORED) as archive:
+        for key, label, source in entries:
+            name = _entry_name(label, key, used)
+            info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+            try:
+                if isinstance(source, str):
+                    with open(source, "rb") as f, archive.open(info, "w") as entry:
+                        size = copy_stream(f, entry).bytes
+                else:
+                    archive.writestr(info, source)
+                    size = len(source)
+            except FileNotFoundError:
+                # Evicted from the disk cache while exporting.
+                continue
+            total += size
+            manifest.append({"file": name, "key": key, "payload": label, "bytes": size})
+            if progress is not None:
+                progress(len(manifest), name)
+
+        archive.writestr(
+            zipfile.ZipInfo(MANIFEST_NAME, date_time=time.localtime()[:6]), _manifest(manifest)
+        )
+    if isinstance(target, BufferedSink):
+        target.flush()
+
+    return {"entries": len(manifest), "bytes": total, "seconds": round(clock() - start, 4)}
+
+
+def export_directory(entries, directory, progress=None, clock=time.perf_counter):
+    # Same entries and manifest as export_zip, written as loose files.
+    start = clock()
+    os.makedirs(directory, exist_ok=True)
+    manifest = []
+    used = set()
+    total = 0
+    for key, label, source in entries:
+        name = _entry_name(label, key, used)
+        path = os.path.join(directory, name)
+        try:
+            if isinstance(source, str):
+                with open(source, "rb") as f, open(path, "wb") as out:
+                    size = copy_stream(f, out).bytes
+            else:
+                with open(path, "wb") as out:
+                    out.write(source)
+                size = len(source)
+        except FileNotFoundError:
+            continue
+        total += size
+        manifest.append({"file": name, "key": key, "payload": label, "bytes": size})
+        if progress is not None:
+            progress(len(manifest), name)
+
+    with open(os.path.join(directory, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        f.write(_manifest(manifest))
+    return {"entries": len(manifest), "bytes": total, "seconds": round(clock() - start, 4)}
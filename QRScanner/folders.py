@@ -0,0 +1,82 @@
+import json
+import os
+import threading
+
+
+class SavedFolder:
+    # The export destination chosen by the user, kept across launches. The
+    # Android side holds a persisted URI permission for it, so saving does
+    # not need the picker again.
+    def __init__(self, path):
+        self.path = path
+        self._uri = None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self._uri = json.load(f).get("uri")
+        except (FileNotFoundError, ValueError):
+            pass
+
+    @property
+    def uri(self):
+        return self._uri
+
+    @uri.setter
+    def uri(self, value):
+        self._uri = value
+        if value is None:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            return
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"uri": value}, f)
+        os.replace(tmp, self.path)
+
+
+class FolderIndex:
+    # Display name -> document id for one tree folder; callers build the
+    # document URI from the id and the tree URI. It is filled with a single
+    # listing and then kept current as the app creates and deletes
+    # documents, so name lookups never list the folder again.
+    def __init__(self, folder_uri=None):
+        self.folder_uri = folder_uri
+        self.loaded = False
+        self.listings = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, name):
+        return name in self._entries
+
+    def load(self, entries):
+        with self._lock:
+            self._entries = dict(entries)
+            self.loaded = True
+            self.listings += 1
+
+    def reset(self, folder_uri=None):
+        with self._lock:
+            self.folder_uri = folder_uri
+            self._entries = {}
+            self.loaded = False
+
+    def get(self, name):
+        return self._entries.get(name)
+
+    def add(self, name, document_id):
+        with self._lock:
+            self._entries[name] = document_id
+
+    def remove(self, name):
+        with self._lock:
+            return self._entries.pop(name, None)
+
+    def names(self):
+        return list(self._entries)
@@ -0,0 +1,227 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from .cache import MemoryCache, cache_key
+from .encoder import ENCODER_VERSION, MAX_SEQUENCE, QRMatrix, encode, template
+from .png import write_png
+from .structured import SEQUENCE_VERSION, plan_sequence
+
+
+DEFAULT_PARAMS = {
+    "min_version": 1,
+    "error_correction": "L",
+    "optimize": True,
+    "boost_error_correction": True,
+    "box_size": 7,
+    "border": 1,
+    "fill_color": "black",
+    "back_color": "white",
+    "size": None,
+}
+
+
+ENCODE_PARAMS = ("min_version", "error_correction", "optimize", "boost_error_correction")
+RENDER_PARAMS = ("box_size", "border", "fill_color", "back_color", "size")
+
+
+def encode_matrix(payload, params):
+    return encode(
+        payload,
+        error_correction=params["error_correction"],
+        min_version=params["min_version"],
+        optimize=params["optimize"],
+        boost_error_correction=params["boost_error_correction"],
+        structured_append=params.get("structured_append"),
+    )
+
+
+def rasterize(matrix, params):
+    return write_png(
+        matrix,
+        box_size=params["box_size"],
+        border=params["border"],
+        fill_color=params["fill_color"],
+        back_color=params["back_color"],
+        size=params["size"],
+    )
+
+
+def target_pixels(width_dp, density_dpi):
+    # Physical pixel width of a view that is width_dp density-independent
+    # pixels wide; rendering at exactly this size avoids any scaling.
+    return max(1, int(width_dp * density_dpi / 160))
+
+
+def render_png(payload, params):
+    return rasterize(encode_matrix(payload, params), params)
+
+
+def matrix_key(payload, params):
+    encode_params = {name: params[name] for name in ENCODE_PARAMS}
+    # Only sequence parts carry a header; plain keys stay as they were.
+    if params.get("structured_append") is not None:
+        encode_params["structured_append"] = params["structured_append"]
+    return cache_key(payload, encoder=ENCODER_VERSION, **encode_params)
+
+
+def image_key(payload, params):
+    render_params = {name: params[name] for name in RENDER_PARAMS}
+    if render_params["size"] is not None:
+        # box_size is derived from the size, so it must not split the
+        # variants cached for one target size.
+        del render_params["box_size"]
+    return cache_key(matrix_key(payload, params), **render_params)
+
+
+def _render_job(encode_func, rasterize_func, payload, packed, params):
+    # Runs on a worker thread. Re-uses a cached matrix when there is one and
+    # returns the packed matrix alongside the image so it can be cached.
+    if packed is None:
+        matrix = encode_func(payload, params)
+        packed = matrix.pack()
+    else:
+        matrix = QRMatrix.unpack(packed)
+    return packed, rasterize_func(matrix, params)
+
+
+def prewarm(params=DEFAULT_PARAMS, versions=range(1, 11)):
+    # Build the per-version templates that typical payloads need, then run
+    # one full render so the first real request only encodes.
+    for version in versions:
+        template(version)
+    render_png("prewarm", params)
+
+
+class _Flight:
+    def __init__(self, future):
+        self.future = future
+        self.waiters = 0
+
+
+class QRGenerator:
+    def __init__(self, store, params=None, matrices=None, max_workers=2, executor=None,
+                 encode=encode_matrix, rasterize=rasterize):
+        self.store = store
+        self.params = dict(DEFAULT_PARAMS, **(params or {}))
+        # Encoded module matrices, bit-packed and kept apart from the images
+        # so a new size or colour scheme only has to rasterize.
+        self.matrices = matrices if matrices is not None else MemoryCache(
+            max_bytes=4 * 1024 * 1024, max_entries=1024
+        )
+        self.executor = executor or ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="qr-render"
+        )
+        self.encode = encode
+        self.rasterize = rasterize
+
+        self.renders = 0
+        self.encodes = 0
+        self.coalesced = 0
+        self.superseded = 0
+
+        self._flights = {}
+        self._latest = {}
+        self._stale = set()
+
+    async def prewarm(self):
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(self.executor, prewarm, self.params)
+
+    def matrix_key(self, payload, params=None):
+        return matrix_key(payload, params or self.params)
+
+    def key_for(self, payload, **overrides):
+        return image_key(payload, dict(self.params, **overrides))
+
+    async def generate(self, payload, channel="default", **overrides):
+        # Returns (key, png_bytes), or None when a newer request on the same
+        # channel superseded this one before it finished. Keyword arguments
+        # override the render parameters (size, border, colours).
+        self.cancel(channel)
+        task = asyncio.ensure_future(self._generate(payload, overrides))
+        self._latest[channel] = task
+        try:
+            return await task
+        except asyncio.CancelledError:
+            if task in self._stale:
+                return None
+            raise
+        finally:
+            self._stale.discard(task)
+            if self._latest.get(channel) is task:
+                del self._latest[channel]
+
+    async def generate_sequence(self, payload, channel="sequence", max_version=SEQUENCE_VERSION,
+                                chunk_size=None, **overrides):
+        # Splits payload into a structured append sequence and renders the
+        # parts side by side on the render pool. Returns [(text, key,
+        # png_bytes)] in sequence order, or None when superseded.
+        params = dict(self.params, **overrides)
+        parts = plan_sequence(payload, params["error_correction"], max_version, chunk_size)
+        for index in range(MAX_SEQUENCE):
+            self.cancel(f"{channel}:{index}")
+        results = await asyncio.gather(*(
+            self.generate(text, channel=f"{channel}:{header[0]}", structured_append=header, **overrides)
+            for text, header in parts
+        ))
+        if any(result is None for result in results):
+            return None
+        return [(text, key, data) for (text, _header), (key, data) in zip(parts, results)]
+
+    def cancel(self, channel="default"):
+        task = self._latest.pop(channel, None)
+        if task is not None and not task.done():
+            self._stale.add(task)
+            task.cancel()
+            self.superseded += 1
+
+    def stats(self):
+        return {
+            "renders": self.renders,
+            "encodes": self.encodes,
+            "matrices": self.matrices.stats(),
+            "coalesced": self.coalesced,
+            "superseded": self.superseded,
+            "in_flight": len(self._flights),
+        }
+
+    async def _generate(self, payload, overrides):
+        params = dict(self.params, **overrides)
+        packed_key = matrix_key(payload, params)
+        key = image_key(payload, params)
+        data = await self.store.get(key)
+        if data is not None:
+            return key, data
+
+        flight = self._flights.get(key)
+        if flight is None:
+            packed = self.matrices.get(packed_key)
+            if packed is None:
+                self.encodes += 1
+            future = asyncio.wrap_future(self.executor.submit(
+                _render_job, self.encode, self.rasterize, payload, packed, params
+            ))
+            flight = self._flights[key] = _Flight(future)
+            future.add_done_callback(lambda f: self._render_done(key, packed_key, payload, f))
+            self.renders += 1
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            _packed, data = await asyncio.shield(flight.future)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.future.done():
+                # Nobody wants this render any more; drop it if it hasn't
+                # been picked up by a worker yet.
+                flight.future.cancel()
+        return key, data
+
+    def _render_done(self, key, packed_key, payload, future):
+        if self._flights.get(key) is not None and self._flights[key].future is future:
+            del self._flights[key]
+        if not future.cancelled() and future.exception() is None:
+            packed, data = future.result()
+            self.matrices.put(packed_key, packed)
+            self.store.put(key, data, label=payload)
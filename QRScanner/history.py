@@ -0,0 +1,162 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+
+SCHEMA_VERSION = 1
+
+HistoryEntry = namedtuple("HistoryEntry", "id timestamp source payload cache_key")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY,
+    timestamp REAL NOT NULL,
+    source TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    payload_hash BLOB NOT NULL,
+    cache_key TEXT
+);
+CREATE INDEX IF NOT EXISTS history_payload_hash ON history (payload_hash);
+"""
+
+# External-content FTS table kept in step with history by triggers, so the
+# payload text is stored only once.
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5(
+    payload, content='history', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS history_ai AFTER INSERT ON history BEGIN
+    INSERT INTO history_fts (rowid, payload) VALUES (new.id, new.payload);
+END;
+CREATE TRIGGER IF NOT EXISTS history_ad AFTER DELETE ON history BEGIN
+    INSERT INTO history_fts (history_fts, rowid, payload) VALUES ('delete', old.id, old.payload);
+END;
+"""
+
+_COLUMNS = "id, timestamp, source, payload, cache_key"
+
+
+def payload_hash(payload):
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).digest()
+
+
+class History:
+    # Scan and generate history in SQLite. Inserts are buffered and written
+    # in one transaction per batch; reads page by id (newest first), so the
+    # cost of showing the history does not grow with its size.
+    def __init__(self, path, batch_size=50, clock=time.time):
+        self.path = path
+        self.batch_size = batch_size
+        self.clock = clock
+
+        self._pending = []
+        self._pending_hashes = set()
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self.full_text = self._create_fts()
+        self._db.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        self._db.commit()
+
+    def _create_fts(self):
+        # FTS5 with the trigram tokenizer needs SQLite 3.34; older builds
+        # fall back to LIKE scans.
+        try:
+            self._db.executescript(_FTS_SCHEMA)
+            return True
+        except sqlite3.OperationalError:
+            return False
+
+    def __len__(self):
+        with self._lock:
+            count, = self._db.execute("SELECT COUNT(*) FROM history").fetchone()
+            return count + len(self._pending)
+
+    def add(self, payload, source="scan", cache_key=None, timestamp=None):
+        digest = payload_hash(payload)
+        with self._lock:
+            self._pending.append((
+                timestamp if timestamp is not None else self.clock(),
+                source, payload, digest, cache_key,
+            ))
+            self._pending_hashes.add(digest)
+            if len(self._pending) >= self.batch_size:
+                self.flush()
+
+    def flush(self):
+        with self._lock:
+            if not self._pending:
+                return
+            with self._db:
+                self._db.executemany(
+                    "INSERT INTO history (timestamp, source, payload, payload_hash, cache_key)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    self._pending,
+                )
+            self._pending = []
+            self._pending_hashes = set()
+
+    def seen(self, payload):
+        digest = payload_hash(payload)
+        with self._lock:
+            if digest in self._pending_hashes:
+                return True
+            row = self._db.execute(
+                "SELECT 1 FROM history WHERE payload_hash = ? LIMIT 1", (digest,)
+            ).fetchone()
+            return row is not None
+
+    def page(self, before=None, limit=50):
+        # Newest first. Pass the id of the last entry of one page as
+        # `before` to get the next one.
+        self.flush()
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {_COLUMNS} FROM history WHERE id < ? ORDER BY id DESC LIMIT ?",
+                (before if before is not None else 2 ** 63 - 1, limit),
+            ).fetchall()
+        return [HistoryEntry(*row) for row in rows]
+
+    def entries(self, page_size=200):
+        # Every entry, newest first, read a page at a time.
+        before = None
+        while True:
+            page = self.page(before, page_size)
+            if not page:
+                return
+            yield from page
+            before = page[-1].id
+
+    def search(self, text, before=None, limit=50):
+        self.flush()
+        before = before if before is not None else 2 ** 63 - 1
+        with self._lock:
+            if self.full_text and len(text) >= 3:
+                rows = self._db.execute(
+                    f"SELECT {_COLUMNS} FROM history WHERE id IN"
+                    " (SELECT rowid FROM history_fts WHERE history_fts MATCH ?)"
+                    " AND id < ? ORDER BY id DESC LIMIT ?",
+                    ('"' + text.replace('"', '""') + '"', before, limit),
+                ).fetchall()
+            else:
+                escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+                rows = self._db.execute(
+                    f"SELECT {_COLUMNS} FROM history WHERE payload LIKE ? ESCAPE '\\'"
+                    " AND id < ? ORDER BY id DESC LIMIT ?",
+                    (f"%{escaped}%", before, limit),
+                ).fetchall()
+        return [HistoryEntry(*row) for row in rows]
+
+    def delete(self, entry_id):
+        self.flush()
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM history WHERE id = ?", (entry_id,))
+
+    def close(self):
+        with self._lock:
+            self.flush()
+            self._db.close()
@@ -0,0 +1,90 @@
+import threading
+
+from .trace import tracer
+
+
+class LazyClass:
+    # Stands in for a class imported from module (a Java class through
+    # Chaquopy's importer) until it is first used. Each resolution costs a
+    # reflection lookup over the bridge, so classes the first frame doesn't
+    # touch are only resolved when something actually calls them.
+    __slots__ = ("module", "name", "_target")
+
+    def __init__(self, module, name):
+        self.module = module
+        self.name = name
+        self._target = None
+
+    @property
+    def resolved(self):
+        return self._target is not None
+
+    def resolve(self):
+        # The same lookup as `from module import name`, which is what
+        # Chaquopy's import hook turns into a Java class. Two threads may
+        # race to resolve; both get the same class.
+        target = self._target
+        if target is None:
+            module = __import__(self.module, fromlist=[self.name])
+            target = self._target = getattr(module, self.name)
+        return target
+
+    def __getattr__(self, name):
+        return getattr(self.resolve(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self.resolve()(*args, **kwargs)
+
+    def __repr__(self):
+        state = "resolved" if self.resolved else "unresolved"
+        return f"<LazyClass {self.module}.{self.name} ({state})>"
+
+
+def lazy_classes(module, *names):
+    return [LazyClass(module, name) for name in names]
+
+
+def resolve(value):
+    # Where a class is passed to Java as a value (an Intent target, a cast)
+    # the proxy itself won't do.
+    return value.resolve() if isinstance(value, LazyClass) else value
+
+
+class Deferred:
+    # Named pieces of setup that the first frame doesn't need. Each one is
+    # built by its first get(), or earlier by build_next() while the UI is
+    # idle, and exactly once either way. Pieces that do no UI work may be
+    # built on a worker thread; a get() racing it waits for that build.
+    def __init__(self):
+        self._builders = {}
+        self._built = {}
+        self._locks = {}
+
+    def add(self, name, build):
+        if name in self._built or name in self._builders:
+            raise ValueError(f"{name} is already deferred")
+        self._locks[name] = threading.Lock()
+        self._builders[name] = build
+
+    def get(self, name):
+        if name not in self._built:
+            with self._locks[name]:
+                if name not in self._built:
+                    with tracer.span(f"deferred.{name}"):
+                        self._built[name] = self._builders[name]()
+                    del self._builders[name]
+        return self._built[name]
+
+    def built(self, name):
+        return name in self._built
+
+    def pending(self):
+        return list(self._builders)
+
+    def build_next(self):
+        # Builds the oldest pending piece; False once nothing is left.
+        pending = list(self._builders)
+        if not pending:
+            return False
+        self.get(pending[0])
+        return True
@@ -0,0 +1,252 @@
+import struct
+import zlib
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+NAMED_COLORS = {
+    "black": (0, 0, 0),
+    "white": (255, 255, 255),
+    "red": (255, 0, 0),
+    "green": (0, 128, 0),
+    "blue": (0, 0, 255),
+}
+
+
+def parse_color(color):
+    if isinstance(color, (tuple, list)):
+        return tuple(int(c) for c in color[:3])
+    color = str(color).strip().lower()
+    if color in NAMED_COLORS:
+        return NAMED_COLORS[color]
+    if color.startswith("#"):
+        color = color[1:]
+        if len(color) == 3:
+            color = "".join(c * 2 for c in color)
+        if len(color) == 6:
+            return tuple(int(color[i:i + 2], 16) for i in (0, 2, 4))
+    raise ValueError(f"Unsupported color: {color!r}")
+
+
+def image_size(modules_count, box_size, border):
+    return (modules_count + 2 * border) * box_size
+
+
+def fit_box_size(modules_count, border, target_size):
+    # Largest whole number of pixels per module that fits target_size.
+    return max(1, target_size // (modules_count + 2 * border))
+
+
+def write_png(
+    modules,
+    box_size=10,
+    border=4,
+    fill_color="black",
+    back_color="white",
+    compress_level=6,
+    use_numpy=None,
+    size=None,
+):
+    # modules is a square matrix of truthy (dark) / falsy (light) values,
+    # or anything with `size` and integer `rows` (MSB = first column) such
+    # as encoder.QRMatrix. The output is a 2-entry palette PNG at 1 bit per
+    # pixel: index 0 is the background, index 1 the dark modules.
+    #
+    # With `size`, box_size is ignored: the image is exactly size x size
+    # pixels, using the largest integer module size that fits and adding
+    # the leftover pixels to the quiet zone, so it never needs resampling.
+    if box_size < 1:
+        raise ValueError("box_size must be at least 1")
+    if border < 0:
+        raise ValueError("border must not be negative")
+
+    rows = getattr(modules, "rows", None)
+    if size is not None:
+        if rows is None:
+            rows = [int("".join("1" if cell else "0" for cell in row) or "0", 2) for row in modules]
+            count = len(modules)
+        else:
+            count = modules.size
+        box_size = fit_box_size(count, border, size)
+        size = max(size, image_size(count, box_size, border))
+        margin = size - count * box_size
+        raw = _scanlines_from_rows(rows, count, box_size, margin // 2, margin - margin // 2)
+    elif rows is not None:
+        size = image_size(modules.size, box_size, border)
+        quiet = border * box_size
+        raw = _scanlines_from_rows(rows, modules.size, box_size, quiet, quiet)
+    else:
+        size = image_size(len(modules), box_size, border)
+        if use_numpy is None:
+            use_numpy = numpy is not None
+        if use_numpy:
+            raw = _scanlines_numpy(modules, box_size, border)
+        else:
+            raw = _scanlines(modules, box_size, border)
+
+    palette = bytes(parse_color(back_color) + parse_color(fill_color))
+    return b"".join([
+        PNG_SIGNATURE,
+        _chunk(b"IHDR", struct.pack(">IIBBBBB", size, size, 1, 3, 0, 0, 0)),
+        _chunk(b"PLTE", palette),
+        _chunk(b"IDAT", zlib.compress(raw, compress_level)),
+        _chunk(b"IEND", b""),
+    ])
+
+
+def _chunk(tag, data):
+    crc = zlib.crc32(tag + data) & 0xFFFFFFFF
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", crc)
+
+
+def _scanlines(modules, box_size, border):
+    size = image_size(len(modules), box_size, border)
+    row_bytes = (size + 7) // 8
+    tail = "0" * (row_bytes * 8 - size)
+
+    # Each module row becomes one scanline (filter byte 0 + packed bits),
+    # built from per-module runs and then repeated box_size times.
+    dark = "1" * box_size
+    light = "0" * box_size
+    quiet = light * border
+    blank = b"\0" + bytes(row_bytes)
+
+    lines = [blank * (border * box_size)]
+    for row in modules:
+        bits = quiet + "".join([dark if module else light for module in row]) + quiet + tail
+        line = b"\0" + int(bits, 2).to_bytes(row_bytes, "big")
+        lines.append(line * box_size)
+    lines.append(blank * (border * box_size))
+    return b"".join(lines)
+
+
+def _scanlines_numpy(modules, box_size, border):
+    matrix = numpy.asarray(modules, dtype=bool)
+    matrix = numpy.pad(matrix, border, mode="constant", constant_values=False)
+    pixels = numpy.repeat(matrix, box_size, axis=1)
+    packed = numpy.packbits(pixels, axis=1)
+    lines = numpy.zeros((packed.shape[0], packed.shape[1] + 1), dtype=numpy.uint8)
+    lines[:, 1:] = packed
+    return numpy.repeat(lines, box_size, axis=0).tobytes()
+
+
+def _scanlines_from_rows(rows, modules_count, box_size, before, after):
+    # before/after are the quiet zone widths in pixels.
+    size = modules_count * box_size + before + after
+    row_bytes = (size + 7) // 8
+    tail = "0" * (row_bytes * 8 - size)
+
+    # str.translate widens every module bit into box_size pixel bits in C.
+    widen = str.maketrans({"0": "0" * box_size, "1": "1" * box_size})
+    lead = "0" * before
+    trail = "0" * after + tail
+    blank = b"\0" + bytes(row_bytes)
+
+    lines = [blank * before]
+    for row in rows:
+        bits = lead + format(row, f"0{modules_count}b").translate(widen) + trail
+        lines.append((b"\0" + int(bits, 2).to_bytes(row_bytes, "big")) * box_size)
+    lines.append(blank * after)
+    return b"".join(lines)
+
+
+def read_png(data):
+    # Decodes a non-interlaced PNG of any colour type and bit depth into
+    # (width, height, rows) with one 8-bit grey value per pixel. Enough for
+    # the decoder; images from elsewhere are usually better read with Pillow.
+    if data[:8] != PNG_SIGNATURE:
+        raise ValueError("Not a PNG image")
+    offset = 8
+    header = None
+    palette = b""
+    idat = []
+    while offset + 8 <= len(data):
+        length, tag = struct.unpack(">I4s", data[offset:offset + 8])
+        body = data[offset + 8:offset + 8 + length]
+        offset += 12 + length
+        if tag == b"IHDR":
+            header = struct.unpack(">IIBBBBB", body)
+        elif tag == b"PLTE":
+            palette = body
+        elif tag == b"IDAT":
+            idat.append(body)
+        elif tag == b"IEND":
+            break
+    if header is None:
+        raise ValueError("PNG has no IHDR chunk")
+
+    width, height, depth, color_type, _compression, _filter, interlace = header
+    if interlace:
+        raise ValueError("Interlaced PNGs are not supported")
+    channels = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}[color_type]
+    bits_per_pixel = channels * depth
+    stride = (width * bits_per_pixel + 7) // 8
+    bpp = max(1, bits_per_pixel // 8)
+    raw = zlib.decompress(b"".join(idat))
+
+    rows = []
+    previous = bytearray(stride)
+    for y in range(height):
+        start = y * (stride + 1)
+        line = _unfilter(raw[start], bytearray(raw[start + 1:start + 1 + stride]), previous, bpp)
+        rows.append(_grey_row(line, width, depth, color_type, palette))
+        previous = line
+    return width, height, rows
+
+
+def _unfilter(kind, line, previous, bpp):
+    if kind == 0:
+        return line
+    if kind == 1:
+        for i in range(bpp, len(line)):
+            line[i] = (line[i] + line[i - bpp]) & 0xFF
+    elif kind == 2:
+        line = bytearray(a + b & 0xFF for a, b in zip(line, previous))
+    elif kind == 3:
+        for i in range(len(line)):
+            left = line[i - bpp] if i >= bpp else 0
+            line[i] = (line[i] + ((left + previous[i]) >> 1)) & 0xFF
+    elif kind == 4:
+        for i in range(len(line)):
+            a = line[i - bpp] if i >= bpp else 0
+            b = previous[i]
+            c = previous[i - bpp] if i >= bpp else 0
+            p = a + b - c
+            pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+            predictor = a if pa <= pb and pa <= pc else (b if pb <= pc else c)
+            line[i] = (line[i] + predictor) & 0xFF
+    else:
+        raise ValueError(f"Unknown PNG filter type {kind}")
+    return line
+
+
+def _grey_row(line, width, depth, color_type, palette):
+    if depth < 8:
+        bits = "".join(format(b, "08b") for b in line)
+        values = [int(bits[i:i + depth], 2) for i in range(0, width * depth, depth)]
+        if color_type == 3:
+            return bytes(_palette_grey(palette, v) for v in values)
+        scale = 255 // ((1 << depth) - 1)
+        return bytes(v * scale for v in values)
+
+    if depth == 16:
+        line = line[::2]
+    if color_type == 0:
+        return bytes(line[:width])
+    if color_type == 3:
+        return bytes(_palette_grey(palette, v) for v in line[:width])
+    channels = {2: 3, 4: 2, 6: 4}[color_type]
+    if color_type == 4:
+        return bytes(line[0:width * 2:2])
+    r, g, b = line[0::channels], line[1::channels], line[2::channels]
+    return bytes((299 * r[i] + 587 * g[i] + 114 * b[i]) // 1000 for i in range(width))
+
+
+def _palette_grey(palette, index):
+    r, g, b = palette[3 * index:3 * index + 3]
+    return (299 * r + 587 * g + 114 * b) // 1000
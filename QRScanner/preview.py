@@ -0,0 +1,173 @@
+import asyncio
+import time
+from collections import deque
+
+from .encoder import encode_segments, plan_encoding
+from .generator import rasterize
+from .trace import percentile, tracer
+
+
+class PreviewEncoder:
+    # Encodes successive edits of one payload. Scoring all eight masks is
+    # most of an encode; while the version, level and segment modes stay
+    # what they were for the previous edit, that edit's mask is reused.
+    # Any mask gives a valid symbol, and the final render still picks the
+    # best one.
+    def __init__(self, params):
+        self.params = params
+        self.reused = 0
+        self.selected = 0
+        self._shape = None
+        self._mask = None
+
+    def encode(self, payload):
+        params = self.params
+        segments, version, level = plan_encoding(
+            payload,
+            error_correction=params["error_correction"],
+            min_version=params["min_version"],
+            optimize=params["optimize"],
+            boost_error_correction=params["boost_error_correction"],
+        )
+        shape = (version, level, tuple(segment.mode for segment in segments))
+        mask = self._mask if shape == self._shape else None
+        matrix = encode_segments(segments, error_correction=level, version=version, mask=mask)
+        if mask is None:
+            self.selected += 1
+        else:
+            self.reused += 1
+        # One tuple swap, so a stale render finishing on another worker
+        # can't leave a mismatched pair behind.
+        self._shape, self._mask = shape, matrix.mask
+        return matrix
+
+    def render(self, payload, size):
+        # Runs on a worker thread.
+        return rasterize(self.encode(payload), dict(self.params, size=size))
+
+    def stats(self):
+        return {"masks_reused": self.reused, "masks_selected": self.selected}
+
+
+class LivePreview:
+    # Debounced preview of text as it is typed. Each keystroke restarts a
+    # `delay` timer, and a render starts once typing pauses, or after
+    # `max_wait` of continuous typing so the image never falls far behind.
+    # A newer render cancels the one in flight.
+    #
+    # render(text, size) is a coroutine returning the image; show(text,
+    # image) puts it on screen, with image None for empty text. Latency is
+    # measured from the last keystroke a render covers to its show(). When
+    # a render takes longer than `budget`, later ones use the next smaller
+    # entry of `sizes`; once renders are well inside it again they step
+    # back up.
+    def __init__(self, render, show, sizes, delay=0.12, max_wait=0.5, budget=0.2, samples=256,
+                 clock=time.perf_counter):
+        self.render = render
+        self.show = show
+        self.sizes = sizes
+        self.delay = delay
+        self.max_wait = max_wait
+        self.budget = budget
+        self.clock = clock
+
+        self.keystrokes = 0
+        self.renders = 0
+        self.superseded = 0
+        self.errors = 0
+        self.over_budget = 0
+
+        self._level = 0
+        self._text = ""
+        self._first_key = None
+        self._last_key = None
+        self._timer = None
+        self._task = None
+        self._latencies = deque(maxlen=samples)
+
+    @property
+    def size(self):
+        return self.sizes[self._level]
+
+    def update(self, text):
+        now = self.clock()
+        self.keystrokes += 1
+        self._text = text
+        self._last_key = now
+        if self._first_key is None:
+            self._first_key = now
+        if self._timer is not None:
+            self._timer.cancel()
+        wait = min(self.delay, self._first_key + self.max_wait - now)
+        self._timer = asyncio.get_event_loop().call_later(max(0, wait), self._start)
+
+    def stop(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._first_key = None
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        self._task = None
+
+    async def flush(self):
+        # Renders whatever is pending now, and waits for it.
+        if self._timer is not None:
+            self._timer.cancel()
+            self._start()
+        if self._task is not None:
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def stats(self):
+        ordered = sorted(self._latencies)
+        p50 = percentile(ordered, 0.50)
+        p95 = percentile(ordered, 0.95)
+        return {
+            "keystrokes": self.keystrokes,
+            "renders": self.renders,
+            "superseded": self.superseded,
+            "errors": self.errors,
+            "over_budget": self.over_budget,
+            "size": self.size,
+            "latency_p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "latency_p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+        }
+
+    def _start(self):
+        self._timer = None
+        self._first_key = None
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            self.superseded += 1
+        self._task = asyncio.ensure_future(self._render(self._text, self._last_key))
+
+    async def _render(self, text, keyed_at):
+        if not text:
+            self.show(text, None)
+            return
+        size = self.size
+        started = self.clock()
+        try:
+            with tracer.span("preview.render", size=size, chars=len(text)):
+                image = await self.render(text, size)
+        except Exception as e:
+            self.errors += 1
+            print("Preview error:", e)
+            tracer.error("preview", e)
+            return
+        finished = self.clock()
+        self.show(text, image)
+        self.renders += 1
+        self._latencies.append(finished - keyed_at)
+        if tracer.enabled:
+            tracer.record("preview.latency", keyed_at, finished - keyed_at)
+
+        elapsed = finished - started
+        if elapsed > self.budget:
+            self.over_budget += 1
+            self._level = min(self._level + 1, len(self.sizes) - 1)
+        elif elapsed < self.budget / 4:
+            self._level = max(self._level - 1, 0)
@@ -0,0 +1,115 @@
+# Scan profiles: which formats to look for and how hard to look. Narrow
+# format sets and no try-harder decode fastest; the wider profiles trade
+# speed for damaged, inverted or non-QR codes.
+
+# zxing-android-embedded intent extras (Intents.Scan / DecodeHintType).
+SCAN_TYPE = "SCAN_TYPE"
+NORMAL_SCAN = 0
+INVERTED_SCAN = 1
+MIXED_SCAN = 2
+TRY_HARDER = "TRY_HARDER"
+
+
+class ScanProfile:
+    def __init__(self, name, label, formats=("QR_CODE",), prompt="Scan a QR Code",
+                 try_harder=False, scan_type=NORMAL_SCAN, orientation_locked=True,
+                 timeout=15, camera_id=None):
+        self.name = name
+        self.label = label
+        self.formats = tuple(formats)
+        self.prompt = prompt
+        self.try_harder = try_harder
+        self.scan_type = scan_type
+        self.orientation_locked = orientation_locked
+        self.timeout = timeout
+        self.camera_id = camera_id
+
+    def __repr__(self):
+        return f"ScanProfile({self.name!r})"
+
+
+PROFILES = {
+    profile.name: profile
+    for profile in (
+        ScanProfile("fast", "Fast (QR only)"),
+        ScanProfile(
+            "damaged", "Damaged or low contrast",
+            try_harder=True, scan_type=MIXED_SCAN, timeout=30,
+        ),
+        ScanProfile(
+            "inverted", "Inverted (light on dark)",
+            scan_type=INVERTED_SCAN,
+        ),
+        ScanProfile(
+            "all", "All barcode formats",
+            formats=(
+                "QR_CODE", "DATA_MATRIX", "AZTEC", "PDF_417",
+                "EAN_13", "EAN_8", "UPC_A", "UPC_E", "CODE_128", "CODE_39",
+            ),
+            prompt="Scan a barcode",
+            try_harder=True,
+            timeout=30,
+        ),
+    )
+}
+DEFAULT_PROFILE = "fast"
+
+
+def build_options(profile, options_factory, capture_activity=None, to_list=list, to_int=int,
+                  beep=False, torch=False, capture_image=False):
+    # Translates a profile into a ScanOptions-like object. options_factory
+    # creates it; to_list turns the format tuple into what
+    # setDesiredBarcodeFormats expects (Arrays.asList on Android) and to_int
+    # boxes integer extras (jint, so zxing's getIntExtra finds them).
+    options = options_factory()
+    options.setPrompt(profile.prompt)
+    options.setDesiredBarcodeFormats(to_list(profile.formats))
+    options.setOrientationLocked(profile.orientation_locked)
+    options.setBeepEnabled(beep)
+    options.setTorchEnabled(torch)
+    options.setBarcodeImageEnabled(capture_image)
+    if capture_activity is not None:
+        options.setCaptureActivity(capture_activity)
+    if profile.timeout:
+        options.setTimeout(profile.timeout * 1000)
+    if profile.camera_id is not None:
+        options.setCameraId(profile.camera_id)
+    if profile.try_harder:
+        options.addExtra(TRY_HARDER, True)
+    if profile.scan_type != NORMAL_SCAN:
+        options.addExtra(SCAN_TYPE, to_int(profile.scan_type))
+    return options
+
+
+class ScanOptionsCache:
+    # Prebuilt options per (profile, beep, torch, capture_image). They are
+    # only read when a scan is launched, so one instance can be reused.
+    def __init__(self, options_factory, capture_activity=None, to_list=list, to_int=int, profiles=None):
+        self.options_factory = options_factory
+        self.capture_activity = capture_activity
+        self.to_list = to_list
+        self.to_int = to_int
+        self.profiles = profiles if profiles is not None else PROFILES
+        self.builds = 0
+        self._options = {}
+
+    def get(self, name=DEFAULT_PROFILE, beep=False, torch=False, capture_image=False):
+        key = (name, bool(beep), bool(torch), bool(capture_image))
+        options = self._options.get(key)
+        if options is None:
+            options = self._options[key] = build_options(
+                self.profiles[name],
+                self.options_factory,
+                capture_activity=self.capture_activity,
+                to_list=self.to_list,
+                to_int=self.to_int,
+                beep=beep,
+                torch=torch,
+                capture_image=capture_image,
+            )
+            self.builds += 1
+        return options
+
+    def prebuild(self, names=None, **switches):
+        for name in names or self.profiles:
+            self.get(name, **switches)
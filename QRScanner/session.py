@@ -0,0 +1,149 @@
+import asyncio
+import time
+from collections import deque, namedtuple
+
+
+# structured_append is (index, total, parity) for a part of a sequence.
+ScanResult = namedtuple("ScanResult", "contents timestamp structured_append", defaults=(None,))
+
+
+class ScanSession:
+    # Results of a continuous scan, consumed with `async for`. A result
+    # source (the capture activity, or a fake in tests) calls feed() and
+    # close() from any thread.
+    #
+    # dedup_window: seconds during which a repeat of the same code is
+    #     dropped; 0 keeps every read, None drops repeats for the whole
+    #     session.
+    # max_pending: when this many results wait for the consumer, pause()
+    #     is called on the source; resume() once half of them are consumed.
+    # timeout / idle_timeout: end the session after that many seconds in
+    #     total / without a new result.
+    def __init__(self, dedup_window=2.0, max_pending=32, timeout=None, idle_timeout=None,
+                 pause=None, resume=None, stop=None, loop=None, clock=time.monotonic):
+        self.dedup_window = dedup_window
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.clock = clock
+        self.loop = loop or asyncio.get_event_loop()
+
+        self._pause = pause
+        self._resume = resume
+        self._stop = stop
+
+        self.received = 0
+        self.duplicates = 0
+        self.delivered = 0
+        self.pauses = 0
+        self.paused = False
+        self.closed = False
+        self.reason = None
+
+        self._pending = deque()
+        self._last_seen = {}
+        self._wakeup = None
+        self._started = self._last_activity = clock()
+
+    def feed(self, contents, timestamp=None, structured_append=None):
+        self.loop.call_soon_threadsafe(self._accept, contents, timestamp, structured_append)
+
+    def close(self, reason="closed"):
+        self.loop.call_soon_threadsafe(self._finish, reason)
+
+    def stop(self, reason="stopped"):
+        # Consumer side: end the session and tell the source to shut down.
+        if self.closed:
+            return
+        self._finish(reason)
+        if self._stop is not None:
+            self._stop(reason)
+
+    def stats(self):
+        return {
+            "received": self.received,
+            "duplicates": self.duplicates,
+            "delivered": self.delivered,
+            "pending": len(self._pending),
+            "pauses": self.pauses,
+            "reason": self.reason,
+        }
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while not self._pending:
+            if self.closed:
+                raise StopAsyncIteration
+            wait = self._wait_time()
+            if wait is not None and wait <= 0:
+                self.stop("timeout" if self._timed_out() else "idle")
+                continue
+            self._wakeup = self.loop.create_future()
+            try:
+                await asyncio.wait_for(self._wakeup, wait)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                self._wakeup = None
+
+        result = self._pending.popleft()
+        self.delivered += 1
+        if self.paused and len(self._pending) <= self.max_pending // 2 and not self.closed:
+            self.paused = False
+            if self._resume is not None:
+                self._resume()
+        return result
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.stop()
+
+    def _accept(self, contents, timestamp, structured_append=None):
+        if self.closed:
+            return
+        now = self.clock()
+        self.received += 1
+        self._last_activity = now
+        # The window slides with every read, so a code left in front of the
+        # camera is reported once rather than once per window.
+        seen = contents if structured_append is None else (contents, structured_append)
+        last = self._last_seen.get(seen)
+        self._last_seen[seen] = now
+        if last is not None and (self.dedup_window is None or now - last < self.dedup_window):
+            self.duplicates += 1
+            return
+
+        self._pending.append(ScanResult(contents, timestamp if timestamp is not None else now, structured_append))
+        if not self.paused and len(self._pending) >= self.max_pending:
+            self.paused = True
+            self.pauses += 1
+            if self._pause is not None:
+                self._pause()
+        self._wake()
+
+    def _finish(self, reason):
+        if not self.closed:
+            self.closed = True
+            self.reason = reason
+        self._wake()
+
+    def _wake(self):
+        if self._wakeup is not None and not self._wakeup.done():
+            self._wakeup.set_result(None)
+
+    def _timed_out(self):
+        return self.timeout is not None and self.clock() - self._started >= self.timeout
+
+    def _wait_time(self):
+        # Seconds until the next deadline, or None without any.
+        now = self.clock()
+        deadlines = []
+        if self.timeout is not None:
+            deadlines.append(self._started + self.timeout)
+        if self.idle_timeout is not None:
+            deadlines.append(self._last_activity + self.idle_timeout)
+        return min(deadlines) - now if deadlines else None
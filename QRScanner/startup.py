@@ -0,0 +1,59 @@
+import json
+import os
+import time
+
+
+class StartupTimer:
+    def __init__(self, origin=None, clock=time.perf_counter):
+        self.clock = clock
+        self.origin = origin if origin is not None else clock()
+        self.phases = []
+        self._last = self.origin
+
+    def mark(self, phase):
+        now = self.clock()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    @property
+    def total(self):
+        return self._last - self.origin
+
+    def report(self, **extra):
+        report = {
+            "timestamp": time.time(),
+            "phases_ms": {name: round(seconds * 1000, 2) for name, seconds in self.phases},
+            "total_ms": round(self.total * 1000, 2),
+        }
+        report.update(extra)
+        return report
+
+    def format(self):
+        lines = [f"{name:<24}{seconds * 1000:9.1f} ms" for name, seconds in self.phases]
+        lines.append(f"{'total':<24}{self.total * 1000:9.1f} ms")
+        return "\n".join(lines)
+
+    def trace(self, tracer):
+        # Each phase as a startup.<phase> span. Only lands while tracing is
+        # on; the saved reports cover every launch.
+        if not tracer.enabled:
+            return
+        start = self.origin
+        for name, seconds in self.phases:
+            tracer.record(f"startup.{name}", start, seconds)
+            start += seconds
+
+    def save(self, path, keep=50, **extra):
+        # One JSON report per line, newest last, so cold-start numbers can be
+        # compared across runs and releases.
+        lines = []
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            pass
+        lines.append(json.dumps(self.report(**extra), sort_keys=True))
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines[-keep:]) + "\n")
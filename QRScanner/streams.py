@@ -0,0 +1,152 @@
+import asyncio
+import time
+
+
+MIN_CHUNK = 64 * 1024
+MAX_CHUNK = 4 * 1024 * 1024
+
+# Adaptive sizing aims for chunks that take about this long to write, which
+# keeps progress updates smooth without paying a bridge crossing per 4 KB.
+TARGET_CHUNK_SECONDS = 0.05
+
+
+class CopyStats:
+    def __init__(self, total=None):
+        self.total = total
+        self.bytes = 0
+        self.chunks = 0
+        self.seconds = 0.0
+
+    @property
+    def throughput(self):
+        # Bytes per second; 0 until something has been timed.
+        return self.bytes / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def fraction(self):
+        if not self.total:
+            return None
+        return min(1.0, self.bytes / self.total)
+
+    def as_dict(self):
+        return {
+            "bytes": self.bytes,
+            "chunks": self.chunks,
+            "seconds": round(self.seconds, 4),
+            "throughput": round(self.throughput, 1),
+        }
+
+    def __repr__(self):
+        return f"CopyStats({self.bytes} bytes, {self.chunks} chunks, {self.seconds * 1000:.1f} ms)"
+
+
+class BufferedSink:
+    # File-like front for a raw sink such as a Java OutputStream. Small
+    # writes are gathered into buffer_size blocks, so a stream of headers
+    # and short records still costs few bridge crossings, and write()
+    # returns a count as Python file objects do.
+    def __init__(self, sink, buffer_size=256 * 1024):
+        self.sink = sink
+        self.buffer_size = buffer_size
+        self.bytes = 0
+        self.writes = 0
+        self._buffer = bytearray()
+
+    def write(self, data):
+        self._buffer += data
+        if len(self._buffer) >= self.buffer_size:
+            self._drain()
+        return len(data)
+
+    def flush(self):
+        self._drain()
+        flush = getattr(self.sink, "flush", None)
+        if flush is not None:
+            flush()
+
+    def close(self):
+        self.flush()
+        self.sink.close()
+
+    def _drain(self):
+        if self._buffer:
+            self.sink.write(bytes(self._buffer))
+            self.bytes += len(self._buffer)
+            self.writes += 1
+            self._buffer = bytearray()
+
+
+def _reader(source):
+    # Returns read(n) for bytes-like sources and file-like ones alike.
+    if hasattr(source, "read"):
+        return source.read
+    view = memoryview(source)
+    offset = 0
+
+    def read(size):
+        nonlocal offset
+        chunk = view[offset:offset + size]
+        offset += len(chunk)
+        return chunk
+
+    return read
+
+
+def copy_stream(
+    source,
+    sink,
+    total=None,
+    chunk_size=None,
+    min_chunk=MIN_CHUNK,
+    max_chunk=MAX_CHUNK,
+    progress=None,
+    clock=time.perf_counter,
+):
+    # Copies bytes-like data or a file-like source (anything with read(n))
+    # into sink.write(). Java OutputStreams work as sinks: each write is one
+    # bridge crossing, so chunks start large and grow while writes are fast.
+    # A fixed chunk_size disables the adaptive sizing.
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        total = len(source) if total is None else total
+    stats = CopyStats(total)
+    size = chunk_size or min_chunk
+    read = _reader(source)
+
+    start = clock()
+    while True:
+        chunk = read(size)
+        if not chunk:
+            break
+        before = clock()
+        sink.write(bytes(chunk))
+        elapsed = clock() - before
+
+        stats.bytes += len(chunk)
+        stats.chunks += 1
+        if progress is not None:
+            progress(stats.bytes, stats.total)
+        if chunk_size is None:
+            if elapsed < TARGET_CHUNK_SECONDS / 2:
+                size = min(size * 2, max_chunk)
+            elif elapsed > TARGET_CHUNK_SECONDS * 2:
+                size = max(size // 2, min_chunk)
+    flush = getattr(sink, "flush", None)
+    if flush is not None:
+        flush()
+    stats.seconds = clock() - start
+    return stats
+
+
+async def copy_async(source, sink, executor=None, progress=None, **options):
+    # Runs copy_stream on a worker thread. Progress callbacks are delivered
+    # on the event loop, so they may touch widgets.
+    loop = asyncio.get_running_loop()
+    if progress is not None:
+        report = progress
+
+        def progress(done, total):
+            loop.call_soon_threadsafe(report, done, total)
+
+    return await loop.run_in_executor(
+        executor, lambda: copy_stream(source, sink, progress=progress, **options)
+    )
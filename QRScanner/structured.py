@@ -0,0 +1,143 @@
+import asyncio
+
+from .encoder import MAX_SEQUENCE, MODE_BYTE, DataOverflowError, data_capacity_bits, length_bits
+
+
+# Parts are kept at or below this version unless the payload needs more
+# than MAX_SEQUENCE of them; version 10 (57 x 57) still decodes quickly.
+SEQUENCE_VERSION = 10
+
+
+def parity(data):
+    value = 0
+    for byte in data:
+        value ^= byte
+    return value
+
+
+def chunk_capacity(version, error_correction="L"):
+    # Bytes of byte-mode data one part can carry after its header. Other
+    # modes are denser, so a chunk this size always fits.
+    header = 4 + 16
+    bits = data_capacity_bits(version, error_correction) - header - 4 - length_bits(MODE_BYTE, version)
+    return bits // 8
+
+
+def split(data, chunk_size):
+    # UTF-8 bytes -> chunks of at most chunk_size bytes, cut only between
+    # characters so each part is readable text on its own.
+    if chunk_size < 4:
+        raise ValueError("chunk_size must be at least 4 bytes")
+    chunks = []
+    start = 0
+    while start < len(data):
+        end = min(start + chunk_size, len(data))
+        while end < len(data) and data[end] & 0xC0 == 0x80:
+            end -= 1
+        chunks.append(data[start:end])
+        start = end
+    return chunks
+
+
+def plan_sequence(payload, error_correction="L", max_version=SEQUENCE_VERSION, chunk_size=None):
+    # Returns [(text, (index, total, parity))]. Without chunk_size the
+    # parts are as large as max_version allows, moving up a version at a
+    # time if that would take more than MAX_SEQUENCE of them.
+    data = payload.encode("utf-8")
+    check = parity(data)
+    if chunk_size is not None:
+        chunks = split(data, chunk_size)
+    else:
+        for version in range(max_version, 41):
+            chunks = split(data, chunk_capacity(version, error_correction))
+            if len(chunks) <= MAX_SEQUENCE:
+                break
+    if len(chunks) > MAX_SEQUENCE:
+        raise DataOverflowError(
+            f"Data needs {len(chunks)} symbols; structured append allows at most {MAX_SEQUENCE}"
+        )
+    total = len(chunks)
+    return [(chunk.decode("utf-8"), (index, total, check)) for index, chunk in enumerate(chunks)]
+
+
+class Reassembler:
+    # Collects the parts of structured append sequences, in any order and
+    # with repeats. Sequences are told apart by their count and parity.
+    # With ignore_completed, parts of a sequence that was already put
+    # together are dropped, as a camera keeps seeing a cycling display.
+    def __init__(self, ignore_completed=False):
+        self.ignore_completed = ignore_completed
+        self._sequences = {}
+        self._completed = set()
+
+    def add(self, text, structured_append, data=None):
+        # Returns the whole message once the last missing part arrives,
+        # else None. data is the part's raw bytes when known; the parity
+        # is checked over those (or over the text as UTF-8).
+        index, total, check = structured_append
+        key = (total, check)
+        if key in self._completed:
+            return None
+        parts = self._sequences.setdefault(key, {})
+        parts[index] = (text, data if data is not None else text.encode("utf-8"))
+        if len(parts) < total:
+            return None
+
+        del self._sequences[key]
+        if self.ignore_completed:
+            self._completed.add(key)
+        ordered = [parts[i] for i in range(total)]
+        if parity(b"".join(data for _text, data in ordered)) != check:
+            raise ValueError(f"Parity check failed for a sequence of {total} parts")
+        return "".join(text for text, _data in ordered)
+
+    def progress(self, structured_append):
+        # (parts received, total) for the sequence this part belongs to, or
+        # None once it is complete.
+        _index, total, check = structured_append
+        if (total, check) in self._completed:
+            return None
+        return len(self._sequences.get((total, check), ())), total
+
+    def clear(self):
+        self._sequences.clear()
+        self._completed.clear()
+
+
+class SequencePlayer:
+    # Pages through the images of a sequence, by hand or on a timer, so a
+    # scanning device can pick up every part from one screen.
+    def __init__(self, pages, show, interval=0.8):
+        self.pages = pages
+        self.show = show
+        self.interval = interval
+        self.index = 0
+        self._task = None
+
+    @property
+    def playing(self):
+        return self._task is not None and not self._task.done()
+
+    def go(self, index):
+        self.index = index % len(self.pages)
+        self.show(self.index, self.pages[self.index])
+
+    def next(self):
+        self.go(self.index + 1)
+
+    def previous(self):
+        self.go(self.index - 1)
+
+    def play(self):
+        if not self.playing:
+            self._task = asyncio.ensure_future(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            self.next()
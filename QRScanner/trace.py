@@ -0,0 +1,229 @@
+import functools
+import inspect
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+
+
+TRACE_NAME = "trace.json"
+SUMMARY_NAME = "trace_summary.json"
+
+
+def percentile(ordered, fraction):
+    # Nearest-rank percentile of an already sorted list.
+    if not ordered:
+        return None
+    index = min(len(ordered), max(1, math.ceil(fraction * len(ordered)))) - 1
+    return ordered[index]
+
+
+class _NullSpan:
+    # Shared by every span taken while tracing is off, so a disabled span
+    # costs one attribute check and no allocation.
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.start = None
+
+    def __enter__(self):
+        self.start = self.tracer.clock()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is not None and not issubclass(exc_type, GeneratorExit):
+            self.args["error"] = f"{exc_type.__name__}: {exc}"
+        self.tracer.record(self.name, self.start, self.tracer.clock() - self.start, self.args)
+        return False
+
+    def set(self, **args):
+        self.args.update(args)
+
+
+class _Operation:
+    def __init__(self, samples):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=samples)
+
+    def add(self, duration, failed):
+        self.count += 1
+        self.errors += failed
+        self.total += duration
+        self.max = max(self.max, duration)
+        self.recent.append(duration)
+
+    def summary(self):
+        ordered = sorted(self.recent)
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "mean_ms": round(self.total / self.count * 1000, 3) if self.count else None,
+            "max_ms": round(self.max * 1000, 3),
+            "p50_ms": round(percentile(ordered, 0.50) * 1000, 3),
+            "p95_ms": round(percentile(ordered, 0.95) * 1000, 3),
+            "p99_ms": round(percentile(ordered, 0.99) * 1000, 3),
+        }
+
+
+class Tracer:
+    # Span timing, counters and errors for the hot paths. Events go into a
+    # ring buffer of `capacity` entries (the oldest are dropped); each
+    # operation also keeps its last `samples` durations for percentiles and
+    # all-time count / mean / max. Everything is a no-op while disabled.
+    def __init__(self, enabled=False, capacity=8192, samples=1024, clock=time.perf_counter):
+        self.enabled = enabled
+        self.capacity = capacity
+        self.samples = samples
+        self.clock = clock
+        self.origin = clock()
+        self.dropped = 0
+
+        self._events = deque(maxlen=capacity)
+        self._operations = {}
+        self._counters = {}
+        self._threads = {}
+        self._lock = threading.Lock()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def clear(self):
+        with self._lock:
+            self._events.clear()
+            self._operations.clear()
+            self._counters.clear()
+            self.dropped = 0
+            self.origin = self.clock()
+
+    def span(self, name, **args):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, args)
+
+    def traced(self, name=None):
+        # Decorator for functions and coroutine functions.
+        def decorate(func):
+            span_name = name or func.__qualname__
+            if inspect.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def wrapper(*args, **kwargs):
+                    if not self.enabled:
+                        return await func(*args, **kwargs)
+                    with _Span(self, span_name, {}):
+                        return await func(*args, **kwargs)
+            else:
+                @functools.wraps(func)
+                def wrapper(*args, **kwargs):
+                    if not self.enabled:
+                        return func(*args, **kwargs)
+                    with _Span(self, span_name, {}):
+                        return func(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def count(self, name, value=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            total = self._counters[name] = self._counters.get(name, 0) + value
+            self._append({"name": name, "ph": "C", "ts": self._micros(self.clock()), "args": {name: total}})
+
+    def instant(self, name, **args):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._append({"name": name, "ph": "i", "s": "t", "ts": self._micros(self.clock()), "args": args})
+
+    def error(self, name, error):
+        # Where a failure used to surface only as a print, it is also kept
+        # here with the operation it belongs to.
+        if not self.enabled:
+            return
+        self.count(f"{name}.errors")
+        self.instant(f"{name}.error", error=f"{type(error).__name__}: {error}")
+
+    def record(self, name, start, duration, args=None):
+        args = args or {}
+        with self._lock:
+            operation = self._operations.get(name)
+            if operation is None:
+                operation = self._operations[name] = _Operation(self.samples)
+            operation.add(duration, "error" in args)
+            self._append({
+                "name": name,
+                "ph": "X",
+                "ts": self._micros(start),
+                "dur": round(duration * 1e6, 1),
+                "args": args,
+            })
+
+    def summary(self):
+        with self._lock:
+            return {
+                "operations": {name: op.summary() for name, op in sorted(self._operations.items())},
+                "counters": dict(sorted(self._counters.items())),
+                "events": len(self._events),
+                "dropped": self.dropped,
+            }
+
+    def chrome_trace(self):
+        # Trace Event Format, loadable in chrome://tracing and Perfetto.
+        pid = os.getpid()
+        with self._lock:
+            events = [dict(event, pid=pid) for event in self._events]
+            threads = dict(self._threads)
+        metadata = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+            for tid, name in threads.items()
+        ]
+        return {"traceEvents": metadata + events, "displayTimeUnit": "ms"}
+
+    def save(self, directory):
+        # Writes the trace and the summary; returns both paths.
+        os.makedirs(directory, exist_ok=True)
+        trace_path = os.path.join(directory, TRACE_NAME)
+        summary_path = os.path.join(directory, SUMMARY_NAME)
+        with open(trace_path, "w", encoding="utf-8") as f:
+            json.dump(self.chrome_trace(), f)
+        with open(summary_path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, indent=1)
+        return trace_path, summary_path
+
+    def _append(self, event):
+        # Called with the lock held.
+        thread = threading.current_thread()
+        event["tid"] = thread.ident
+        self._threads.setdefault(thread.ident, thread.name)
+        if len(self._events) == self.capacity:
+            self.dropped += 1
+        self._events.append(event)
+
+    def _micros(self, timestamp):
+        return round((timestamp - self.origin) * 1e6, 1)
+
+
+# The app's tracer; off until enabled from the menu.
+tracer = Tracer()
@@ -0,0 +1,272 @@
+"""App-level benchmarks, run off-device through tests.bridge.
+
+Measures app startup, qr_generate with a cold and a warm cache, encoder
+throughput by payload size and by QR version, the save_qr copy into a
+SAF stream, the scan-result path (handle_scan) and a live-preview
+keystroke. Results are written as JSON, keyed by the current commit, so
+runs can be compared:
+
+    python -m benchmarks.bench_app
+    python -m benchmarks.bench_app --compare benchmarks/results/<old>.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from QRScanner import encoder
+from QRScanner.streams import copy_async
+
+from tests import bridge
+
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+ENCODE_SIZES = (16, 128, 512, 1024, 2048)
+ENCODE_VERSIONS = (1, 5, 10, 20, 30, 40)
+COPY_BYTES = 4 * 1024 * 1024
+CAPTURE_BYTES = 40 * 1024
+# A change beyond this fraction is reported by --compare.
+THRESHOLD = 0.10
+
+
+def summarize(samples, unit="ms", **extra):
+    ordered = sorted(samples)
+    result = {
+        "unit": unit,
+        "iterations": len(ordered),
+        "median": round(statistics.median(ordered) * 1000, 4),
+        "min": round(ordered[0] * 1000, 4),
+        "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 4),
+    }
+    result.update(extra)
+    return result
+
+
+async def timed(func, iterations):
+    samples = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        await func(i)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def encode_payload(version):
+    # Byte-mode payload that fills the version at level L.
+    header = 4 + encoder.length_bits(encoder.MODE_BYTE, version)
+    return "x" * ((encoder.data_codewords(version, "L") * 8 - header) // 8)
+
+
+def bench_encode(iterations):
+    results = {}
+    for size in ENCODE_SIZES:
+        payload = "x" * size
+        # The first encode of a version builds its template; keep it out.
+        encoder.encode(payload)
+        samples = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            matrix = encoder.encode(payload)
+            samples.append(time.perf_counter() - start)
+        median = statistics.median(samples)
+        results[f"encode.{size}B"] = summarize(
+            samples, version=matrix.version,
+            codes_per_second=round(1 / median, 1), bytes_per_second=round(size / median, 1),
+        )
+    for version in ENCODE_VERSIONS:
+        payload = encode_payload(version)
+        encoder.encode(payload, version=version)
+        samples = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            encoder.encode(payload, version=version)
+            samples.append(time.perf_counter() - start)
+        results[f"encode.v{version}"] = summarize(
+            samples, payload_bytes=len(payload), codes_per_second=round(1 / statistics.median(samples), 1),
+        )
+    return results
+
+
+async def bench_app(app, root, iterations):
+    gui = app.main_window
+    activity = app.activity
+    # Run the post-startup pre-warm to completion so it isn't measured.
+    await app.after_first_frame()
+
+    results = {}
+
+    async def generate_cold(i):
+        gui._result = f"https://example.com/item/cold/{i}"
+        await gui.qr_generate()
+
+    _width, pixels = gui.deferred.get("qr_size")
+    results["qr_generate.cold"] = summarize(await timed(generate_cold, iterations), size=pixels)
+
+    gui._result = "https://example.com/item/warm"
+    await gui.qr_generate()
+
+    async def generate_warm(i):
+        await gui.qr_generate()
+
+    results["qr_generate.warm"] = summarize(await timed(generate_warm, iterations * 10))
+
+    # save_qr into an already granted folder: the first save creates the
+    # document, later ones rewrite it in place.
+    folder = "content://com.android.externalstorage.documents/tree/primary"
+    activity.resolver.takePersistableUriPermission(bridge.Uri(folder), 3)
+    gui.saved_folder.uri = folder
+    gui._result = "https://example.com/item/save"
+    gui._qr_image = await gui.qr_generate()
+    await gui.save_qr(None)
+
+    async def save(i):
+        await gui.save_qr(None)
+
+    samples = await timed(save, iterations)
+    results["save_qr"] = summarize(
+        samples, bytes=len(gui._qr_image),
+        bytes_per_second=round(len(gui._qr_image) / statistics.median(samples), 1),
+    )
+
+    blob = os.urandom(COPY_BYTES)
+
+    async def copy(i):
+        await copy_async(blob, bridge.OutputStream(bytearray()))
+
+    samples = await timed(copy, max(3, iterations // 4))
+    results["save_qr.copy_4MB"] = summarize(
+        samples, bytes_per_second=round(COPY_BYTES / statistics.median(samples), 1),
+    )
+
+    # Scan results: one new code per scan, so each one is encoded, checked
+    # against the history and recorded.
+    counter = iter(range(10 ** 6))
+    activity.respond("ScanContract", lambda options: bridge.ScanResult(f"scan-{next(counter)}"))
+
+    async def scan(i):
+        await gui.handle_scan(False, False)
+
+    results["scan.handle"] = summarize(await timed(scan, iterations))
+
+    capture = os.urandom(CAPTURE_BYTES)
+
+    def captured(options):
+        path = os.path.join(root, "barcodeimage.jpg")
+        with open(path, "wb") as f:
+            f.write(capture)
+        return bridge.ScanResult(f"scan-{next(counter)}", image_path=path)
+
+    activity.respond("ScanContract", captured)
+
+    async def scan_captured(i):
+        await gui.handle_scan(False, False, capture_image=True)
+
+    results["scan.handle_captured"] = summarize(await timed(scan_captured, iterations))
+
+    # Live preview of a long payload, one keystroke at a time; flush()
+    # renders at once instead of waiting out the debounce delay.
+    await gui.live_preview(None)
+    preview = gui.deferred.get("preview")
+    text = "https://example.com/" + "p" * 300
+
+    async def keystroke(i):
+        gui.preview_input.value = f"{text}{i}"
+        await preview.flush()
+
+    samples = await timed(keystroke, iterations)
+    results["preview.keystroke"] = summarize(
+        samples, size=preview.size, masks_reused=gui.preview_encoder.reused,
+    )
+    gui.close_preview()
+
+    await gui.history_call("flush")
+    bridge.Toast.shown.clear()
+    return results
+
+
+def commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(iterations=20):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        with tempfile.TemporaryDirectory() as root:
+            results = bench_encode(iterations)
+            start = time.perf_counter()
+            app = bridge.start_app(root, loop)
+            # One sample: the app module is only imported once per process.
+            results["startup"] = summarize([time.perf_counter() - start])
+            try:
+                results.update(loop.run_until_complete(bench_app(app, root, iterations)))
+            finally:
+                bridge.stop_app(app)
+    finally:
+        loop.close()
+        asyncio.set_event_loop(None)
+    return {
+        "commit": commit(),
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "iterations": iterations,
+        "results": results,
+    }
+
+
+def compare(old, new, threshold=THRESHOLD):
+    # (name, old median, new median, ratio, flag) for benchmarks in both.
+    rows = []
+    for name, result in new["results"].items():
+        previous = old["results"].get(name)
+        if previous is None or not previous["median"]:
+            continue
+        ratio = result["median"] / previous["median"]
+        flag = "slower" if ratio > 1 + threshold else "faster" if ratio < 1 - threshold else ""
+        rows.append((name, previous["median"], result["median"], ratio, flag))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_app")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--output", help="result file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    args = parser.parse_args(argv)
+
+    report = run(args.iterations)
+    output = args.output or os.path.join(RESULTS_DIR, f"{report['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1, sort_keys=True)
+
+    print(f"{'benchmark':<24}{'median ms':>12}{'p95 ms':>10}")
+    for name, result in report["results"].items():
+        print(f"{name:<24}{result['median']:>12.3f}{result['p95']:>10.3f}")
+    print(f"Saved {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            old = json.load(f)
+        print(f"\nAgainst {old['commit']}:")
+        print(f"{'benchmark':<24}{'old ms':>10}{'new ms':>10}{'ratio':>8}")
+        for name, before, after, ratio, flag in compare(old, report):
+            print(f"{name:<24}{before:>10.3f}{after:>10.3f}{ratio:>8.2f}  {flag}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""Compare QRScanner.png.write_png with qrcode's make_image + PIL save.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_png
+"""
+import io
+import timeit
+
+import qrcode
+
+from QRScanner import png
+
+
+PAYLOADS = {
+    "short": "https://example.com",
+    "medium": "x" * 300,
+    "large": "y" * 2000,
+}
+BOX_SIZE = 7
+BORDER = 1
+
+
+def make_qr(payload):
+    qr = qrcode.QRCode(
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=BOX_SIZE,
+        border=BORDER,
+    )
+    qr.add_data(payload)
+    qr.make(fit=True)
+    return qr
+
+
+def pil_png(qr):
+    buffer = io.BytesIO()
+    qr.make_image(fill_color="black", back_color="white").save(buffer)
+    return buffer.getvalue()
+
+
+def writer(use_numpy):
+    def render(qr):
+        return png.write_png(qr.modules, box_size=BOX_SIZE, border=BORDER, use_numpy=use_numpy)
+    return render
+
+
+def best_of(func, qr, repeat=5):
+    number = max(1, int(0.2 / max(timeit.timeit(lambda: func(qr), number=1), 1e-6)))
+    return min(timeit.repeat(lambda: func(qr), number=number, repeat=repeat)) / number
+
+
+def main():
+    candidates = {"write_png": writer(False)}
+    if png.numpy is not None:
+        candidates["write_png[numpy]"] = writer(True)
+    try:
+        import PIL  # noqa: F401
+        candidates["make_image+PIL"] = pil_png
+    except ImportError:
+        print("Pillow not installed; skipping the make_image baseline")
+
+    print(f"{'payload':<8}{'version':>8}{'renderer':>20}{'ms':>10}{'bytes':>9}")
+    for name, payload in PAYLOADS.items():
+        qr = make_qr(payload)
+        for label, func in candidates.items():
+            seconds = best_of(func, qr)
+            size = len(func(qr))
+            print(f"{name:<8}{qr.version:>8}{label:>20}{seconds * 1000:>10.3f}{size:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Scan-to-image latency: zxing's captured frame vs re-encoding the payload.
+
+Capture path: zxing compresses the decoded camera frame to JPEG (quality
+100, as CaptureManager does when setBarcodeImageEnabled is on) and writes
+it to the cache directory; the app reads and deletes it, and the ImageView
+decodes the JPEG into a bitmap. Re-encode path: the payload is encoded and
+rasterized at the on-screen size, and the ImageView decodes that 1-bit PNG.
+
+Pillow's libjpeg/zlib codecs stand in for Android's, so the numbers compare
+the two paths rather than predict device timings. The frame is a rendered
+code blurred and noised to look like a camera image. Run from the
+repository root:
+
+    python -m benchmarks.bench_scan_image
+"""
+import io
+import os
+import tempfile
+import timeit
+
+from QRScanner.generator import DEFAULT_PARAMS, render_png
+
+
+PAYLOADS = {
+    "short": "https://example.com/item/42",
+    "medium": "https://example.com/?q=" + "x" * 300,
+    "large": "y" * 2000,
+}
+# zxing saves the preview cropped to the viewfinder at half resolution.
+FRAME_SIZE = 480
+TARGET_SIZE = 900
+REPEAT = 20
+
+
+def camera_frame(payload):
+    from PIL import Image, ImageFilter
+
+    code = Image.open(io.BytesIO(render_png(payload, dict(DEFAULT_PARAMS, size=FRAME_SIZE * 3 // 4))))
+    frame = Image.new("L", (FRAME_SIZE, FRAME_SIZE), 170)
+    frame.paste(code.convert("L").rotate(4, expand=True, fillcolor=170), (FRAME_SIZE // 10, FRAME_SIZE // 10))
+    noise = Image.effect_noise((FRAME_SIZE, FRAME_SIZE), 24)
+    frame = Image.blend(frame.filter(ImageFilter.GaussianBlur(1.2)), noise, 0.15)
+    return frame.convert("RGB")
+
+
+def read_scan_image(path):
+    # As QRScanner.__main__.read_scan_image, which needs the Java bridge to
+    # import.
+    with open(path, "rb") as f:
+        data = f.read()
+    os.remove(path)
+    return data
+
+
+def show(data):
+    # What the ImageView does with the bytes: decode to an ARGB bitmap.
+    from PIL import Image
+
+    return Image.open(io.BytesIO(data)).convert("RGBA")
+
+
+def best(func, setup=lambda: None):
+    return min(timeit.repeat(func, setup=setup, number=1, repeat=REPEAT)) * 1000
+
+
+def capture_timings(directory, frame):
+    path = os.path.join(directory, "barcodeimage.jpg")
+
+    def save():
+        buffer = io.BytesIO()
+        frame.save(buffer, "JPEG", quality=100)
+        with open(path, "wb") as f:
+            f.write(buffer.getvalue())
+
+    save()
+    data = read_scan_image(path)
+    return {
+        "jpeg_save": best(save),
+        "read": best(lambda: read_scan_image(path), setup=save),
+        "decode": best(lambda: show(data)),
+        "bytes": len(data),
+    }
+
+
+def reencode_timings(payload, params):
+    counter = iter(range(10 ** 6))
+    data = render_png(payload, params)
+    return {
+        # A new payload each run, so nothing comes from a cache.
+        "render": best(lambda: render_png(f"{payload}#{next(counter)}", params)),
+        "decode": best(lambda: show(data)),
+        "bytes": len(data),
+    }
+
+
+def main():
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        print("Pillow is needed to encode and decode the images")
+        return
+
+    params = dict(DEFAULT_PARAMS, size=TARGET_SIZE)
+    print(f"{'payload':<8}{'path':>10}{'encode ms':>11}{'read ms':>9}{'decode ms':>11}{'total ms':>10}{'bytes':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for name, payload in PAYLOADS.items():
+            capture = capture_timings(directory, camera_frame(payload))
+            total = capture["jpeg_save"] + capture["read"] + capture["decode"]
+            print(
+                f"{name:<8}{'capture':>10}{capture['jpeg_save']:>11.3f}{capture['read']:>9.3f}"
+                f"{capture['decode']:>11.3f}{total:>10.3f}{capture['bytes']:>9}"
+            )
+            reencode = reencode_timings(payload, params)
+            total = reencode["render"] + reencode["decode"]
+            print(
+                f"{'':<8}{'re-encode':>10}{reencode['render']:>11.3f}{'-':>9}"
+                f"{reencode['decode']:>11.3f}{total:>10.3f}{reencode['bytes']:>9}"
+            )
+
+
+if __name__ == "__main__":
+    main()
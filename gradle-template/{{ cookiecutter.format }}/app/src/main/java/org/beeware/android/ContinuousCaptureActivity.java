@@ -0,0 +1,168 @@
+package org.beeware.android;
+
+import android.app.Activity;
+import android.content.pm.ActivityInfo;
+import android.os.Bundle;
+import android.os.Handler;
+import android.os.Looper;
+import android.os.SystemClock;
+
+import com.google.zxing.BarcodeFormat;
+import com.google.zxing.ResultMetadataType;
+import com.google.zxing.ResultPoint;
+import com.journeyapps.barcodescanner.BarcodeCallback;
+import com.journeyapps.barcodescanner.BarcodeResult;
+import com.journeyapps.barcodescanner.BeepManager;
+import com.journeyapps.barcodescanner.DecoratedBarcodeView;
+import com.journeyapps.barcodescanner.DefaultDecoderFactory;
+
+import java.util.Collections;
+import java.util.List;
+import java.util.Map;
+
+
+// Keeps the camera open and reports every decoded QR code to a listener,
+// instead of returning a single result like CaptureActivity. The Python
+// session pauses decoding when it falls behind and finishes the activity
+// when it is done.
+
+public class ContinuousCaptureActivity extends Activity {
+    public static final String EXTRA_PROMPT = "PROMPT";
+    public static final String EXTRA_BEEP = "BEEP";
+    public static final String EXTRA_TORCH = "TORCH";
+    public static final String EXTRA_TIMEOUT = "TIMEOUT";
+
+    private static IContinuousScanListener listener;
+    private static ContinuousCaptureActivity current;
+
+    private final Handler handler = new Handler(Looper.getMainLooper());
+    private DecoratedBarcodeView barcodeView;
+    private BeepManager beepManager;
+    private boolean decoding = true;
+    private String closeReason = "closed";
+
+    public static void setListener(IContinuousScanListener scanListener) {
+        listener = scanListener;
+    }
+
+    public static void pauseDecoding() {
+        runOnCurrent(new Runnable() {
+            public void run() {
+                current.decoding = false;
+                current.barcodeView.getBarcodeView().stopDecoding();
+            }
+        });
+    }
+
+    public static void resumeDecoding() {
+        runOnCurrent(new Runnable() {
+            public void run() {
+                current.decoding = true;
+                current.barcodeView.decodeContinuous(current.callback);
+            }
+        });
+    }
+
+    public static void finishSession(final String reason) {
+        runOnCurrent(new Runnable() {
+            public void run() {
+                current.closeReason = reason;
+                current.finish();
+            }
+        });
+    }
+
+    private static void runOnCurrent(final Runnable action) {
+        new Handler(Looper.getMainLooper()).post(new Runnable() {
+            public void run() {
+                if (current != null && !current.isFinishing()) {
+                    action.run();
+                }
+            }
+        });
+    }
+
+    private final BarcodeCallback callback = new BarcodeCallback() {
+        @Override
+        public void barcodeResult(BarcodeResult result) {
+            if (result.getText() == null || !decoding) {
+                return;
+            }
+            beepManager.playBeepSoundAndVibrate();
+            int sequence = -1;
+            int parity = -1;
+            Map<ResultMetadataType, Object> metadata = result.getResultMetadata();
+            if (metadata != null && metadata.containsKey(ResultMetadataType.STRUCTURED_APPEND_SEQUENCE)) {
+                sequence = (Integer) metadata.get(ResultMetadataType.STRUCTURED_APPEND_SEQUENCE);
+                parity = (Integer) metadata.get(ResultMetadataType.STRUCTURED_APPEND_PARITY);
+            }
+            if (listener != null) {
+                listener.onScan(result.getText(), SystemClock.elapsedRealtime(), sequence, parity);
+            }
+        }
+
+        @Override
+        public void possibleResultPoints(List<ResultPoint> resultPoints) {
+        }
+    };
+
+    private final Runnable timeout = new Runnable() {
+        public void run() {
+            closeReason = "timeout";
+            finish();
+        }
+    };
+
+    @Override
+    protected void onCreate(Bundle savedInstanceState) {
+        super.onCreate(savedInstanceState);
+        setRequestedOrientation(ActivityInfo.SCREEN_ORIENTATION_PORTRAIT);
+
+        barcodeView = new DecoratedBarcodeView(this);
+        barcodeView.getBarcodeView().setDecoderFactory(
+            new DefaultDecoderFactory(Collections.singletonList(BarcodeFormat.QR_CODE))
+        );
+        String prompt = getIntent().getStringExtra(EXTRA_PROMPT);
+        if (prompt != null) {
+            barcodeView.setStatusText(prompt);
+        }
+        if (getIntent().getBooleanExtra(EXTRA_TORCH, false)) {
+            barcodeView.setTorchOn();
+        }
+        setContentView(barcodeView);
+
+        beepManager = new BeepManager(this);
+        beepManager.setBeepEnabled(getIntent().getBooleanExtra(EXTRA_BEEP, false));
+
+        long timeoutMillis = getIntent().getLongExtra(EXTRA_TIMEOUT, 0);
+        if (timeoutMillis > 0) {
+            handler.postDelayed(timeout, timeoutMillis);
+        }
+        current = this;
+        barcodeView.decodeContinuous(callback);
+    }
+
+    @Override
+    protected void onResume() {
+        super.onResume();
+        barcodeView.resume();
+    }
+
+    @Override
+    protected void onPause() {
+        super.onPause();
+        barcodeView.pause();
+    }
+
+    @Override
+    protected void onDestroy() {
+        super.onDestroy();
+        handler.removeCallbacks(timeout);
+        if (current == this) {
+            current = null;
+        }
+        if (listener != null && isFinishing()) {
+            listener.onClosed(closeReason);
+        }
+    }
+}
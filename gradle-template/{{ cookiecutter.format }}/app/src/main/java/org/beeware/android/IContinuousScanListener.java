@@ -0,0 +1,8 @@
+package org.beeware.android;
+
+public interface IContinuousScanListener {
+    // sequence and parity are -1 unless the code is part of a structured
+    // append sequence; sequence is then (index << 4) | (total - 1).
+    public void onScan(String contents, long timestampMillis, int sequence, int parity);
+    public void onClosed(String reason);
+}
@@ -0,0 +1,773 @@
+"""In-process stand-ins for Chaquopy's bridge, the Android classes and the
+Toga widgets that QRScanner/__main__.py imports.
+
+install() registers them in sys.modules so the app module imports on any
+Python; start_app() then runs the real startup against a fake activity
+whose activity results are answered in-process:
+
+    from tests import bridge
+
+    bridge.install()
+    app = bridge.start_app(tmp_dir)
+    app.activity.respond("ScanContract", lambda options: bridge.ScanResult("hello"))
+    await app.main_window.handle_scan(False, False)
+
+Only what the app touches is modelled; anything else is a Stub that
+accepts every call. On a device, where the real Chaquopy bridge is
+present, real_java_available() is true and install() refuses to run.
+"""
+import asyncio
+import importlib.util
+import itertools
+import os
+import sys
+import types
+
+
+# Generic stand-ins ---------------------------------------------------------
+
+class _StubMeta(type):
+    def __getattr__(cls, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return Stub()
+
+
+class Stub(metaclass=_StubMeta):
+    # Accepts any constructor arguments, attribute access or call.
+    def __init__(self, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return Stub()
+
+    def __call__(self, *args, **kwargs):
+        return Stub()
+
+
+class _Proxy:
+    def __init__(self, *args, **kwargs):
+        pass
+
+
+def dynamic_proxy(*interfaces):
+    return _Proxy
+
+
+def cast(cls, obj):
+    return obj
+
+
+def jint(value):
+    return int(value)
+
+
+def jlong(value):
+    return int(value)
+
+
+class _Contract:
+    def __init__(self, name, *args):
+        self.name = name.rsplit("$", 1)[-1]
+        self.args = args
+
+
+def jclass(name):
+    return lambda *args: _Contract(name, *args)
+
+
+# java.* -------------------------------------------------------------------
+
+class Arrays:
+    @staticmethod
+    def asList(*items):
+        return list(items)
+
+
+class Runnable:
+    pass
+
+
+class File:
+    def __init__(self, path):
+        self.path = path
+
+
+# android.* ----------------------------------------------------------------
+
+class Uri:
+    def __init__(self, value):
+        self.value = value
+
+    @staticmethod
+    def parse(value):
+        return Uri(value)
+
+    def toString(self):
+        return self.value
+
+    def __eq__(self, other):
+        return isinstance(other, Uri) and other.value == self.value
+
+    def __hash__(self):
+        return hash(self.value)
+
+
+class DocumentsContract:
+    class Document:
+        COLUMN_DOCUMENT_ID = "document_id"
+        COLUMN_DISPLAY_NAME = "_display_name"
+
+    @staticmethod
+    def getTreeDocumentId(uri):
+        return uri.value.rsplit("/tree/", 1)[-1]
+
+    @staticmethod
+    def buildDocumentUriUsingTree(tree_uri, document_id):
+        return Uri(f"{tree_uri.value}/document/{document_id}")
+
+    @staticmethod
+    def buildChildDocumentsUriUsingTree(tree_uri, document_id):
+        return Uri(f"{tree_uri.value}/document/{document_id}/children")
+
+    @staticmethod
+    def getDocumentId(uri):
+        return uri.value.rsplit("/document/", 1)[-1]
+
+    @staticmethod
+    def createDocument(resolver, folder_uri, mime_type, name):
+        return resolver.create_document(folder_uri, name)
+
+
+class Intent(Stub):
+    ACTION_SEND = "android.intent.action.SEND"
+    EXTRA_STREAM = "android.intent.extra.STREAM"
+    FLAG_GRANT_READ_URI_PERMISSION = 0x1
+    FLAG_GRANT_WRITE_URI_PERMISSION = 0x2
+    FLAG_ACTIVITY_NEW_TASK = 0x10000000
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.extras = {}
+
+    def putExtra(self, name, value):
+        self.extras[name] = value
+
+    def getBooleanExtra(self, name, default):
+        return self.extras.get(name, default)
+
+    @staticmethod
+    def createChooser(intent, title):
+        return intent
+
+
+class Configuration:
+    UI_MODE_NIGHT_MASK = 0x30
+    UI_MODE_NIGHT_YES = 0x20
+
+
+class Toast:
+    LENGTH_SHORT = 0
+    LENGTH_LONG = 1
+    shown = []
+
+    def __init__(self, text):
+        self.text = text
+
+    @classmethod
+    def makeText(cls, context, text, duration):
+        return cls(str(text))
+
+    def show(self):
+        Toast.shown.append(self.text)
+
+
+class _Editable:
+    def __init__(self, text):
+        self.text = text
+
+    def toString(self):
+        return self.text
+
+
+class EditText(Stub):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.text = ""
+
+    def setText(self, text):
+        self.text = text
+
+    def getText(self):
+        return _Editable(self.text)
+
+
+class AlertDialog:
+    # Keeps the listeners the app installs, so tests can press the buttons
+    # or cancel a shown dialog. Every shown dialog is kept in shown.
+    BUTTON_POSITIVE = -1
+    BUTTON_NEGATIVE = -2
+    shown = []
+
+    class Builder:
+        def __init__(self, context):
+            self.dialog = AlertDialog()
+
+        def setTitle(self, title):
+            self.dialog.title = title
+
+        def setView(self, view):
+            self.dialog.view = view
+
+        def setPositiveButton(self, text, listener):
+            self.dialog.buttons[AlertDialog.BUTTON_POSITIVE] = listener
+
+        def setNegativeButton(self, text, listener):
+            self.dialog.buttons[AlertDialog.BUTTON_NEGATIVE] = listener
+
+        def setCancelable(self, cancelable):
+            pass
+
+        def create(self):
+            return self.dialog
+
+    def __init__(self):
+        self.title = None
+        self.view = None
+        self.buttons = {}
+        self.cancel_listener = None
+        self.showing = False
+
+    def getWindow(self):
+        return Stub()
+
+    def getButton(self, which):
+        return Stub()
+
+    def setOnKeyListener(self, listener):
+        pass
+
+    def setOnCancelListener(self, listener):
+        self.cancel_listener = listener
+
+    def show(self):
+        self.showing = True
+        AlertDialog.shown.append(self)
+
+    def dismiss(self):
+        self.showing = False
+
+    def click(self, which):
+        self.buttons[which].onClick(self, which)
+        self.dismiss()
+
+    def cancel(self):
+        self.cancel_listener.onCancel(self)
+        self.dismiss()
+
+
+class FileProvider:
+    @staticmethod
+    def getUriForFile(context, authority, file):
+        return Uri(f"content://{authority}/{os.path.basename(file.path)}")
+
+
+class OutputStream:
+    # A SAF document stream: write() copies the bytes, as the bridge does
+    # when it converts them to a byte[], and returns nothing.
+    def __init__(self, document):
+        self.document = document
+        self.writes = 0
+
+    def write(self, data):
+        self.document += bytes(data)
+        self.writes += 1
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class Cursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.position = -1
+
+    def moveToNext(self):
+        self.position += 1
+        return self.position < len(self.rows)
+
+    def getString(self, column):
+        return self.rows[self.position][column]
+
+    def close(self):
+        pass
+
+
+class Permission:
+    def __init__(self, uri):
+        self.uri = uri
+
+    def getUri(self):
+        return self.uri
+
+    def isWritePermission(self):
+        return True
+
+
+class ContentResolver:
+    # Documents live in memory: uri string -> bytearray.
+    def __init__(self):
+        self.documents = {}
+        self.names = {}
+        self.permissions = []
+        self._ids = itertools.count(1)
+
+    def create_document(self, folder_uri, name):
+        document_id = f"doc{next(self._ids)}"
+        uri = Uri(f"{folder_uri.value.split('/document/')[0]}/document/{document_id}")
+        self.documents[uri.value] = bytearray()
+        self.names[uri.value] = (folder_uri.value.split("/document/")[0], name, document_id)
+        return uri
+
+    def openOutputStream(self, uri, mode="w"):
+        document = self.documents.setdefault(uri.value, bytearray())
+        if "t" in mode or mode == "w":
+            del document[:]
+        return OutputStream(document)
+
+    def query(self, uri, projection, selection, args, order):
+        tree = uri.value.split("/document/")[0]
+        return Cursor([
+            (document_id, name)
+            for value, (folder, name, document_id) in self.names.items()
+            if folder == tree
+        ])
+
+    def getPersistedUriPermissions(self):
+        return [Permission(Uri(value)) for value in self.permissions]
+
+    def takePersistableUriPermission(self, uri, flags):
+        if uri.value not in self.permissions:
+            self.permissions.append(uri.value)
+
+    def releasePersistableUriPermission(self, uri, flags):
+        if uri.value in self.permissions:
+            self.permissions.remove(uri.value)
+
+
+class _Display:
+    densityDpi = 420
+
+
+class _Resources:
+    def __init__(self):
+        self.configuration = Stub()
+        self.configuration.uiMode = 0x10
+
+    def getConfiguration(self):
+        return self.configuration
+
+    def getDisplayMetrics(self):
+        return _Display()
+
+
+class ActivityResultLauncher:
+    def __init__(self, activity, contract, callback):
+        self.activity = activity
+        self.contract = contract
+        self.callback = callback
+        self.launches = 0
+
+    def launch(self, value):
+        # Results come back on a later loop iteration, as they would after
+        # the other activity finishes.
+        self.launches += 1
+        responder = self.activity.responders.get(_contract_name(self.contract))
+        result = responder(value) if responder is not None else None
+        self.activity.loop.call_soon(self.callback.onActivityResult, result)
+
+
+def _contract_name(contract):
+    return contract.name if isinstance(contract, _Contract) else type(contract).__name__
+
+
+class _View:
+    def __init__(self, activity):
+        self.activity = activity
+
+    def getDecorView(self):
+        return self
+
+    def post(self, runnable):
+        self.activity.loop.call_soon(runnable.run)
+
+
+class Looper:
+    # The main looper is the asyncio loop the app runs on.
+    main = None
+
+    def __init__(self, loop):
+        self.loop = loop
+
+    @classmethod
+    def getMainLooper(cls):
+        return cls.main
+
+
+class Handler:
+    posts = 0
+
+    def __init__(self, looper):
+        self.looper = looper
+
+    def post(self, runnable):
+        # Always queued behind whatever the looper is running, even when
+        # called from the looper's own thread.
+        Handler.posts += 1
+        self.looper.loop.call_soon_threadsafe(runnable.run)
+        return True
+
+
+class Activity:
+    # MainActivity.singletonThis. The asyncio loop stands in for the UI
+    # thread's looper; like the real call made on the UI thread,
+    # runOnUiThread() runs the Runnable at once.
+    def __init__(self, loop):
+        self.loop = loop
+        self.resolver = ContentResolver()
+        self.resources = _Resources()
+        self.responders = {}
+        self.launchers = []
+        self.started = []
+        self.ui_posts = 0
+
+    def respond(self, contract_name, responder):
+        # responder(launch value) -> the result the callback receives.
+        self.responders[contract_name] = responder
+
+    def getApplicationContext(self):
+        return self
+
+    def getContentResolver(self):
+        return self.resolver
+
+    def getResources(self):
+        return self.resources
+
+    def getPackageName(self):
+        return "com.qrscanner"
+
+    def getSystemService(self, name):
+        return Stub()
+
+    def getWindow(self):
+        return _View(self)
+
+    def registerForActivityResult(self, contract, callback):
+        launcher = ActivityResultLauncher(self, contract, callback)
+        self.launchers.append(launcher)
+        return launcher
+
+    def runOnUiThread(self, runnable):
+        self.ui_posts += 1
+        runnable.run()
+
+    def startActivity(self, intent):
+        self.started.append(intent)
+
+    def finish(self):
+        pass
+
+
+class MainActivity:
+    singletonThis = None
+    python_app = None
+
+    @classmethod
+    def setPythonApp(cls, app):
+        cls.python_app = app
+
+
+class ContinuousCaptureActivity:
+    EXTRA_PROMPT = "PROMPT"
+    EXTRA_BEEP = "BEEP"
+    EXTRA_TORCH = "TORCH"
+    EXTRA_TIMEOUT = "TIMEOUT"
+    listener = None
+
+    @classmethod
+    def setListener(cls, listener):
+        cls.listener = listener
+
+    @staticmethod
+    def pauseDecoding():
+        pass
+
+    @staticmethod
+    def resumeDecoding():
+        pass
+
+    @staticmethod
+    def finishSession(reason):
+        pass
+
+
+# zxing ----------------------------------------------------------------------
+
+class ScanOptions:
+    def __init__(self):
+        self.settings = {}
+        self.extras = {}
+
+    def __getattr__(self, name):
+        if not name.startswith("set"):
+            raise AttributeError(name)
+
+        def setter(value):
+            self.settings[name[3:]] = value
+        return setter
+
+    def addExtra(self, name, value):
+        self.extras[name] = value
+
+
+class ScanContract:
+    pass
+
+
+class ScanResult:
+    # ScanIntentResult: contents, plus the saved frame when requested.
+    def __init__(self, contents, image_path=None, timeout=False):
+        self.contents = contents
+        self.image_path = image_path
+        self.intent = Intent()
+        self.intent.putExtra("TIMEOUT", timeout)
+
+    def getContents(self):
+        return self.contents
+
+    def getBarcodeImagePath(self):
+        return self.image_path
+
+    def getOriginalIntent(self):
+        return self.intent
+
+
+# toga -----------------------------------------------------------------------
+
+class Widget:
+    def __init__(self, *args, **kwargs):
+        self.children = []
+        self.style = kwargs.pop("style", None)
+        for name, value in kwargs.items():
+            setattr(self, name, value)
+        if not hasattr(self, "image"):
+            self.image = None
+
+    def add(self, *children):
+        self.children.extend(children)
+
+    def insert(self, index, child):
+        self.children.insert(index, child)
+
+    def remove(self, *children):
+        for child in children:
+            self.children.remove(child)
+
+    def clear(self):
+        self.children = []
+
+
+class TextInput(Widget):
+    # Setting value fires on_change, as typing does.
+    def __init__(self, *args, value="", **kwargs):
+        self._value = value
+        super().__init__(*args, **kwargs)
+
+    @property
+    def value(self):
+        return self._value
+
+    @value.setter
+    def value(self, value):
+        self._value = value
+        on_change = getattr(self, "on_change", None)
+        if on_change is not None:
+            on_change(self)
+
+
+class Image:
+    def __init__(self, src=None):
+        self.src = src
+
+
+class Pack:
+    def __init__(self, **properties):
+        self.__dict__.update(properties)
+
+
+class Command:
+    def __init__(self, action, text=None, **kwargs):
+        self.action = action
+        self.text = text
+
+
+class _Commands(list):
+    def add(self, *commands):
+        self.extend(commands)
+
+
+class _Screen:
+    def __init__(self, width, height):
+        self.size = types.SimpleNamespace(width=width, height=height)
+
+
+class App:
+    app = None
+    paths_root = None
+
+    def __init__(self, formal_name=None, app_id=None, version="0.0.0", **kwargs):
+        App.app = self
+        self.formal_name = formal_name
+        self.app_id = app_id
+        self.version = version
+        self.commands = _Commands()
+        self.screens = [_Screen(411, 914)]
+        self.main_window = None
+        root = App.paths_root
+        self.paths = types.SimpleNamespace(
+            data=os.path.join(root, "data"), cache=os.path.join(root, "cache")
+        )
+
+
+class MainWindow:
+    def __init__(self, *args, **kwargs):
+        self.content = None
+        self.dialogs = []
+
+    @property
+    def app(self):
+        return App.app
+
+    def show(self):
+        pass
+
+    def question_dialog(self, **kwargs):
+        self.dialogs.append(kwargs)
+
+
+def _rgb(r, g, b):
+    return f"rgb({r}, {g}, {b})"
+
+
+# Installation ---------------------------------------------------------------
+
+def _module(name, **attributes):
+    module = sys.modules.get(name)
+    if module is None:
+        module = sys.modules[name] = types.ModuleType(name)
+        parent, _, child = name.rpartition(".")
+        if parent:
+            setattr(_module(parent), child, module)
+    module.__dict__.update(attributes)
+    return module
+
+
+def real_java_available():
+    # True where Chaquopy's own java module is imported or importable.
+    module = sys.modules.get("java")
+    if module is not None:
+        return not getattr(module, "__fake_bridge__", False)
+    return importlib.util.find_spec("java") is not None
+
+
+def install():
+    # Idempotent; refuses to shadow a real Chaquopy or Toga install.
+    for name in ("java", "toga"):
+        existing = sys.modules.get(name)
+        if existing is not None and not getattr(existing, "__fake_bridge__", False):
+            raise RuntimeError(f"A real {name} module is already imported")
+
+    stubs = {name: Stub for name in (
+        "KeyEvent", "Context", "ClipData", "ClipboardManager", "DialogInterface",
+        "InputType", "Color", "Bitmap", "BitmapFactory", "ColorDrawable",
+        "ActivityResultCallback", "IPythonApp", "PortraitCaptureActivity", "IContinuousScanListener",
+    )}
+    _module(
+        "java", __fake_bridge__=True,
+        dynamic_proxy=dynamic_proxy, cast=cast, jclass=jclass, jint=jint, jlong=jlong,
+    )
+    _module("java.util", Arrays=Arrays)
+    _module("java.lang", Runnable=Runnable)
+    _module("java.io", File=File)
+    _module("android.app", AlertDialog=AlertDialog)
+    _module("android.net", Uri=Uri)
+    _module("android.provider", DocumentsContract=DocumentsContract)
+    _module("android.view", KeyEvent=stubs["KeyEvent"])
+    _module("android.os", Handler=Handler, Looper=Looper)
+    _module(
+        "android.content", Intent=Intent, Context=stubs["Context"], ClipData=stubs["ClipData"],
+        ClipboardManager=stubs["ClipboardManager"], DialogInterface=stubs["DialogInterface"],
+    )
+    _module("android.content.res", Configuration=Configuration)
+    _module("android.widget", Toast=Toast, EditText=EditText)
+    _module("android.text", InputType=stubs["InputType"])
+    _module("android.graphics", Color=stubs["Color"], Bitmap=stubs["Bitmap"], BitmapFactory=stubs["BitmapFactory"])
+    _module("android.graphics.drawable", ColorDrawable=stubs["ColorDrawable"])
+    _module("androidx.core.content", FileProvider=FileProvider)
+    _module("androidx.activity.result", ActivityResultCallback=stubs["ActivityResultCallback"])
+    _module("com.journeyapps.barcodescanner", ScanOptions=ScanOptions, ScanContract=ScanContract)
+    _module(
+        "org.beeware.android",
+        MainActivity=MainActivity, IPythonApp=stubs["IPythonApp"],
+        PortraitCaptureActivity=stubs["PortraitCaptureActivity"],
+        ContinuousCaptureActivity=ContinuousCaptureActivity,
+        IContinuousScanListener=stubs["IContinuousScanListener"],
+    )
+
+    widgets = {name: type(name, (Widget,), {}) for name in (
+        "Box", "Label", "Button", "Switch", "ImageView", "ScrollContainer", "Selection",
+    )}
+    _module(
+        "toga", __fake_bridge__=True,
+        App=App, MainWindow=MainWindow, Image=Image, Command=Command, TextInput=TextInput, **widgets,
+    )
+    _module("toga.style.pack", Pack=Pack)
+    _module("toga.constants", COLUMN="column", ROW="row", CENTER="center", BOLD="bold")
+    _module("toga.colors", rgb=_rgb, WHITE="white")
+
+
+def start_app(root, loop=None):
+    # Imports the app module, creates the app with data and cache under
+    # root and runs its startup on loop (default: the current loop).
+    install()
+    import importlib
+
+    app_module = importlib.import_module("QRScanner.__main__")
+    loop = loop or asyncio.get_event_loop()
+    MainActivity.singletonThis = Activity(loop)
+    Looper.main = Looper(loop)
+    AlertDialog.shown.clear()
+    Handler.posts = 0
+    App.paths_root = root
+    app = app_module.QRScannerExample(formal_name="QRScanner", app_id="com.qrscanner", version="1.3.0")
+    app.activity = MainActivity.singletonThis
+    app.startup()
+    return app
+
+
+def stop_app(app):
+    # Lets pending app tasks (such as the startup pre-warm) finish and stops
+    # the worker threads, so the loop can be closed cleanly.
+    loop = app.activity.loop
+    pending = asyncio.all_tasks(loop)
+    if pending:
+        loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+    app.main_window.history_executor.shutdown(wait=True)
+    app.main_window.qr_generator.executor.shutdown(wait=True)
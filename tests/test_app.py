@@ -1,3 +1,323 @@
+import asyncio
+import io
+import json
+import sys
+import zipfile
+
+import pytest
+
+from tests import bridge
+from QRScanner.cache import INDEX_NAME, MemoryCache
+from QRScanner.export import MANIFEST_NAME
+from QRScanner.structured import Reassembler, plan_sequence
+from QRScanner.trace import tracer
+
+
+if bridge.real_java_available():
+    pytest.skip("these tests run the app against the fake bridge", allow_module_level=True)
+
+
 def test_first():
     """An initial test for the app."""
     assert 1 + 1 == 2
+
+
+@pytest.fixture
+def app(tmp_path):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    bridge.Toast.shown.clear()
+    app = bridge.start_app(str(tmp_path))
+    yield app
+    bridge.stop_app(app)
+    loop.close()
+    asyncio.set_event_loop(None)
+
+
+@pytest.fixture
+def traced():
+    tracer.clear()
+    tracer.enable()
+    yield tracer
+    tracer.disable()
+    tracer.clear()
+
+
+def events(name):
+    return [event["args"] for event in tracer.chrome_trace()["traceEvents"] if event["name"] == name]
+
+
+def run(app, coroutine):
+    return app.activity.loop.run_until_complete(coroutine)
+
+
+def app_module():
+    return sys.modules["QRScanner.__main__"]
+
+
+def test_scan_result_is_shown_and_recorded(app):
+    gui = app.main_window
+    app.activity.respond("ScanContract", lambda options: bridge.ScanResult("https://example.com"))
+
+    run(app, gui.handle_scan(False, False))
+
+    assert gui._result == "https://example.com"
+    assert gui.qr_box in gui.widgets_box.children
+    assert gui.qr_view.image.src[:4] == b"\x89PNG"
+    assert run(app, gui.history_call("seen", "https://example.com"))
+
+
+def test_captured_frame_is_shown_as_is(app, tmp_path):
+    gui = app.main_window
+    path = tmp_path / "barcodeimage.jpg"
+    path.write_bytes(b"\xff\xd8captured frame")
+    app.activity.respond("ScanContract", lambda options: bridge.ScanResult("framed", image_path=str(path)))
+    # What was on screen before must not be saved for the new code.
+    gui._result = "earlier"
+    gui._qr_image = run(app, gui.qr_generate())
+    assert gui._qr_key is not None
+
+    run(app, gui.handle_scan(False, False, capture_image=True))
+
+    assert gui.qr_view.image.src == b"\xff\xd8captured frame"
+    assert gui._qr_image is None and gui._qr_key is None
+    assert not path.exists()
+    assert run(app, gui.history_call("seen", "framed"))
+    # Saving renders the payload only now.
+    assert run(app, gui.qr_png())[:4] == b"\x89PNG"
+
+
+@pytest.mark.parametrize("image", ["missing", "unreadable"])
+def test_scan_falls_back_to_rendering_without_a_frame(app, tmp_path, image):
+    gui = app.main_window
+    path = tmp_path / "barcodeimage.jpg"
+    if image == "unreadable":
+        path.mkdir()
+    app.activity.respond("ScanContract", lambda options: bridge.ScanResult("no frame", image_path=str(path)))
+
+    run(app, gui.handle_scan(False, False, capture_image=True))
+
+    assert gui.qr_view.image.src[:4] == b"\x89PNG"
+    assert gui._qr_key == gui.qr_generator.key_for("no frame", size=gui.deferred.get("qr_size")[1])
+    assert gui.qr_box in gui.widgets_box.children
+
+
+def test_ui_calls_in_one_loop_turn_share_a_hop(app):
+    dispatcher = app.main_window.ui
+    hops, posts = dispatcher.hops, bridge.Handler.posts
+    seen = []
+    for i in range(20):
+        dispatcher.call_soon(seen.append, i)
+    assert seen == []
+
+    run(app, asyncio.sleep(0))
+
+    assert seen == list(range(20))
+    assert dispatcher.hops - hops == 1 and bridge.Handler.posts - posts == 1
+    assert dispatcher.largest_batch == 20
+
+
+def test_cancelled_scan(app):
+    gui = app.main_window
+    app.activity.respond("ScanContract", lambda options: bridge.ScanResult(None))
+
+    run(app, gui.handle_scan(False, False))
+
+    assert bridge.Toast.shown[-1] == "No result"
+    assert gui.qr_box not in gui.widgets_box.children
+
+
+def answer(dialog, text):
+    dialog.view.setText(text)
+    dialog.click(bridge.AlertDialog.BUTTON_POSITIVE)
+
+
+def test_continuous_scan_stats_go_to_the_tracer(app, traced, capsys):
+    gui = app.main_window
+
+    async def scan():
+        task = asyncio.ensure_future(gui.continuous_scan(None))
+        await asyncio.sleep(0)
+        listener = bridge.ContinuousCaptureActivity.listener
+        listener.onScan("one", 1000, -1, 0)
+        listener.onScan("two", 2000, -1, 0)
+        listener.onClosed("back")
+        await task
+
+    run(app, scan())
+
+    [stats] = events("continuous_scan.stats")
+    assert stats["delivered"] == 2 and stats["reason"] == "back"
+    assert bridge.Toast.shown[-1] == "Scanned 2 codes (2 new)"
+    assert "Continuous scan" not in capsys.readouterr().out
+
+
+def test_one_input_dialog_answers_every_request(app):
+    gui = app.main_window
+    input_dialog = gui.input_dialog
+    for text in ("first", "second"):
+        task = asyncio.ensure_future(gui.text_to_qr(None))
+        run(app, asyncio.sleep(0.01))
+        dialog = bridge.AlertDialog.shown[-1]
+        answer(dialog, text)
+        # Cancel fires after the button; the request already has its answer.
+        dialog.cancel()
+        run(app, task)
+        assert gui._result == text
+
+    assert gui.input_dialog is input_dialog
+    assert run(app, gui.history_call("seen", "first"))
+
+
+def test_overlapping_dialogs_answer_their_own_requests(app):
+    input_dialog = app.main_window.input_dialog
+    first = asyncio.ensure_future(input_dialog.get_input(title="first"))
+    second = asyncio.ensure_future(input_dialog.get_input(title="second"))
+    run(app, asyncio.sleep(0.01))
+    dialogs = bridge.AlertDialog.shown[-2:]
+    assert [dialog.title for dialog in dialogs] == ["first", "second"]
+
+    answer(dialogs[1], "answer-to-second")
+    dialogs[1].cancel()
+    dialogs[0].cancel()
+
+    assert run(app, asyncio.gather(first, second)) == ["", "answer-to-second"]
+    stats = app.main_window.results.stats()
+    assert stats["outstanding"] == 0 and stats["awaiting_results"] == 0
+    assert stats["completed"] == 2
+
+
+def test_save_rewrites_the_indexed_document(app, traced):
+    gui = app.main_window
+    folder = "content://documents/tree/primary"
+    app.activity.respond("OpenDocumentTree", lambda value: bridge.Uri(folder))
+    gui._result = "save me"
+
+    run(app, gui.save_qr(None))
+    run(app, gui.save_qr(None))
+
+    documents = app.activity.resolver.documents
+    assert len(documents) == 1
+    assert bytes(next(iter(documents.values()))) == gui._qr_image
+    assert bridge.Toast.shown[-1].startswith("Saved to qr_save_me_")
+    assert gui.saved_folder.uri == folder
+    copies = events("save_qr.copy")
+    assert len(copies) == 2 and copies[-1]["file"].startswith("qr_save_me_")
+
+
+def test_export_covers_the_whole_history(app, traced):
+    gui = app.main_window
+    count = MemoryCache().max_entries + 6
+    for i in range(count):
+        run(app, gui.history_call("add", f"code-{i}", "scan"))
+    run(app, gui.history_call("add", "code-0", "scan"))
+    export = "content://documents/tree/primary/document/export"
+    app.activity.respond("CreateDocument", lambda filename: bridge.Uri(export))
+
+    run(app, gui.export_all(None))
+
+    archive = zipfile.ZipFile(io.BytesIO(bytes(app.activity.resolver.documents[export])))
+    manifest = json.loads(archive.read(MANIFEST_NAME))["entries"]
+    assert len(manifest) == count
+    assert manifest[0]["payload"] == "code-0" and manifest[-1]["payload"] == "code-1"
+    assert archive.read(manifest[0]["file"])[:4] == b"\x89PNG"
+    assert bridge.Toast.shown[-1] == f"Exported {count} QR codes"
+    [stats] = events("export_all")
+    assert stats["entries"] == count
+
+
+def test_history_search_filters_the_list(app):
+    gui = app.main_window
+    for payload in ("https://example.com/a", "wifi:home", "https://example.com/b"):
+        run(app, gui.history_call("add", payload, "scan"))
+    run(app, gui.show_history(None))
+    assert len(gui.history_list.children) == 3
+
+    gui.history_search.value = "example"
+    run(app, gui.search_history(gui.history_search))
+    assert [button.text.split("\n")[1] for button in gui.history_list.children] == [
+        "https://example.com/b", "https://example.com/a",
+    ]
+
+    gui.history_search.value = "nothing like it"
+    run(app, gui.search_history(gui.history_search))
+    assert [label.text for label in gui.history_list.children] == ["No matches"]
+
+    gui.history_search.value = ""
+    run(app, gui.search_history(gui.history_search))
+    assert len(gui.history_list.children) == 3
+
+
+def test_storage_and_qr_widgets_are_built_after_the_first_frame(app, tmp_path):
+    gui = app.main_window
+    assert gui.qr_box is None
+    assert gui.deferred.pending() == [
+        "qr_store", "saved_folder", "qr_generator", "qr_size", "qr_box", "preview", "sequence",
+    ]
+    assert not (tmp_path / "cache" / "qr").exists()
+
+    run(app, app.after_first_frame())
+
+    assert gui.deferred.pending() == []
+    assert (tmp_path / "cache" / "qr" / INDEX_NAME).exists()
+    assert gui.qr_view.style.width == 411 - 150
+    assert gui.qr_box not in gui.widgets_box.children
+
+
+def test_live_preview_updates_in_place_and_keeps_the_text(app, traced):
+    gui = app.main_window
+    run(app, gui.live_preview(None))
+    preview = gui.deferred.get("preview")
+    assert gui.preview_input in gui.widgets_box.children
+
+    for text in ("h", "hi", "hi there"):
+        gui.preview_input.value = text
+    run(app, preview.flush())
+    first = gui.qr_view.image
+    gui.preview_input.value = "hi there!"
+    run(app, preview.flush())
+
+    assert gui.widgets_box.children.count(gui.qr_box) == 1
+    assert gui.qr_view.image is not first
+    assert preview.renders == 2 and preview.keystrokes == 4
+
+    run(app, gui.live_preview(None))
+    assert gui.preview_input not in gui.widgets_box.children
+    assert gui._result == "hi there!"
+    assert gui.qr_box in gui.widgets_box.children
+    assert run(app, gui.history_call("seen", "hi there!"))
+    [stats] = events("live_preview.stats")
+    assert stats["renders"] == 2 and "masks_selected" in stats
+
+
+def test_sequence_is_paged_and_reassembled(app):
+    gui = app.main_window
+    payload = "option=value;" * 150
+    parts = run(app, gui.qr_generator.generate_sequence(payload, size=200))
+    gui._result = payload
+    gui.show_sequence(parts)
+
+    assert gui.qr_view.image.src == parts[0][2]
+    assert gui.sequence_label.text == f"1 / {len(parts)}"
+    assert gui._sequence.playing
+    gui.toggle_sequence_play(gui.sequence_play)
+    gui._sequence.previous()
+    assert gui._qr_key == parts[-1][1]
+    assert gui.sequence_play.text == "Play"
+    gui.hide_qr()
+    assert gui._sequence is None and gui.qr_box not in gui.widgets_box.children
+
+    # The capture activity reports (index << 4 | total - 1) and the parity.
+    fed = []
+    session = type("Session", (), {"feed": lambda self, *args: fed.append(args)})()
+    listener = app_module().ContinuousScanListener(session)
+    headers = [header for _text, header in plan_sequence(payload)]
+    for (text, _key, _data), (index, total, check) in zip(parts, headers):
+        listener.onScan(text, 1000, index << 4 | (total - 1), check)
+    listener.onScan("plain", 2000, -1, -1)
+    assert [args[2] for args in fed] == headers + [None]
+
+    reassembler = Reassembler(ignore_completed=True)
+    texts = [gui.assemble(reassembler, contents, header) for contents, _when, header in fed]
+    assert texts == [None] * (len(parts) - 1) + [payload, "plain"]
+    assert bridge.Toast.shown[-1] == f"Part {len(parts) - 1} of {len(parts)} read"
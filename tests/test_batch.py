@@ -0,0 +1,124 @@
+import io
+import json
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from QRScanner import batch
+from QRScanner.export import MANIFEST_NAME
+from QRScanner.generator import DEFAULT_PARAMS, image_key, render_png
+
+
+def test_reads_csv_jsonl_and_text(tmp_path):
+    csv_path = tmp_path / "codes.csv"
+    csv_path.write_text("id,url\n1,https://a.example\n2,\"b, with comma\"\n", encoding="utf-8")
+    assert list(batch.read_payloads(str(csv_path), column="url")) == ["https://a.example", "b, with comma"]
+    assert list(batch.read_payloads(str(csv_path))) == ["id", "1", "2"]
+
+    jsonl_path = tmp_path / "codes.jsonl"
+    jsonl_path.write_text('"plain"\n\n{"payload": "object", "text": 5}\n', encoding="utf-8")
+    assert list(batch.read_payloads(str(jsonl_path))) == ["plain", "object"]
+    assert list(batch.read_payloads(str(jsonl_path), column="text")) == ["plain", "5"]
+
+    text_path = tmp_path / "codes.txt"
+    text_path.write_text("one\r\n\ntwo\n", encoding="utf-8")
+    assert list(batch.read_payloads(str(text_path))) == ["one", "two"]
+
+
+def test_generate_keeps_order_and_drops_duplicates():
+    payloads = [f"code-{i % 30}" for i in range(45)]
+    stats = {}
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        results = list(batch.generate(payloads, workers=3, chunk_size=4, executor=executor, stats=stats))
+
+    assert [payload for _key, payload, _data in results] == [f"code-{i}" for i in range(30)]
+    assert stats == {"read": 45, "duplicates": 15, "too_long": 0}
+    key, payload, data = results[7]
+    assert key == image_key(payload, DEFAULT_PARAMS)
+    assert data == render_png(payload, DEFAULT_PARAMS)
+
+
+def test_generate_bounds_work_in_flight():
+    submitted = []
+
+    class RecordingExecutor(ThreadPoolExecutor):
+        def submit(self, fn, *args):
+            submitted.append(len(submitted))
+            return super().submit(fn, *args)
+
+    consumed = 0
+    with RecordingExecutor(max_workers=2) as executor:
+        for _result in batch.generate((f"p{i}" for i in range(100)), workers=2, chunk_size=1, executor=executor):
+            consumed += 1
+            # Never more than two chunks per worker ahead of the consumer.
+            assert len(submitted) <= consumed + 4
+    assert consumed == 100
+
+
+def test_run_batch_to_zip_with_process_pool(tmp_path):
+    source = tmp_path / "codes.txt"
+    source.write_text("\n".join(f"label-{i}" for i in range(40)) + "\nlabel-0\n", encoding="utf-8")
+    target = tmp_path / "out.zip"
+    calls = []
+
+    stats = batch.run_batch(
+        str(source), str(target), params={"size": 200}, workers=2, chunk_size=8,
+        progress=lambda done, name: calls.append(done),
+    )
+
+    assert stats["entries"] == 40
+    assert stats["read"] == 41 and stats["duplicates"] == 1
+    assert stats["workers"] == 2
+    assert stats["codes_per_second"] > 0
+    assert calls == list(range(1, 41))
+    with zipfile.ZipFile(target) as archive:
+        manifest = json.loads(archive.read(MANIFEST_NAME))
+        assert [entry["payload"] for entry in manifest["entries"]] == [f"label-{i}" for i in range(40)]
+        first = manifest["entries"][0]
+        assert archive.read(first["file"]) == render_png("label-0", dict(DEFAULT_PARAMS, size=200))
+
+
+def test_payloads_over_capacity_are_skipped_and_counted(tmp_path):
+    source = tmp_path / "codes.txt"
+    source.write_text("first\n" + "x" * 3000 + "\nlast\n", encoding="utf-8")
+    target = tmp_path / "out.zip"
+
+    stats = batch.run_batch(str(source), str(target), workers=1, chunk_size=2)
+
+    assert stats["entries"] == 2 and stats["too_long"] == 1 and stats["read"] == 3
+    with zipfile.ZipFile(target) as archive:
+        manifest = json.loads(archive.read(MANIFEST_NAME))
+        assert [entry["payload"] for entry in manifest["entries"]] == ["first", "last"]
+
+
+def test_run_batch_to_directory(tmp_path):
+    source = tmp_path / "codes.jsonl"
+    source.write_text("\n".join(json.dumps({"sku": f"SKU-{i}"}) for i in range(5)), encoding="utf-8")
+    target = tmp_path / "out"
+
+    stats = batch.run_batch(str(source), str(target), column="sku", workers=1)
+
+    manifest = json.loads((target / MANIFEST_NAME).read_text(encoding="utf-8"))
+    assert stats["entries"] == 5
+    for entry in manifest["entries"]:
+        assert (target / entry["file"]).read_bytes()[:4] == b"\x89PNG"
+
+
+def test_main_prints_stats(tmp_path, capsys):
+    source = tmp_path / "codes.csv"
+    source.write_text("a\nb\n", encoding="utf-8")
+    assert batch.main([str(source), str(tmp_path / "out.zip"), "--workers", "1", "--error-correction", "H"]) == 0
+
+    captured = capsys.readouterr()
+    assert json.loads(captured.out)["entries"] == 2
+    assert "2 codes" in captured.err
+
+
+def test_progress_is_throttled():
+    now = [0.0]
+    stream = io.StringIO()
+    progress = batch.Progress(stream=stream, interval=1.0, clock=lambda: now[0])
+    for i in range(1, 11):
+        now[0] = i * 0.25
+        progress(i, "name")
+    assert stream.getvalue().count("\r") == 2
+    assert stream.getvalue().endswith("8 codes  4/s")
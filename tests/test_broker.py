@@ -0,0 +1,142 @@
+import asyncio
+import threading
+
+import pytest
+
+from QRScanner.broker import ResultBroker
+
+
+class FakeLauncher:
+    def __init__(self):
+        self.launched = []
+
+    def __call__(self, value):
+        self.launched.append(value)
+
+
+def test_results_go_to_requests_in_launch_order():
+    broker = ResultBroker()
+    launcher = FakeLauncher()
+    broker.register("scan", launcher)
+
+    async def scenario():
+        first = asyncio.ensure_future(broker.request("scan", "a"))
+        second = asyncio.ensure_future(broker.request("scan", "b"))
+        await asyncio.sleep(0)
+        assert broker.outstanding("scan") == 2
+        broker.deliver("scan", "result-a")
+        broker.deliver("scan", "result-b")
+        return await first, await second
+
+    assert asyncio.run(scenario()) == ("result-a", "result-b")
+    assert launcher.launched == ["a", "b"]
+    assert broker.stats()["outstanding"] == 0 and broker.completed == 2
+
+
+def test_timed_out_request_does_not_steal_the_next_result():
+    broker = ResultBroker()
+    broker.register("folder", FakeLauncher())
+
+    async def scenario():
+        with pytest.raises(asyncio.TimeoutError):
+            await broker.request("folder", timeout=0.01)
+        assert broker.outstanding() == 0
+        waiting = asyncio.ensure_future(broker.request("folder"))
+        await asyncio.sleep(0)
+        broker.deliver("folder", "late result of the first picker")
+        broker.deliver("folder", "content://tree/b")
+        return await waiting
+
+    assert asyncio.run(scenario()) == "content://tree/b"
+    assert broker.stats() == {
+        "outstanding": 0, "awaiting_results": 0, "completed": 1, "timed_out": 1, "dropped": 1,
+    }
+
+
+def test_cancelled_waiter_is_released():
+    broker = ResultBroker()
+    broker.register("input", FakeLauncher())
+
+    async def scenario():
+        task = asyncio.ensure_future(broker.request("input"))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return broker.outstanding(), broker.deliver("input", "text")
+
+    assert asyncio.run(scenario()) == (0, None)
+
+
+def test_failed_launch_expects_no_result():
+    broker = ResultBroker()
+
+    async def broken(value):
+        raise RuntimeError("no activity")
+
+    broker.register("scan", broken)
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            await broker.request("scan")
+        return broker.stats()["awaiting_results"]
+
+    assert asyncio.run(scenario()) == 0
+
+
+def test_elapsed_uses_the_given_clock():
+    now = [10.0]
+    broker = ResultBroker(clock=lambda: now[0])
+    broker.register("scan", FakeLauncher())
+
+    async def scenario():
+        task = asyncio.ensure_future(broker.request("scan"))
+        await asyncio.sleep(0)
+        now[0] = 12.5
+        broker.deliver("scan", None)
+        return await task
+
+    assert asyncio.run(scenario()) is None
+    assert broker.last_elapsed == 2.5
+
+
+def test_results_delivered_from_many_threads():
+    broker = ResultBroker()
+    broker.register("scan", FakeLauncher())
+
+    async def scenario():
+        tasks = [asyncio.ensure_future(broker.request("scan", i)) for i in range(200)]
+        await asyncio.sleep(0)
+        threads = [
+            threading.Thread(target=lambda: [broker.deliver("scan", "result") for _ in range(25)])
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return await asyncio.gather(*tasks)
+
+    assert asyncio.run(scenario()) == ["result"] * 200
+    assert broker.stats()["completed"] == 200 and broker.dropped == 0
+
+
+def test_keyed_results_go_to_their_own_request():
+    broker = ResultBroker()
+    launched = []
+    broker.register("input", lambda value, request_id: launched.append((value, request_id)), keyed=True)
+
+    async def scenario():
+        first = asyncio.ensure_future(broker.request("input", "a"))
+        second = asyncio.ensure_future(broker.request("input", "b"))
+        await asyncio.sleep(0)
+        (_a, first_id), (_b, second_id) = launched
+        assert broker.deliver_to(second_id, "to b") == second_id
+        assert broker.deliver_to(second_id, "again") is None
+        broker.deliver_to(first_id, "to a")
+        return await first, await second
+
+    assert asyncio.run(scenario()) == ("to a", "to b")
+    assert broker.stats() == {
+        "outstanding": 0, "awaiting_results": 0, "completed": 2, "timed_out": 0, "dropped": 1,
+    }
@@ -0,0 +1,199 @@
+import asyncio
+import os
+
+from QRScanner.cache import (
+    INDEX_NAME,
+    JOURNAL_NAME,
+    MAX_LABEL_BYTES,
+    MemoryCache,
+    QRCache,
+    QRStore,
+    cache_key,
+    export_filename,
+)
+
+
+def test_cache_key_depends_on_payload_and_params():
+    key = cache_key("hello", box_size=7, border=1)
+    assert key == cache_key("hello", border=1, box_size=7)
+    assert key != cache_key("hello", box_size=8, border=1)
+    assert key != cache_key("hello!", box_size=7, border=1)
+    assert len(key) == 32
+
+
+def test_export_filename_is_safe():
+    key = cache_key("a/b")
+    name = export_filename("https://example.com/a?b=c", key)
+    assert "/" not in name and name.endswith(".png")
+    assert export_filename("///", key) == f"qr_{key[:8]}.png"
+    assert len(export_filename("x" * 5000, key)) < 80
+
+
+def test_hit_miss_counters(tmp_path):
+    cache = QRCache(str(tmp_path))
+    key = cache_key("payload")
+    assert cache.get(key) is None
+    path = cache.put(key, b"png-bytes")
+    assert cache.get(key) == path
+    with open(path, "rb") as f:
+        assert f.read() == b"png-bytes"
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_lru_eviction_by_entries_and_bytes(tmp_path):
+    cache = QRCache(str(tmp_path), max_entries=3, max_bytes=100)
+    keys = [cache_key(str(i)) for i in range(4)]
+    for key in keys[:3]:
+        cache.put(key, b"x" * 10)
+    cache.get(keys[0])
+    cache.put(keys[3], b"x" * 10)
+    assert keys[1] not in cache
+    assert not os.path.exists(cache.path_for(keys[1]))
+    assert keys[0] in cache
+
+    big = cache_key("big")
+    cache.put(big, b"x" * 90)
+    assert big in cache
+    assert cache.total_bytes <= 100
+    assert cache.evictions >= 2
+
+
+def test_index_persists_lru_order(tmp_path):
+    cache = QRCache(str(tmp_path), max_entries=2)
+    first, second, third = (cache_key(str(i)) for i in range(3))
+    cache.put(first, b"1")
+    cache.put(second, b"2")
+    cache.get(first)
+    cache.save_index()
+
+    reloaded = QRCache(str(tmp_path), max_entries=2)
+    assert len(reloaded) == 2
+    reloaded.put(third, b"3")
+    assert first in reloaded and second not in reloaded
+
+
+def test_labels_survive_reload(tmp_path):
+    cache = QRCache(str(tmp_path))
+    key = cache_key("payload")
+    cache.put(key, b"data", label="https://example.com/ä")
+    cache.put(cache_key("unlabelled"), b"data")
+    cache.save_index()
+
+    reloaded = QRCache(str(tmp_path))
+    assert reloaded.label(key) == "https://example.com/ä"
+    assert reloaded.label(cache_key("unlabelled")) is None
+    assert reloaded.keys() == [key, cache_key("unlabelled")]
+
+
+def test_corrupt_index_is_rebuilt(tmp_path):
+    cache = QRCache(str(tmp_path))
+    key = cache_key("payload")
+    cache.put(key, b"data")
+    with open(os.path.join(str(tmp_path), INDEX_NAME), "wb") as f:
+        f.write(b"garbage")
+
+    reloaded = QRCache(str(tmp_path))
+    assert reloaded.get(key) == cache.path_for(key)
+    assert reloaded.total_bytes == 4
+
+
+def test_puts_append_to_the_journal_until_the_limit(tmp_path):
+    cache = QRCache(str(tmp_path), journal_limit=10)
+    index_path = os.path.join(str(tmp_path), INDEX_NAME)
+    journal_path = os.path.join(str(tmp_path), JOURNAL_NAME)
+    index = os.path.getsize(index_path)
+    keys = [cache_key(str(i)) for i in range(9)]
+    for key in keys:
+        cache.put(key, b"data", label="x" * 1000)
+    assert os.path.getsize(index_path) == index
+    assert os.path.getsize(journal_path) < 9 * (MAX_LABEL_BYTES + 100)
+
+    cache.put(cache_key("tenth"), b"data")
+    assert not os.path.exists(journal_path)
+    assert os.path.getsize(index_path) > 9 * MAX_LABEL_BYTES
+
+
+def test_long_labels_are_cut_on_a_character_boundary(tmp_path):
+    cache = QRCache(str(tmp_path))
+    key = cache_key("long")
+    cache.put(key, b"data", label="a" + "ä" * MAX_LABEL_BYTES)
+
+    label = QRCache(str(tmp_path)).label(key)
+    assert label == "a" + "ä" * ((MAX_LABEL_BYTES - 1) // 2)
+    assert len(label.encode("utf-8")) <= MAX_LABEL_BYTES
+
+
+def test_journal_is_replayed_after_a_crash(tmp_path):
+    cache = QRCache(str(tmp_path))
+    kept, dropped = cache_key("kept"), cache_key("dropped")
+    cache.put(kept, b"data", label="kept")
+    cache.put(dropped, b"more data")
+    cache.discard(dropped)
+    # A put interrupted while writing its record.
+    with open(os.path.join(str(tmp_path), JOURNAL_NAME), "ab") as f:
+        f.write(b"\x01partial")
+
+    reloaded = QRCache(str(tmp_path))
+    assert reloaded.keys() == [kept]
+    assert reloaded.label(kept) == "kept"
+    assert reloaded.total_bytes == 4
+    assert not os.path.exists(os.path.join(str(tmp_path), JOURNAL_NAME))
+
+
+def test_missing_file_counts_as_miss(tmp_path):
+    cache = QRCache(str(tmp_path))
+    key = cache_key("payload")
+    os.remove(cache.put(key, b"data"))
+    assert cache.get(key) is None
+    assert key not in cache
+
+
+def test_memory_cache_lru_budget():
+    memory = MemoryCache(max_bytes=25, max_entries=3)
+    for name in "abc":
+        memory.put(name, b"x" * 8)
+    assert memory.get("a") == b"x" * 8
+    memory.put("d", b"x" * 8)
+    assert "b" not in memory and "a" in memory
+    assert memory.total_bytes <= 25
+    assert memory.get("b") is None
+    assert memory.stats()["hits"] == 1 and memory.stats()["misses"] == 1
+
+
+def test_store_writes_files_only_on_demand(tmp_path):
+    async def scenario():
+        store = QRStore(QRCache(str(tmp_path)))
+        key = cache_key("payload")
+        store.put(key, b"png")
+        assert len(store.disk) == 0
+        assert await store.get(key) == b"png"
+
+        paths = await asyncio.gather(store.ensure_file(key), store.ensure_file(key))
+        assert paths[0] == paths[1] == store.disk.path_for(key)
+        assert len(store.disk) == 1
+        assert await store.ensure_file(cache_key("other")) is None
+
+        store.memory.discard(key)
+        assert await store.get(key) == b"png"
+        assert key in store.memory
+
+    asyncio.run(scenario())
+
+
+def test_store_lists_memory_and_disk_entries(tmp_path):
+    async def scenario():
+        store = QRStore(QRCache(str(tmp_path)))
+        on_disk, in_memory = cache_key("disk"), cache_key("memory")
+        store.put(on_disk, b"d", label="disk")
+        await store.ensure_file(on_disk)
+        store.memory.discard(on_disk)
+        store.put(in_memory, b"m", label="memory")
+        return list(store.entries())
+
+    entries = asyncio.run(scenario())
+    assert [(key, label) for key, label, _source in entries] == [
+        (cache_key("memory"), "memory"),
+        (cache_key("disk"), "disk"),
+    ]
+    assert entries[0][2] == b"m" and os.path.exists(entries[1][2])
@@ -0,0 +1,235 @@
+import io
+
+import pytest
+
+from QRScanner import decoder, encoder, png
+from QRScanner.generator import DEFAULT_PARAMS, render_png
+
+
+def render(payload, **params):
+    return render_png(payload, dict(DEFAULT_PARAMS, **params))
+
+
+def grey_rows(data):
+    width, height, rows = png.read_png(data)
+    return [list(row) for row in rows]
+
+
+@pytest.mark.parametrize("payload", [
+    "hello",
+    "0123456789" * 7,
+    "HELLO WORLD $%*+-./:",
+    "https://example.com/path?query=1&other=two",
+    "ünïcödé ✓",
+    "x" * 400,
+])
+@pytest.mark.parametrize("level", encoder.ERROR_CORRECTION_LEVELS)
+def test_round_trips_rendered_codes(payload, level):
+    symbols = decoder.decode(render(payload, error_correction=level, boost_error_correction=False, box_size=4))
+    assert [symbol.text for symbol in symbols] == [payload]
+    assert symbols[0].error_correction == level
+    assert symbols[0].errors_corrected == 0
+
+
+def test_large_version():
+    payload = "y" * 1500
+    symbols = decoder.decode(render(payload, box_size=2))
+    assert symbols[0].version >= 25
+    assert symbols[0].text == payload
+
+
+def test_exact_size_render():
+    symbols = decoder.decode(render("sized", size=333))
+    assert [symbol.text for symbol in symbols] == ["sized"]
+
+
+def test_custom_colors():
+    data = render("colors", fill_color="#123456", back_color="#f0e0d0", box_size=5)
+    assert [symbol.text for symbol in decoder.decode(data)] == ["colors"]
+
+
+@pytest.mark.parametrize("turns", [1, 2, 3])
+def test_rotated_images(turns):
+    rows = grey_rows(render("rotate me", box_size=5))
+    for _ in range(turns):
+        rows = [list(row) for row in zip(*rows[::-1])]
+    assert [symbol.text for symbol in decoder.decode(rows)] == ["rotate me"]
+
+
+def test_mirrored_image():
+    rows = [row[::-1] for row in grey_rows(render("mirror", box_size=5))]
+    assert [symbol.text for symbol in decoder.decode(rows)] == ["mirror"]
+
+
+def test_finds_every_symbol():
+    first = grey_rows(render("first", box_size=4))
+    second = grey_rows(render("second", error_correction="H", box_size=5))
+    height = max(len(first), len(second))
+    blank = [255] * 30
+    rows = []
+    for y in range(height):
+        left = first[y] if y < len(first) else [255] * len(first[0])
+        right = second[y] if y < len(second) else [255] * len(second[0])
+        rows.append(left + blank + right)
+    assert sorted(symbol.text for symbol in decoder.decode(rows)) == ["first", "second"]
+
+
+def test_blank_image_has_no_symbols():
+    assert decoder.decode([[255] * 100 for _ in range(100)]) == []
+
+
+def test_reed_solomon_corrects_damage():
+    matrix = encoder.encode("damaged but readable", "H")
+    rows = list(matrix.rows)
+    size = matrix.size
+    for r, c in [(10, 12), (12, 10), (14, 14), (15, 11), (18, 20), (20, 9)]:
+        rows[r] ^= 1 << (size - 1 - c)
+    symbol = decoder.decode_grid(rows, size)
+    assert symbol.text == "damaged but readable"
+    assert symbol.errors_corrected > 0
+
+
+def test_too_much_damage_raises():
+    matrix = encoder.encode("fragile", "L")
+    size = matrix.size
+    rows = [row ^ ((1 << (size - 1 - 9)) - 1) if 9 <= i < size - 9 else row for i, row in enumerate(matrix.rows)]
+    with pytest.raises(decoder.DecodeError):
+        decoder.decode_grid(rows, size)
+
+
+def test_decode_grid_accepts_module_lists():
+    matrix = encoder.encode("modules", "Q")
+    symbol = decoder.decode_grid(matrix.modules)
+    assert (symbol.text, symbol.version, symbol.mask) == ("modules", matrix.version, matrix.mask)
+
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+def test_load_image_accepts_byte_rows(monkeypatch, use_numpy):
+    if not use_numpy:
+        monkeypatch.setattr(decoder, "numpy", None)
+    elif decoder.numpy is None:
+        pytest.skip("NumPy is not installed")
+    width, height, grey = decoder.load_image([b"\x00\xff\x10", bytearray(b"\xff\x00\x20")])
+    assert (width, height) == (3, 2)
+    assert [list(row) for row in grey] == [[0, 255, 16], [255, 0, 32]]
+
+    data = render("rows", box_size=3)
+    rows = [bytes(row) for row in grey_rows(data)]
+    assert [symbol.text for symbol in decoder.decode(rows)] == ["rows"]
+
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+def test_load_rgba(monkeypatch, use_numpy):
+    if not use_numpy:
+        monkeypatch.setattr(decoder, "numpy", None)
+    elif decoder.numpy is None:
+        pytest.skip("NumPy is not installed")
+    width, height, grey = decoder.load_rgba(2, 1, bytes([255, 0, 0, 255, 10, 20, 30, 0]))
+    assert (width, height) == (2, 1)
+    assert [list(row) for row in grey] == [[76, 18]]
+
+    rows = grey_rows(render("bitmap", box_size=3))
+    rgba = bytes(value for row in rows for v in row for value in (v, v, v, 255))
+    width, height, grey = decoder.load_rgba(len(rows[0]), len(rows), rgba)
+    assert [symbol.text for symbol in decoder.decode(grey)] == ["bitmap"]
+
+
+def test_rs_correct_fixes_up_to_half_the_ecc_bytes():
+    data = list(range(20))
+    block = data + encoder.rs_remainder(data, 10)
+    damaged = list(block)
+    for i in (0, 3, 7, 19, 25):
+        damaged[i] ^= 0x5A
+    assert decoder.rs_correct(damaged, 10) == 5
+    assert damaged == block
+
+
+def test_parse_segments_reads_structured_append_and_eci():
+    buffer = encoder.BitBuffer()
+    buffer.put(decoder.MODE_STRUCTURED_APPEND, 4)
+    buffer.put(1, 4)
+    buffer.put(2, 4)
+    buffer.put(0x5C, 8)
+    buffer.put(decoder.MODE_ECI, 4)
+    buffer.put(26, 8)
+    encoder.Segment(encoder.MODE_BYTE, "é".encode()).write(buffer, 1)
+    text, data, structured = decoder.parse_segments(buffer.to_bytes(), 1)
+    assert text == "é"
+    assert data == "é".encode()
+    assert structured == (1, 3, 0x5C)
+
+
+def test_latin1_fallback():
+    symbol = decoder.decode_grid(encoder.encode(b"caf\xe9").rows)
+    assert symbol.text == "café"
+    assert symbol.data == b"caf\xe9"
+
+
+def test_pure_python_path(monkeypatch):
+    monkeypatch.setattr(decoder, "numpy", None)
+    data = render("no numpy", box_size=3)
+    assert [symbol.text for symbol in decoder.decode(data)] == ["no numpy"]
+
+
+def test_uneven_lighting(monkeypatch):
+    rows = grey_rows(render("shadow", box_size=5))
+    width = len(rows[0])
+    shaded = [
+        [int(value * (0.4 + 0.6 * x / width) + 70 * (1 - x / width)) for x, value in enumerate(row)]
+        for row in rows
+    ]
+    assert [symbol.text for symbol in decoder.decode(shaded)] == ["shadow"]
+    monkeypatch.setattr(decoder, "numpy", None)
+    assert [symbol.text for symbol in decoder.decode(shaded)] == ["shadow"]
+
+
+def test_photo_like_distortion():
+    pytest.importorskip("PIL")
+    from PIL import Image, ImageFilter
+
+    image = Image.open(io.BytesIO(render("https://example.org/photo", box_size=6))).convert("L")
+    image = image.rotate(17, expand=True, fillcolor=255, resample=Image.BILINEAR)
+    image = image.transform(
+        image.size, Image.PERSPECTIVE, (1.0, 0.08, 0, 0.04, 1.0, 0, 0.0003, 0.0002),
+        resample=Image.BILINEAR, fillcolor=255,
+    )
+    image = image.resize((image.width * 3 // 2, image.height * 3 // 2), Image.BILINEAR)
+    image = image.filter(ImageFilter.GaussianBlur(1.2))
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=70)
+    assert [symbol.text for symbol in decoder.decode(buffer.getvalue())] == ["https://example.org/photo"]
+
+
+def tilted(data, offsets, size=600):
+    # Pastes the code on a white canvas and moves its corners by offsets,
+    # as a camera held at an angle does.
+    from PIL import Image
+
+    code = Image.open(io.BytesIO(data)).convert("L")
+    canvas = Image.new("L", (size, size), 255)
+    left = (size - code.width) // 2
+    canvas.paste(code, (left, left))
+    right, bottom = left + code.width, left + code.height
+    square = [(left, left), (right, left), (right, bottom), (left, bottom)]
+    moved = [(x + dx, y + dy) for (x, y), (dx, dy) in zip(square, offsets)]
+    # PIL maps output pixels back to input ones.
+    (a, d, g), (b, e, h), (c, f, k) = decoder.perspective(moved, square)
+    coefficients = [value / k for value in (a, b, c, d, e, f, g, h)]
+    return canvas.transform(canvas.size, Image.PERSPECTIVE, coefficients, Image.BILINEAR, fillcolor=255)
+
+
+@pytest.mark.parametrize("payload, offsets", [
+    # Version 1: no alignment pattern, the corner estimate is nudged.
+    ("hello", [(4, 9), (11, 16), (9, 15), (-17, -1)]),
+    # Version 3: the alignment pattern found anchors the corner.
+    ("https://example.com/x" * 2, [(20, 21), (-7, -7), (1, 13), (-19, 12)]),
+])
+def test_perspective(payload, offsets):
+    pytest.importorskip("PIL")
+    image = tilted(render(payload, box_size=6, border=2), offsets)
+    assert [symbol.text for symbol in decoder.decode(image)] == [payload]
+
+
+def test_inverted_image():
+    rows = [[255 - value for value in row] for row in grey_rows(render("light on dark", box_size=4))]
+    assert [symbol.text for symbol in decoder.decode(rows)] == ["light on dark"]
@@ -0,0 +1,75 @@
+import asyncio
+import threading
+
+import pytest
+
+from QRScanner.dispatch import UIDispatcher
+
+
+class ManualDispatcher(UIDispatcher):
+    # post() only counts; the test decides when the "UI thread" drains.
+    def __init__(self):
+        super().__init__()
+        self.posts = 0
+
+    def post(self):
+        self.posts += 1
+
+
+class ThreadDispatcher(UIDispatcher):
+    def __init__(self):
+        super().__init__()
+        self.ui_threads = set()
+
+    def post(self):
+        threading.Thread(target=self._run).start()
+
+    def _run(self):
+        self.ui_threads.add(threading.get_ident())
+        self.drain()
+
+
+def test_burst_is_one_hop():
+    dispatcher = ManualDispatcher()
+    seen = []
+    for i in range(50):
+        dispatcher.call_soon(seen.append, i)
+    assert dispatcher.posts == 1
+
+    dispatcher.drain()
+    assert seen == list(range(50))
+    assert dispatcher.stats() == {"hops": 1, "calls": 50, "largest_batch": 50, "queued": 0}
+
+    dispatcher.call_soon(seen.append, 50)
+    assert dispatcher.posts == 2
+
+
+def test_call_on_ui_returns_results_and_errors():
+    dispatcher = ThreadDispatcher()
+
+    def fail():
+        raise ValueError("bad view")
+
+    async def scenario():
+        value = await dispatcher.call_on_ui(lambda a, b: (threading.get_ident(), a + b), 2, 3)
+        with pytest.raises(ValueError):
+            await dispatcher.call_on_ui(fail)
+        return value
+
+    ui_thread, total = asyncio.run(scenario())
+    assert total == 5
+    assert ui_thread in dispatcher.ui_threads and ui_thread != threading.get_ident()
+
+
+def test_failed_post_does_not_wedge_the_queue():
+    class Flaky(ManualDispatcher):
+        def post(self):
+            super().post()
+            if self.posts == 1:
+                raise RuntimeError("activity gone")
+
+    dispatcher = Flaky()
+    with pytest.raises(RuntimeError):
+        dispatcher.call_soon(print)
+    dispatcher.call_soon(print)
+    assert dispatcher.posts == 2
@@ -0,0 +1,144 @@
+import random
+
+import pytest
+
+from QRScanner import encoder
+
+
+qrcode = pytest.importorskip("qrcode")
+
+LEVELS = {
+    "L": qrcode.constants.ERROR_CORRECT_L,
+    "M": qrcode.constants.ERROR_CORRECT_M,
+    "Q": qrcode.constants.ERROR_CORRECT_Q,
+    "H": qrcode.constants.ERROR_CORRECT_H,
+}
+
+
+def reference(payload, level, version=1, mask=None):
+    qr = qrcode.QRCode(version=version, error_correction=LEVELS[level], mask_pattern=mask)
+    qr.add_data(payload, optimize=0)
+    qr.make(fit=True)
+    return qr
+
+
+def as_bools(modules):
+    return [[bool(cell) for cell in row] for row in modules]
+
+
+def random_payloads(count, seed=7):
+    rng = random.Random(seed)
+    alphabets = {
+        "numeric": "0123456789",
+        "alnum": encoder.ALPHA_NUM.decode(),
+        "text": "".join(chr(c) for c in range(32, 127)) + "äöü€",
+    }
+    for _ in range(count):
+        alphabet = rng.choice(list(alphabets.values()))
+        length = rng.choice([1, 7, 30, 120, 400, 900])
+        yield "".join(rng.choice(alphabet) for _ in range(length)), rng.choice("LMQH")
+
+
+def test_tables_match_reference():
+    for version in range(1, 41):
+        assert encoder.alignment_positions(version) == qrcode.util.pattern_position(version)
+        for level, value in LEVELS.items():
+            assert encoder.data_capacity_bits(version, level) == qrcode.util.BIT_LIMIT_TABLE[value][version]
+
+
+@pytest.mark.parametrize("payload,level", list(random_payloads(60)))
+def test_matrix_identical_to_reference(payload, level):
+    try:
+        expected = reference(payload, level)
+    except qrcode.exceptions.DataOverflowError:
+        pytest.skip("payload too large for this level")
+
+    matrix = encoder.encode(payload, level)
+    assert matrix.version == expected.version
+    assert matrix.modules == as_bools(expected.modules)
+
+
+def test_high_version_with_version_information():
+    payload = "https://example.com/" + "a" * 1200
+    matrix = encoder.encode(payload, "M")
+    assert matrix.version >= 7
+    assert matrix.modules == as_bools(reference(payload, "M").modules)
+
+
+@pytest.mark.parametrize("mask", range(8))
+def test_penalty_matches_reference_for_every_mask(mask):
+    qr = reference("penalty check 0123456789", "Q", version=5, mask=mask)
+    rows = [int("".join("1" if cell else "0" for cell in row), 2) for row in qr.modules]
+    assert encoder.penalty(rows, len(rows)) == qrcode.util.lost_point(qr.modules)
+
+
+def test_fixed_version_and_mask():
+    matrix = encoder.encode("HELLO WORLD", "Q", version=3, mask=5)
+    assert (matrix.version, matrix.mask) == (3, 5)
+    assert matrix.modules == as_bools(reference("HELLO WORLD", "Q", version=3, mask=5).modules)
+
+
+def test_minimum_version_is_respected():
+    assert encoder.encode("a", min_version=2).version == 2
+
+
+def test_overflow():
+    with pytest.raises(encoder.DataOverflowError):
+        encoder.encode("x" * 3000, "H")
+
+
+def brute_force_bits(data, version):
+    import itertools
+
+    best = None
+    for modes in itertools.product(encoder._SEGMENT_MODES, repeat=len(data)):
+        if any(
+            (mode == encoder.MODE_ALPHA_NUM and byte not in encoder.ALPHA_NUM)
+            or (mode == encoder.MODE_NUMBER and byte not in b"0123456789")
+            for mode, byte in zip(modes, data)
+        ):
+            continue
+        segments = [encoder.Segment(mode, bytes(group)) for mode, group in _runs(modes, data)]
+        bits = encoder.segments_bit_length(segments, version)
+        best = bits if best is None else min(best, bits)
+    return best
+
+
+def _runs(modes, data):
+    start = 0
+    for i in range(1, len(data) + 1):
+        if i == len(data) or modes[i] != modes[start]:
+            yield modes[start], data[start:i]
+            start = i
+
+
+def test_segmentation_is_optimal():
+    rng = random.Random(3)
+    for _ in range(150):
+        data = bytes(rng.choice(b"0129ABZ:a/") for _ in range(rng.randint(1, 7)))
+        for version in (1, 10, 27):
+            segments = encoder.optimal_segments(data, version)
+            assert b"".join(segment.data for segment in segments) == data
+            assert encoder.segments_bit_length(segments, version) == brute_force_bits(data, version)
+
+
+def test_mixed_segments_match_reference():
+    payload = "item/" + "0123456789" * 5
+    segments, version, level = encoder.plan_encoding(payload)
+    assert [segment.mode for segment in segments] == [encoder.MODE_BYTE, encoder.MODE_NUMBER]
+    assert version < encoder.plan_encoding(payload, optimize=False)[1]
+
+    qr = qrcode.QRCode(version=version, error_correction=LEVELS[level])
+    for segment in segments:
+        qr.add_data(qrcode.util.QRData(segment.data, mode=segment.mode))
+    qr.make(fit=False)
+    assert encoder.encode(payload, optimize=True).modules == as_bools(qr.modules)
+
+
+def test_error_correction_boost_keeps_version():
+    payload = "HELLO WORLD"
+    plain = encoder.plan_encoding(payload, "L")
+    boosted = encoder.plan_encoding(payload, "L", boost_error_correction=True)
+    assert boosted[1] == plain[1]
+    assert boosted[2] == "Q"
+    assert encoder.plan_encoding("x" * 2900, "L", boost_error_correction=True)[2] == "L"
@@ -0,0 +1,95 @@
+import io
+import json
+import zipfile
+
+from QRScanner.cache import cache_key
+from QRScanner.export import MANIFEST_NAME, export_zip, history_entries
+from QRScanner.generator import DEFAULT_PARAMS, image_key, render_png
+from QRScanner.history import HistoryEntry
+
+
+class JavaOutputStream:
+    # No tell/seek and write() returns nothing, like a SAF stream.
+    def __init__(self):
+        self.data = bytearray()
+        self.writes = 0
+
+    def write(self, data):
+        self.writes += 1
+        self.data += data
+
+    def flush(self):
+        pass
+
+
+def make_entries(tmp_path, count):
+    entries = []
+    for i in range(count):
+        key = cache_key(f"item-{i}")
+        if i % 2:
+            path = tmp_path / f"{key}.png"
+            path.write_bytes(b"file-%d" % i)
+            entries.append((key, f"item-{i}", str(path)))
+        else:
+            entries.append((key, f"item-{i}", b"mem-%d" % i))
+    return entries
+
+
+def test_streams_to_non_seekable_output(tmp_path):
+    sink = JavaOutputStream()
+    stats = export_zip(make_entries(tmp_path, 200), sink)
+
+    archive = zipfile.ZipFile(io.BytesIO(bytes(sink.data)))
+    assert archive.testzip() is None
+    manifest = json.loads(archive.read(MANIFEST_NAME))["entries"]
+    assert stats["entries"] == len(manifest) == 200
+    assert archive.read(manifest[1]["file"]) == b"file-1"
+    assert archive.read(manifest[2]["file"]) == b"mem-2"
+    assert manifest[3]["payload"] == "item-3"
+    assert sink.writes < 10
+
+
+def test_export_to_path_skips_vanished_files(tmp_path):
+    entries = make_entries(tmp_path, 4)
+    entries.append((cache_key("gone"), "gone", str(tmp_path / "missing.png")))
+    target = str(tmp_path / "export.zip")
+    progress = []
+    stats = export_zip(entries, target, progress=lambda done, name: progress.append(done))
+
+    with zipfile.ZipFile(target) as archive:
+        assert len(archive.namelist()) == 5
+    assert stats["entries"] == 4 and progress == [1, 2, 3, 4]
+
+
+def test_duplicate_names_get_full_keys(tmp_path):
+    key = cache_key("x")
+    sink = io.BytesIO()
+    export_zip([(key, "same", b"a"), (key, "same", b"b")], sink)
+    names = zipfile.ZipFile(sink).namelist()
+    assert names[1] == f"qr_{key}.png"
+
+
+def test_history_entries_render_what_is_not_cached():
+    cached_key = cache_key("on screen")
+    history = [
+        HistoryEntry(4, 4.0, "scan", "y" * 5000, None),
+        HistoryEntry(3, 3.0, "scan", "again", None),
+        HistoryEntry(2, 2.0, "generated", "on screen", cached_key),
+        HistoryEntry(1, 1.0, "scan", "again", None),
+    ]
+    rendered = []
+
+    def render(payload):
+        rendered.append(payload)
+        return render_png(payload, DEFAULT_PARAMS)
+
+    entries = list(history_entries(
+        history, lambda payload: image_key(payload, DEFAULT_PARAMS), render,
+        {cached_key: b"cached png"}.get,
+    ))
+    assert [(key, label) for key, label, _source in entries] == [
+        (image_key("again", DEFAULT_PARAMS), "again"),
+        (cached_key, "on screen"),
+    ]
+    assert entries[0][2][:4] == b"\x89PNG" and entries[1][2] == b"cached png"
+    assert rendered == ["y" * 5000, "again"]
@@ -0,0 +1,37 @@
+from QRScanner.folders import FolderIndex, SavedFolder
+
+
+def test_saved_folder_persists_across_instances(tmp_path):
+    path = str(tmp_path / "data" / "save_folder.json")
+    assert SavedFolder(path).uri is None
+
+    SavedFolder(path).uri = "content://tree/primary%3AQR"
+    assert SavedFolder(path).uri == "content://tree/primary%3AQR"
+
+    SavedFolder(path).uri = None
+    assert SavedFolder(path).uri is None
+
+
+def test_saved_folder_ignores_corrupt_file(tmp_path):
+    path = tmp_path / "save_folder.json"
+    path.write_text("{not json")
+    assert SavedFolder(str(path)).uri is None
+
+
+def test_index_is_updated_without_relisting():
+    index = FolderIndex("content://tree/a")
+    index.load({f"qr_{i}.png": f"doc{i}" for i in range(5000)})
+
+    index.add("qr_new.png", "doc-new")
+    assert index.get("qr_new.png") == "doc-new"
+    assert index.remove("qr_3.png") == "doc3"
+    assert "qr_3.png" not in index
+    assert len(index) == 5000
+    assert index.listings == 1
+
+
+def test_reset_switches_folder():
+    index = FolderIndex("content://tree/a")
+    index.load({"qr.png": "doc"})
+    index.reset("content://tree/b")
+    assert (index.folder_uri, index.loaded, len(index)) == ("content://tree/b", False, 0)
@@ -0,0 +1,154 @@
+import asyncio
+import threading
+import time
+
+from QRScanner import encoder
+from QRScanner.cache import QRCache, QRStore
+from QRScanner.generator import DEFAULT_PARAMS, QRGenerator, matrix_key, render_png, target_pixels
+
+
+class SlowEncode:
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, payload, params):
+        with self.lock:
+            self.calls.append(payload)
+        time.sleep(self.delay)
+        return encoder.encode(payload)
+
+
+def fake_rasterize(matrix, params):
+    return f"png:{matrix.rows[0]}:{params['box_size']}".encode()
+
+
+def make_generator(tmp_path, encode):
+    return QRGenerator(QRStore(QRCache(str(tmp_path))), encode=encode, rasterize=fake_rasterize)
+
+
+def test_identical_requests_are_coalesced(tmp_path):
+    encode = SlowEncode()
+    generator = make_generator(tmp_path, encode)
+
+    async def scenario():
+        return await asyncio.gather(
+            generator.generate("same", channel="a"),
+            generator.generate("same", channel="b"),
+        )
+
+    first, second = asyncio.run(scenario())
+    assert first == second
+    assert first[1].startswith(b"png:")
+    assert encode.calls == ["same"]
+    assert generator.coalesced == 1
+
+
+def test_new_request_supersedes_stale_one(tmp_path):
+    encode = SlowEncode()
+    generator = make_generator(tmp_path, encode)
+
+    async def scenario():
+        stale = asyncio.ensure_future(generator.generate("old"))
+        await asyncio.sleep(0.01)
+        fresh = await generator.generate("new")
+        return await stale, fresh
+
+    stale, fresh = asyncio.run(scenario())
+    assert stale is None
+    assert fresh[0] == generator.key_for("new")
+    assert generator.superseded == 1
+
+
+def test_cached_results_skip_the_pool(tmp_path):
+    encode = SlowEncode(delay=0)
+    generator = make_generator(tmp_path, encode)
+
+    async def scenario():
+        first = await generator.generate("payload")
+        return first, await generator.generate("payload")
+
+    first, second = asyncio.run(scenario())
+    assert first == second
+    assert second[0] == generator.key_for("payload")
+    assert encode.calls == ["payload"]
+    assert generator.renders == 1
+
+
+def test_new_render_parameters_reuse_the_matrix(tmp_path):
+    encode = SlowEncode(delay=0)
+    generator = make_generator(tmp_path, encode)
+
+    async def scenario():
+        small = await generator.generate("payload", box_size=3)
+        large = await generator.generate("payload", box_size=20, channel="export")
+        return small, large
+
+    small, large = asyncio.run(scenario())
+    assert small[0] != large[0]
+    assert small[1].endswith(b":3") and large[1].endswith(b":20")
+    assert encode.calls == ["payload"]
+    assert generator.stats()["encodes"] == 1
+    assert generator.stats()["renders"] == 2
+
+
+def test_size_variants_are_cached_per_target(tmp_path):
+    encode = SlowEncode(delay=0)
+    generator = make_generator(tmp_path, encode)
+
+    assert generator.key_for("payload", size=490) == generator.key_for("payload", size=490, box_size=3)
+    assert generator.key_for("payload", size=490) != generator.key_for("payload", size=735)
+    assert target_pixels(350, 420) == 918
+
+
+def test_packed_matrix_round_trip():
+    matrix = encoder.encode("https://example.com/" + "z" * 300, "Q")
+    packed = matrix.pack()
+    assert len(packed) == 3 + matrix.size * ((matrix.size + 7) // 8)
+    assert encoder.QRMatrix.unpack(packed) == matrix
+
+
+def test_render_png_produces_png():
+    assert render_png("payload", DEFAULT_PARAMS).startswith(b"\x89PNG")
+
+
+def test_render_errors_propagate(tmp_path):
+    def broken(payload, params):
+        raise ValueError("too long")
+
+    generator = make_generator(tmp_path, broken)
+
+    async def scenario():
+        try:
+            await generator.generate("payload")
+        except ValueError as e:
+            return str(e)
+
+    assert asyncio.run(scenario()) == "too long"
+    assert generator.stats()["in_flight"] == 0
+
+
+def test_sequence_parts_render_in_parallel(tmp_path):
+    encode = SlowEncode(delay=0.1)
+    generator = QRGenerator(QRStore(QRCache(str(tmp_path))), encode=encode, rasterize=fake_rasterize)
+
+    async def scenario():
+        start = time.perf_counter()
+        parts = await generator.generate_sequence("0123456789" * 4, chunk_size=10)
+        return parts, time.perf_counter() - start
+
+    parts, elapsed = asyncio.run(scenario())
+    assert [text for text, _key, _data in parts] == ["0123456789"] * 4
+    # Same text, different headers: four distinct keys and encodes.
+    assert len({key for _text, key, _data in parts}) == 4
+    assert len(encode.calls) == 4
+    assert elapsed < 0.35
+
+
+def test_sequence_keys_leave_plain_keys_unchanged():
+    plain = dict(DEFAULT_PARAMS)
+    part = dict(DEFAULT_PARAMS, structured_append=(0, 2, 7))
+    assert matrix_key("a", plain) == matrix_key("a", dict(plain, structured_append=None))
+    assert matrix_key("a", plain) != matrix_key("a", part)
+    assert render_png("a", part) != render_png("a", plain)
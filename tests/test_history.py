@@ -0,0 +1,79 @@
+import sqlite3
+
+import pytest
+
+from QRScanner.history import History
+
+
+@pytest.fixture
+def history(tmp_path):
+    history = History(str(tmp_path / "history.db"), batch_size=10, clock=iter(range(10 ** 6)).__next__)
+    yield history
+    history.close()
+
+
+def test_entries_are_batched(history, tmp_path):
+    for i in range(15):
+        history.add(f"item-{i}", cache_key=f"key{i}")
+
+    other = sqlite3.connect(str(tmp_path / "history.db"))
+    assert other.execute("SELECT COUNT(*) FROM history").fetchone() == (10,)
+    assert len(history) == 15
+    history.flush()
+    assert other.execute("SELECT COUNT(*) FROM history").fetchone() == (15,)
+    assert other.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+
+
+def test_pages_are_newest_first(history):
+    for i in range(25):
+        history.add(f"item-{i}", source="scan" if i % 2 else "generated")
+
+    first = history.page(limit=10)
+    assert [entry.payload for entry in first] == [f"item-{i}" for i in range(24, 14, -1)]
+    second = history.page(before=first[-1].id, limit=10)
+    assert second[0].payload == "item-14"
+    assert len(history.page(before=second[-1].id, limit=10)) == 5
+    assert first[0].source == "generated" and first[0].timestamp == 24
+    assert [entry.payload for entry in history.entries(page_size=7)] == [
+        f"item-{i}" for i in range(24, -1, -1)
+    ]
+
+
+def test_seen_before_covers_pending_and_stored(history):
+    history.add("ABC-1")
+    assert history.seen("ABC-1")
+    history.flush()
+    assert history.seen("ABC-1")
+    assert not history.seen("ABC-2")
+
+
+@pytest.mark.parametrize("full_text", [True, False])
+def test_search(history, full_text):
+    history.full_text = history.full_text and full_text
+    for payload in ["https://example.com/a", "SKU 100_% off", "https://other.org", "tel:123"]:
+        history.add(payload)
+
+    assert [e.payload for e in history.search("example")] == ["https://example.com/a"]
+    assert [e.payload for e in history.search("https")] == ["https://other.org", "https://example.com/a"]
+    assert [e.payload for e in history.search("0_%")] == ["SKU 100_% off"]
+    assert [e.payload for e in history.search("12")] == ["tel:123"]
+    assert history.search("https", limit=1)[0].payload == "https://other.org"
+
+
+def test_delete_keeps_search_index_in_step(history):
+    history.add("delete me")
+    entry, = history.page()
+    history.delete(entry.id)
+    assert history.search("delete") == []
+    assert not history.seen("delete me")
+
+
+def test_reopen(tmp_path):
+    path = str(tmp_path / "history.db")
+    history = History(path)
+    history.add("persisted")
+    history.close()
+
+    reopened = History(path)
+    assert [e.payload for e in reopened.page()] == ["persisted"]
+    reopened.close()
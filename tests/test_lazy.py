@@ -0,0 +1,82 @@
+import threading
+import time
+
+import pytest
+
+from QRScanner.lazy import Deferred, LazyClass, lazy_classes, resolve
+
+
+def test_lazy_class_resolves_on_first_use():
+    counter = LazyClass("collections", "Counter")
+    assert not counter.resolved
+
+    assert counter("aab")["a"] == 2
+    assert counter.resolved
+    assert resolve(counter) is __import__("collections").Counter
+    assert counter.fromkeys is not None
+
+
+def test_attribute_access_resolves_and_missing_names_fail_late():
+    ordered, missing = lazy_classes("collections", "OrderedDict", "NoSuchClass")
+    assert ordered.__name__ == "OrderedDict"
+    assert "unresolved" in repr(missing)
+    with pytest.raises(AttributeError):
+        missing()
+
+
+def test_resolve_passes_other_values_through():
+    assert resolve(int) is int
+    assert resolve(None) is None
+
+
+def test_deferred_builds_once_on_get_or_when_idle():
+    calls = []
+    deferred = Deferred()
+    deferred.add("a", lambda: calls.append("a") or "A")
+    deferred.add("b", lambda: calls.append("b") or "B")
+    with pytest.raises(ValueError):
+        deferred.add("a", lambda: None)
+
+    assert deferred.get("b") == "B"
+    assert deferred.get("b") == "B"
+    assert deferred.pending() == ["a"]
+
+    assert deferred.build_next()
+    assert not deferred.build_next()
+    assert calls == ["b", "a"]
+    assert deferred.built("a") and deferred.get("a") == "A"
+
+
+def test_failed_build_stays_pending():
+    attempts = []
+
+    def build():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("not yet")
+        return "ok"
+
+    deferred = Deferred()
+    deferred.add("flaky", build)
+    with pytest.raises(RuntimeError):
+        deferred.get("flaky")
+    assert deferred.pending() == ["flaky"]
+    assert deferred.get("flaky") == "ok"
+
+
+def test_worker_and_ui_thread_share_one_build():
+    calls = []
+
+    def build():
+        calls.append(threading.get_ident())
+        time.sleep(0.05)
+        return "store"
+
+    deferred = Deferred()
+    deferred.add("store", build)
+    worker = threading.Thread(target=deferred.get, args=("store",))
+    worker.start()
+    time.sleep(0.01)
+    assert deferred.get("store") == "store"
+    worker.join()
+    assert len(calls) == 1 and calls[0] == worker.ident
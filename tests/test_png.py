@@ -0,0 +1,142 @@
+import struct
+import zlib
+
+import pytest
+
+from QRScanner import png
+
+
+MODULES = [
+    [True, False, True],
+    [False, True, False],
+    [True, True, False],
+]
+
+
+def decode_png(data):
+    assert data[:8] == png.PNG_SIGNATURE
+    offset = 8
+    chunks = {}
+    while offset < len(data):
+        length, tag = struct.unpack(">I4s", data[offset:offset + 8])
+        body = data[offset + 8:offset + 8 + length]
+        crc, = struct.unpack(">I", data[offset + 8 + length:offset + 12 + length])
+        assert crc == zlib.crc32(tag + body) & 0xFFFFFFFF
+        chunks[tag] = chunks.get(tag, b"") + body
+        offset += 12 + length
+
+    width, height, depth, color_type = struct.unpack(">IIBB", chunks[b"IHDR"][:10])
+    assert (depth, color_type) == (1, 3)
+    palette = [tuple(chunks[b"PLTE"][i:i + 3]) for i in range(0, len(chunks[b"PLTE"]), 3)]
+    raw = zlib.decompress(chunks[b"IDAT"])
+    stride = (width + 7) // 8 + 1
+    pixels = []
+    for y in range(height):
+        line = raw[y * stride:(y + 1) * stride]
+        assert line[0] == 0
+        bits = "".join(f"{b:08b}" for b in line[1:])[:width]
+        pixels.append([palette[int(bit)] for bit in bits])
+    return pixels
+
+
+def expected_pixels(modules, box_size, border, dark=(0, 0, 0), light=(255, 255, 255)):
+    size = png.image_size(len(modules), box_size, border)
+    pixels = []
+    for y in range(size):
+        row = []
+        for x in range(size):
+            r, c = y // box_size - border, x // box_size - border
+            inside = 0 <= r < len(modules) and 0 <= c < len(modules)
+            row.append(dark if inside and modules[r][c] else light)
+        pixels.append(row)
+    return pixels
+
+
+@pytest.mark.parametrize("box_size,border", [(1, 0), (3, 1), (7, 2)])
+def test_pixels_match_module_matrix(box_size, border):
+    data = png.write_png(MODULES, box_size=box_size, border=border, use_numpy=False)
+    assert decode_png(data) == expected_pixels(MODULES, box_size, border)
+
+
+def test_custom_colors():
+    data = png.write_png(MODULES, box_size=2, border=1, fill_color="#123", back_color=(250, 240, 230))
+    assert decode_png(data) == expected_pixels(MODULES, 2, 1, dark=(0x11, 0x22, 0x33), light=(250, 240, 230))
+
+
+def test_numpy_path_is_byte_identical():
+    pytest.importorskip("numpy")
+    for box_size, border in [(1, 0), (5, 4), (9, 1)]:
+        assert png.write_png(MODULES, box_size, border, use_numpy=True) == png.write_png(
+            MODULES, box_size, border, use_numpy=False
+        )
+
+
+def test_matches_qrcode_make_image():
+    qrcode = pytest.importorskip("qrcode")
+    pytest.importorskip("PIL")
+    import io
+    from PIL import Image
+
+    qr = qrcode.QRCode(box_size=3, border=2)
+    qr.add_data("https://example.com/?q=1")
+    qr.make(fit=True)
+    buffer = io.BytesIO()
+    qr.make_image().save(buffer)
+    reference = Image.open(io.BytesIO(buffer.getvalue())).convert("RGB")
+
+    ours = decode_png(png.write_png(qr.modules, box_size=3, border=2))
+    size = len(ours)
+    assert reference.size == (size, size)
+    assert [[reference.getpixel((x, y)) for x in range(size)] for y in range(size)] == ours
+
+
+def test_rejects_bad_arguments():
+    with pytest.raises(ValueError):
+        png.write_png(MODULES, box_size=0)
+    with pytest.raises(ValueError):
+        png.parse_color("not-a-color")
+
+
+@pytest.mark.parametrize("target", [5, 17, 100, 101, 257])
+def test_exact_target_size(target):
+    pixels = decode_png(png.write_png(MODULES, border=1, size=target))
+    assert len(pixels) == target and all(len(row) == target for row in pixels)
+
+    box_size = png.fit_box_size(len(MODULES), 1, target)
+    before = (target - len(MODULES) * box_size) // 2
+    for r, row in enumerate(MODULES):
+        for c, dark in enumerate(row):
+            y, x = before + r * box_size, before + c * box_size
+            block = {pixels[y + dy][x + dx] for dy in range(box_size) for dx in range(box_size)}
+            assert block == {(0, 0, 0) if dark else (255, 255, 255)}
+
+
+def test_target_size_never_shrinks_below_one_pixel_per_module():
+    assert len(decode_png(png.write_png(MODULES, border=4, size=3))) == png.image_size(3, 1, 4)
+
+
+def test_read_png_round_trip():
+    data = png.write_png(MODULES, box_size=2, border=1, fill_color="#204060", back_color="white")
+    width, height, rows = png.read_png(data)
+    dark = (299 * 0x20 + 587 * 0x40 + 114 * 0x60) // 1000
+    expected = [[dark if pixel == (0x20, 0x40, 0x60) else 255 for pixel in row]
+                for row in expected_pixels(MODULES, 2, 1, dark=(0x20, 0x40, 0x60))]
+    assert (width, height) == (10, 10)
+    assert [list(row) for row in rows] == expected
+
+
+@pytest.mark.parametrize("mode", ["L", "LA", "RGB", "RGBA", "P", "1"])
+def test_read_png_matches_pillow(mode):
+    pytest.importorskip("PIL")
+    import io
+    from PIL import Image
+
+    image = Image.new("RGB", (37, 11))
+    image.putdata([((x * 7) % 256, (y * 23) % 256, (x * y) % 256) for y in range(11) for x in range(37)])
+    image = image.convert(mode)
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG")
+    width, height, rows = png.read_png(buffer.getvalue())
+    expected = image.convert("L").tobytes()
+    assert (width, height) == (37, 11)
+    assert all(abs(a - b) <= 1 for a, b in zip(b"".join(rows), expected))
@@ -0,0 +1,127 @@
+import asyncio
+
+from QRScanner import decoder
+from QRScanner.generator import DEFAULT_PARAMS
+from QRScanner.preview import LivePreview, PreviewEncoder
+
+
+def make_preview(render=None, **kwargs):
+    shown = []
+    rendered = []
+
+    async def default_render(text, size):
+        rendered.append((text, size))
+        return f"{text}@{size}"
+
+    kwargs.setdefault("delay", 0.01)
+    preview = LivePreview(render or default_render, lambda text, image: shown.append(image),
+                          sizes=(400, 200, 100), **kwargs)
+    return preview, shown, rendered
+
+
+def test_encoder_reuses_the_mask_while_the_shape_holds():
+    encoder = PreviewEncoder(DEFAULT_PARAMS)
+    first = encoder.encode("hello 1")
+    second = encoder.encode("hello 2")
+    assert second.mask == first.mask
+    assert encoder.stats() == {"masks_reused": 1, "masks_selected": 1}
+    assert decoder.decode_grid(second.rows, second.size).text == "hello 2"
+
+    # A longer payload needs a larger version, so the mask is chosen again.
+    encoder.encode("hello " * 20)
+    assert encoder.selected == 2
+    assert encoder.render("hello 3", 120)[:4] == b"\x89PNG"
+
+
+def test_keystrokes_are_debounced_into_one_render():
+    async def typing():
+        preview, shown, rendered = make_preview()
+        for text in ("h", "he", "hel", "hell", "hello"):
+            preview.update(text)
+        await asyncio.sleep(0.05)
+        return preview, shown, rendered
+
+    preview, shown, rendered = asyncio.run(typing())
+    assert rendered == [("hello", 400)]
+    assert shown == ["hello@400"]
+    stats = preview.stats()
+    assert stats["keystrokes"] == 5 and stats["renders"] == 1
+    assert stats["latency_p95_ms"] is not None
+
+
+def test_continuous_typing_renders_by_max_wait():
+    now = [0.0]
+
+    async def typing():
+        preview, shown, rendered = make_preview(delay=10, max_wait=0.05, clock=lambda: now[0])
+        preview.update("a")
+        now[0] = 0.04
+        preview.update("ab")
+        await asyncio.sleep(0.05)
+        return rendered
+
+    assert asyncio.run(typing()) == [("ab", 400)]
+
+
+def test_a_newer_render_supersedes_the_one_in_flight():
+    release = None
+
+    async def slow_render(text, size):
+        await release.wait()
+        return text
+
+    async def typing():
+        nonlocal release
+        release = asyncio.Event()
+        preview, shown, _rendered = make_preview(slow_render)
+        preview.update("first")
+        await asyncio.sleep(0.03)
+        preview.update("second")
+        await asyncio.sleep(0.03)
+        release.set()
+        await preview.flush()
+        return preview, shown
+
+    preview, shown = asyncio.run(typing())
+    assert shown == ["second"]
+    assert preview.superseded == 1
+
+
+def test_slow_renders_step_the_size_down_and_back_up():
+    now = [0.0]
+    durations = iter([1.0, 1.0, 1.0, 0.0, 0.0])
+
+    async def render(text, size):
+        now[0] += next(durations)
+        return size
+
+    async def typing():
+        preview, shown, _rendered = make_preview(render, budget=0.2, clock=lambda: now[0])
+        for i in range(5):
+            preview.update(f"text {i}")
+            await preview.flush()
+        return preview, shown
+
+    preview, shown = asyncio.run(typing())
+    assert shown == [400, 200, 100, 100, 200]
+    assert preview.over_budget == 3
+    assert preview.size == 400
+
+
+def test_empty_text_clears_and_errors_keep_the_last_image():
+    async def render(text, size):
+        if text == "bad":
+            raise ValueError("too long")
+        return text
+
+    async def typing():
+        preview, shown, _rendered = make_preview(render)
+        for text in ("ok", "bad", ""):
+            preview.update(text)
+            await preview.flush()
+        preview.stop()
+        return preview, shown
+
+    preview, shown = asyncio.run(typing())
+    assert shown == ["ok", None]
+    assert preview.errors == 1
@@ -0,0 +1,63 @@
+import pytest
+
+from QRScanner.profiles import (
+    DEFAULT_PROFILE,
+    INVERTED_SCAN,
+    MIXED_SCAN,
+    PROFILES,
+    SCAN_TYPE,
+    TRY_HARDER,
+    ScanOptionsCache,
+    build_options,
+)
+
+
+class FakeScanOptions:
+    # Records the setters ScanOptions would receive.
+    def __init__(self):
+        self.calls = {}
+        self.extras = {}
+
+    def __getattr__(self, name):
+        if not name.startswith("set"):
+            raise AttributeError(name)
+        return lambda value: self.calls.__setitem__(name[3:], value)
+
+    def addExtra(self, key, value):
+        self.extras[key] = value
+
+
+def test_fast_profile_is_narrow():
+    options = build_options(PROFILES["fast"], FakeScanOptions, capture_activity="Portrait")
+    assert options.calls["DesiredBarcodeFormats"] == ["QR_CODE"]
+    assert options.calls["Timeout"] == 15000
+    assert options.calls["CaptureActivity"] == "Portrait"
+    assert options.calls["OrientationLocked"] is True
+    assert options.extras == {}
+
+
+@pytest.mark.parametrize("name,scan_type", [("damaged", MIXED_SCAN), ("inverted", INVERTED_SCAN)])
+def test_decode_hints(name, scan_type):
+    options = build_options(PROFILES[name], FakeScanOptions, to_int=lambda value: ("int", value))
+    assert options.extras[SCAN_TYPE] == ("int", scan_type)
+    assert options.extras.get(TRY_HARDER, False) is PROFILES[name].try_harder
+
+
+def test_switches_are_applied():
+    options = build_options(PROFILES["all"], FakeScanOptions, beep=True, torch=True, capture_image=True)
+    assert options.calls["BeepEnabled"] and options.calls["TorchEnabled"]
+    assert options.calls["BarcodeImageEnabled"]
+    assert "EAN_13" in options.calls["DesiredBarcodeFormats"]
+    assert "CaptureActivity" not in options.calls
+
+
+def test_options_are_built_once_per_combination():
+    cache = ScanOptionsCache(FakeScanOptions, to_list=tuple)
+    cache.prebuild()
+    assert cache.builds == len(PROFILES)
+
+    options = cache.get(DEFAULT_PROFILE)
+    assert cache.get(DEFAULT_PROFILE) is options
+    assert cache.get(DEFAULT_PROFILE, beep=True) is not options
+    assert cache.builds == len(PROFILES) + 1
+    assert options.calls["DesiredBarcodeFormats"] == ("QR_CODE",)
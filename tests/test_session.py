@@ -0,0 +1,147 @@
+import asyncio
+import threading
+
+from QRScanner.session import ScanSession
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeSource:
+    # Stands in for the capture activity: records pause/resume/stop calls.
+    def __init__(self):
+        self.calls = []
+
+    def pause(self):
+        self.calls.append("pause")
+
+    def resume(self):
+        self.calls.append("resume")
+
+    def stop(self, reason):
+        self.calls.append(("stop", reason))
+
+    def session(self, **options):
+        return ScanSession(pause=self.pause, resume=self.resume, stop=self.stop, **options)
+
+
+def test_results_arrive_in_order_from_another_thread():
+    async def scenario():
+        session = ScanSession()
+
+        def produce():
+            for i in range(100):
+                session.feed(f"code-{i}", timestamp=i)
+            session.close("finished")
+
+        threading.Thread(target=produce).start()
+        return [result async for result in session], session
+
+    results, session = asyncio.run(scenario())
+    assert [r.contents for r in results] == [f"code-{i}" for i in range(100)]
+    assert results[5].timestamp == 5
+    assert session.reason == "finished"
+
+
+def test_dedup_window_slides():
+    clock = FakeClock()
+
+    async def scenario():
+        session = ScanSession(dedup_window=2.0, clock=clock)
+        for now, code in [(0, "a"), (1, "a"), (2.5, "a"), (5, "a"), (5.1, "b")]:
+            clock.now = now
+            session._accept(code, None)
+        session.stop()
+        return [r.contents async for r in session], session
+
+    contents, session = asyncio.run(scenario())
+    assert contents == ["a", "a", "b"]
+    assert session.duplicates == 2
+
+
+def test_dedup_for_whole_session_and_disabled():
+    async def scenario(window):
+        session = ScanSession(dedup_window=window)
+        for code in "aabab":
+            session._accept(code, None)
+        session.stop()
+        return [r.contents async for r in session]
+
+    assert asyncio.run(scenario(None)) == ["a", "b"]
+    assert asyncio.run(scenario(0)) == list("aabab")
+
+
+def test_back_pressure_pauses_and_resumes_the_source():
+    source = FakeSource()
+
+    async def scenario():
+        session = source.session(max_pending=4, dedup_window=0)
+        for i in range(5):
+            session._accept(str(i), None)
+        assert source.calls == ["pause"]
+        consumed = []
+        async for result in session:
+            consumed.append(result.contents)
+            if len(consumed) == 5:
+                break
+        return consumed
+
+    assert asyncio.run(scenario()) == ["0", "1", "2", "3", "4"]
+    assert source.calls == ["pause", "resume"]
+
+
+def test_idle_timeout_stops_the_source():
+    source = FakeSource()
+
+    async def scenario():
+        session = source.session(idle_timeout=0.05)
+        session.feed("only")
+        results = [r.contents async for r in session]
+        return results, session
+
+    results, session = asyncio.run(scenario())
+    assert results == ["only"]
+    assert session.reason == "idle"
+    assert source.calls == [("stop", "idle")]
+
+
+def test_total_timeout_and_context_manager():
+    source = FakeSource()
+
+    async def scenario():
+        async with source.session(timeout=0.05) as session:
+            async for _result in session:
+                pass
+        return session
+
+    session = asyncio.run(scenario())
+    assert session.reason == "timeout"
+    assert source.calls == [("stop", "timeout")]
+
+
+def test_results_after_close_are_ignored():
+    async def scenario():
+        session = ScanSession()
+        session._finish("closed")
+        session._accept("late", None)
+        return [r async for r in session], session.stats()
+
+    results, stats = asyncio.run(scenario())
+    assert results == [] and stats["received"] == 0
+
+
+def test_sequence_parts_with_the_same_text_are_kept_apart():
+    async def scenario():
+        session = ScanSession(dedup_window=None)
+        session._accept("part", None, (0, 2, 5))
+        session._accept("part", None, (1, 2, 5))
+        session._accept("part", None, (1, 2, 5))
+        session.stop()
+        return [r.structured_append async for r in session]
+
+    assert asyncio.run(scenario()) == [(0, 2, 5), (1, 2, 5)]
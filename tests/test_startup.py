@@ -0,0 +1,59 @@
+import json
+
+from QRScanner.startup import StartupTimer
+from QRScanner.trace import Tracer
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_phases_are_measured_between_marks():
+    clock = FakeClock()
+    timer = StartupTimer(clock=clock)
+    for phase, duration in [("import", 0.25), ("widget_tree", 0.1), ("first_render", 0.05)]:
+        clock.now += duration
+        timer.mark(phase)
+
+    report = timer.report(version="1.3.0")
+    assert report["phases_ms"] == {"import": 250.0, "widget_tree": 100.0, "first_render": 50.0}
+    assert report["total_ms"] == 400.0
+    assert report["version"] == "1.3.0"
+    assert "first_render" in timer.format()
+
+
+def test_reports_are_appended_and_bounded(tmp_path):
+    path = str(tmp_path / "startup_timing.jsonl")
+    timer = StartupTimer(clock=FakeClock())
+    timer.mark("import")
+    for _ in range(5):
+        timer.save(path, keep=3)
+
+    with open(path) as f:
+        lines = f.read().splitlines()
+    assert len(lines) == 3
+    assert json.loads(lines[-1])["phases_ms"] == {"import": 0.0}
+
+
+def test_phases_become_spans_while_tracing():
+    clock = FakeClock()
+    timer = StartupTimer(clock=clock)
+    for phase, duration in [("import", 0.25), ("first_render", 0.05)]:
+        clock.now += duration
+        timer.mark(phase)
+
+    tracer = Tracer(clock=clock)
+    timer.trace(tracer)
+    assert tracer.summary()["operations"] == {}
+
+    tracer.enable()
+    timer.trace(tracer)
+    spans = [event for event in tracer.chrome_trace()["traceEvents"] if event["ph"] == "X"]
+    assert [(span["name"], span["dur"]) for span in spans] == [
+        ("startup.import", 250000.0), ("startup.first_render", 50000.0),
+    ]
+    assert spans[1]["ts"] - spans[0]["ts"] == 250000.0
@@ -0,0 +1,84 @@
+import asyncio
+import io
+
+from QRScanner.streams import MIN_CHUNK, copy_async, copy_stream
+
+
+class FakeOutputStream:
+    # Mimics a Java OutputStream seen through the bridge: every write call
+    # is recorded so the number of crossings can be checked.
+    def __init__(self):
+        self.buffer = bytearray()
+        self.writes = 0
+        self.flushed = False
+
+    def write(self, data):
+        self.writes += 1
+        self.buffer += data
+
+    def flush(self):
+        self.flushed = True
+
+
+class StepClock:
+    def __init__(self, step):
+        self.now = 0.0
+        self.step = step
+
+    def __call__(self):
+        self.now += self.step
+        return self.now
+
+
+def payload(size):
+    return bytes(i % 251 for i in range(size))
+
+
+def test_copies_bytes_in_growing_chunks():
+    data = payload(3 * 1024 * 1024 + 17)
+    sink = FakeOutputStream()
+    stats = copy_stream(data, sink)
+
+    assert bytes(sink.buffer) == data
+    assert sink.flushed
+    assert stats.bytes == len(data) and stats.fraction == 1.0
+    assert sink.writes == stats.chunks < len(data) // MIN_CHUNK
+
+
+def test_slow_sink_shrinks_chunks():
+    data = payload(8 * MIN_CHUNK)
+    sink = FakeOutputStream()
+    stats = copy_stream(data, sink, clock=StepClock(1.0))
+    assert stats.chunks == 8
+    assert stats.throughput == len(data) / stats.seconds
+
+
+def test_file_like_source_and_fixed_chunks():
+    data = payload(10000)
+    sink = io.BytesIO()
+    stats = copy_stream(io.BytesIO(data), sink, chunk_size=4096)
+    assert sink.getvalue() == data
+    assert stats.chunks == 3
+    assert stats.fraction is None
+
+
+def test_empty_source():
+    sink = FakeOutputStream()
+    stats = copy_stream(b"", sink)
+    assert (stats.bytes, sink.writes) == (0, 0)
+
+
+def test_async_copy_reports_progress_on_the_loop():
+    data = payload(5 * MIN_CHUNK)
+    sink = FakeOutputStream()
+    updates = []
+
+    async def scenario():
+        stats = await copy_async(data, sink, chunk_size=MIN_CHUNK, progress=lambda done, total: updates.append((done, total)))
+        await asyncio.sleep(0)
+        return stats
+
+    stats = asyncio.run(scenario())
+    assert bytes(sink.buffer) == data
+    assert updates == [(MIN_CHUNK * i, len(data)) for i in range(1, 6)]
+    assert stats.as_dict()["chunks"] == 5
@@ -0,0 +1,101 @@
+import asyncio
+import random
+
+import pytest
+
+from QRScanner import decoder, encoder
+from QRScanner.structured import (
+    Reassembler, SequencePlayer, chunk_capacity, parity, plan_sequence, split,
+)
+
+
+def test_split_cuts_between_characters():
+    data = "aé€😀b".encode("utf-8")
+    chunks = split(data, 4)
+    assert b"".join(chunks) == data
+    assert all(len(chunk) <= 4 for chunk in chunks)
+    assert [chunk.decode("utf-8") for chunk in chunks] == ["aé", "€", "😀", "b"]
+    with pytest.raises(ValueError):
+        split(data, 3)
+
+
+def test_parts_fit_the_target_version_and_decode_back():
+    payload = "".join(f"key{i}=value é {i};" for i in range(120))
+    parts = plan_sequence(payload)
+    assert 1 < len(parts) <= encoder.MAX_SEQUENCE
+    assert "".join(text for text, _header in parts) == payload
+
+    reassembler = Reassembler()
+    decoded = []
+    for text, header in parts:
+        matrix = encoder.encode(text, optimize=True, max_version=10, structured_append=header)
+        decoded.append(decoder.decode_grid(matrix.rows, matrix.size))
+    random.Random(3).shuffle(decoded)
+    results = [reassembler.add(symbol.text, symbol.structured_append, symbol.data) for symbol in decoded]
+    assert results[:-1] == [None] * (len(parts) - 1)
+    assert results[-1] == payload
+    assert decoded[0].structured_append[2] == parity(payload.encode("utf-8"))
+
+
+def test_long_payloads_move_to_larger_parts():
+    payload = "x" * (chunk_capacity(10) * 20)
+    parts = plan_sequence(payload)
+    assert len(parts) <= encoder.MAX_SEQUENCE
+    assert len(parts[0][0]) > chunk_capacity(10)
+
+    assert len(plan_sequence("y" * 100, chunk_size=10)) == 10
+    with pytest.raises(encoder.DataOverflowError):
+        plan_sequence("y" * 200, chunk_size=10)
+
+
+def test_header_position_is_checked():
+    with pytest.raises(ValueError):
+        encoder.structured_append_header(3, 3, 0)
+    with pytest.raises(ValueError):
+        encoder.structured_append_header(0, 17, 0)
+
+
+def test_reassembler_keeps_sequences_apart_and_checks_parity():
+    reassembler = Reassembler()
+    first = plan_sequence("abcdefgh", chunk_size=4)
+    second = plan_sequence("12345679", chunk_size=4)
+
+    assert reassembler.add(*first[0]) is None
+    assert reassembler.add(*second[1]) is None
+    assert reassembler.add(*first[0]) is None
+    assert reassembler.progress(first[0][1]) == (1, 2)
+    assert reassembler.add(*first[1]) == "abcdefgh"
+    assert reassembler.add(*second[0]) == "12345679"
+
+    text, (index, total, check) = first[1]
+    reassembler.add(*first[0])
+    with pytest.raises(ValueError):
+        reassembler.add("zzzz", (index, total, check))
+
+
+def test_completed_sequences_can_be_ignored():
+    parts = plan_sequence("abcdefgh", chunk_size=4)
+    reassembler = Reassembler(ignore_completed=True)
+    assert [reassembler.add(*part) for part in parts + parts] == [None, "abcdefgh", None, None]
+    assert reassembler.progress(parts[0][1]) is None
+    reassembler.clear()
+    assert reassembler.add(*parts[1]) is None
+
+
+def test_player_pages_and_animates():
+    shown = []
+
+    async def scenario():
+        player = SequencePlayer(["a", "b", "c"], lambda index, page: shown.append(page), interval=0.01)
+        player.go(0)
+        player.previous()
+        player.next()
+        player.play()
+        await asyncio.sleep(0.035)
+        player.stop()
+        return player
+
+    player = asyncio.run(scenario())
+    assert shown[:3] == ["a", "c", "a"]
+    assert shown[3:5] == ["b", "c"]
+    assert not player.playing
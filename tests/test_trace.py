@@ -0,0 +1,126 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+from QRScanner.trace import SUMMARY_NAME, TRACE_NAME, Tracer, percentile
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_disabled_tracer_records_nothing():
+    tracer = Tracer()
+    first = tracer.span("a")
+    with first:
+        pass
+    assert tracer.span("b") is first
+    tracer.count("c")
+    tracer.error("d", ValueError("x"))
+    assert tracer.summary() == {"operations": {}, "counters": {}, "events": 0, "dropped": 0}
+
+
+def test_spans_build_histograms():
+    clock = FakeClock()
+    tracer = Tracer(enabled=True, clock=clock)
+    for ms in range(1, 101):
+        with tracer.span("qr_generate", size=900):
+            clock.now += ms / 1000
+
+    summary = tracer.summary()["operations"]["qr_generate"]
+    assert summary["count"] == 100
+    assert (summary["p50_ms"], summary["p95_ms"], summary["p99_ms"]) == (50.0, 95.0, 99.0)
+    assert summary["max_ms"] == 100.0
+    assert summary["mean_ms"] == 50.5
+
+
+def test_percentiles_use_recent_samples_only():
+    clock = FakeClock()
+    tracer = Tracer(enabled=True, samples=10, clock=clock)
+    for ms in [1000] * 5 + [1] * 10:
+        with tracer.span("op"):
+            clock.now += ms / 1000
+    summary = tracer.summary()["operations"]["op"]
+    assert summary["p99_ms"] == 1.0
+    assert summary["max_ms"] == 1000.0
+    assert summary["count"] == 15
+
+
+def test_percentile_nearest_rank():
+    assert percentile([], 0.5) is None
+    assert percentile([7], 0.99) == 7
+    assert percentile([1, 2, 3, 4], 0.5) == 2
+    assert percentile([1, 2, 3, 4], 0.51) == 3
+
+
+def test_errors_are_counted():
+    tracer = Tracer(enabled=True)
+    with pytest.raises(RuntimeError):
+        with tracer.span("save_qr.copy"):
+            raise RuntimeError("disk full")
+    tracer.error("share", OSError("no app"))
+
+    summary = tracer.summary()
+    assert summary["operations"]["save_qr.copy"]["errors"] == 1
+    assert summary["counters"] == {"share.errors": 1}
+    events = tracer.chrome_trace()["traceEvents"]
+    assert any(e["name"] == "share.error" and e["args"]["error"] == "OSError: no app" for e in events)
+    assert any(e["args"].get("error") == "RuntimeError: disk full" for e in events if e["ph"] == "X")
+
+
+def test_ring_buffer_drops_oldest():
+    tracer = Tracer(enabled=True, capacity=5)
+    for i in range(8):
+        tracer.instant("tick", i=i)
+    events = [e for e in tracer.chrome_trace()["traceEvents"] if e["ph"] == "i"]
+    assert [e["args"]["i"] for e in events] == [3, 4, 5, 6, 7]
+    assert tracer.summary()["dropped"] == 3
+
+
+def test_traced_decorator_handles_coroutines():
+    tracer = Tracer(enabled=True)
+
+    @tracer.traced()
+    def add(a, b):
+        return a + b
+
+    @tracer.traced("fetch")
+    async def fetch():
+        await asyncio.sleep(0)
+        return "done"
+
+    assert add(1, 2) == 3
+    assert asyncio.new_event_loop().run_until_complete(fetch()) == "done"
+    operations = tracer.summary()["operations"]
+    assert operations["fetch"]["count"] == 1
+    assert operations[add.__qualname__]["count"] == 1
+
+
+def test_chrome_trace_export(tmp_path):
+    clock = FakeClock()
+    tracer = Tracer(enabled=True, clock=clock)
+    clock.now += 0.5
+    with tracer.span("scan", profile="fast"):
+        clock.now += 0.25
+
+    worker = threading.Thread(target=tracer.count, args=("renders",), name="qr-render_0")
+    worker.start()
+    worker.join()
+
+    trace_path, summary_path = tracer.save(str(tmp_path))
+    assert trace_path.endswith(TRACE_NAME) and summary_path.endswith(SUMMARY_NAME)
+    with open(trace_path) as f:
+        trace = json.load(f)
+    span = next(e for e in trace["traceEvents"] if e["ph"] == "X")
+    assert (span["name"], span["ts"], span["dur"]) == ("scan", 500000.0, 250000.0)
+    assert span["args"] == {"profile": "fast"}
+    names = {e["args"]["name"] for e in trace["traceEvents"] if e["ph"] == "M"}
+    assert "qr-render_0" in names
+    with open(summary_path) as f:
+        assert json.load(f)["counters"] == {"renders": 1}